@@ -1,89 +1,167 @@
-from django.db.models import Count, Avg, Sum, Q, F, Max, Min
-from django.db.models.functions import TruncMonth, TruncDate, ExtractYear
-from .models import Movie, Session, Ticket, Genre, Employee, Customer, Hall
+from django.db.models import Count, Avg, DecimalField, FloatField, Sum, Q, F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, NullIf
+from .models import Movie, Employee, Ticket
+from .rollups import rollup_rows, unique_customers
+from .sketches import approx_unique_customers
+
+
+TICKET_FACT_FIELDS = (
+    'ticket_id', 'customer_id', 'session__movie__genre_id',
+    'session__price', 'session__start_time', 'purchase_date',
+)
+# Рейтинги продажів: вид -> (поле ключа в rollup-ах, поле назви)
+TOP_SELLER_FIELDS = {
+    'movies': ('movie_id', 'movie__title'),
+    'genres': ('genre_id', 'genre_name'),
+}
+
+
+def _period(field: str, start=None, end=None) -> Q:
+    # Межі [start, end) за часом сеансу; None - без обмеження
+    q = Q()
+    if start is not None:
+        q &= Q(**{f'{field}__gte': start})
+    if end is not None:
+        q &= Q(**{f'{field}__lt': end})
+    return q
+
+
+def _ratio(numerator, denominator):
+    return Cast(numerator, FloatField()) / NullIf(denominator, 0)
 
 
 class AnalyticsRepository:
+    """
+    Продажі читаються з rollup-ів (analytics.rollups; до їх першого збирання -
+    живими запитами з тими ж полями): start/end - межі
+    [start, end) за часом сеансу, granularity (hour/day/week/month) додає
+    до рядків поле 'period'.
+    """
+
     @staticmethod
-    def get_revenue_by_genre():
+    def get_revenue_by_genre(start=None, end=None, granularity=None):
+        group = ('period',) if granularity else ()
         return (
-            Genre.objects
+            rollup_rows(start, end, granularity)
+            .values(*group, 'genre_id', name=F('genre_name'))
             .annotate(
-                total_tickets=Count('movies__sessions__tickets'),
-                total_revenue=Sum('movies__sessions__tickets__session__price'),
-                avg_ticket_price=Avg('movies__sessions__price'),
-                movie_count=Count('movies', distinct=True),
-                session_count=Count('movies__sessions', distinct=True)
+                total_tickets=Sum('sold'),
+                total_revenue=Sum('revenue'),
+                avg_ticket_price=_ratio(Sum('revenue'), Sum('sold')),
+                movie_count=Count('movie_id', distinct=True),
+                session_count=Sum('sessions')
             )
-            .filter(total_tickets__gt=0) 
-            .order_by('-total_revenue')
+            .filter(total_tickets__gt=0)
+            .order_by(*group, '-total_revenue')
         )
-    
+
     @staticmethod
-    def get_monthly_revenue_stats():
-        return (
-            Session.objects
-            .annotate(month=TruncMonth('start_time'))
-            .values('month')
+    def get_monthly_revenue_stats(start=None, end=None, granularity='month', approx=False):
+        """approx - унікальні покупці з HyperLogLog-скетчів (крім годин)."""
+        granularity = granularity or 'month'
+        rows = list(
+            rollup_rows(start, end, granularity)
+            .values('period')
             .annotate(
-                total_sessions=Count('session_id'),
-                tickets_sold=Count('tickets'),
-                total_revenue=Sum(F('tickets__session__price')),
-                avg_session_price=Avg('price'),
-                unique_customers=Count('tickets__customer', distinct=True)
+                total_sessions=Sum('sessions'),
+                tickets_sold=Sum('sold'),
+                total_revenue=Sum('revenue'),
+                avg_session_price=_ratio(Sum('price_total'), Sum('sessions'))
             )
             .filter(tickets_sold__gt=0)
-            .order_by('month')
+            .order_by('period')
         )
-    
+        periods = [row['period'] for row in rows]
+        customers = approx_unique_customers(periods, granularity, start, end) if approx else None
+        if customers is None:
+            customers = unique_customers(periods, granularity, start, end)
+        for row in rows:
+            row['unique_customers'] = customers[row['period']]
+        return rows
+
     @staticmethod
-    def get_hall_utilization():
+    def get_hall_utilization(start=None, end=None, granularity=None):
+        group = ('period',) if granularity else ()
         return (
-            Hall.objects
+            rollup_rows(start, end, granularity)
+            .values(*group, 'hall_id', name=F('hall__name'), capacity=F('hall__capacity'), type=F('hall__type'))
             .annotate(
-                total_sessions=Count('sessions'),
-                total_capacity=Sum('capacity'),
-                tickets_sold=Count('sessions__tickets'),
-                avg_occupancy_rate=Count('sessions__tickets') * 100.0 / F('capacity'),
-                total_potential_revenue=Sum(F('sessions__price') * F('capacity')),
-                actual_revenue=Sum('sessions__tickets__session__price')
+                total_sessions=Sum('sessions'),
+                total_capacity=Sum('seats'),
+                tickets_sold=Sum('sold'),
+                avg_occupancy_rate=_ratio(Sum('sold') * 100, Sum('seats')),
+                total_potential_revenue=Sum('potential_revenue'),
+                actual_revenue=Sum('revenue')
             )
             .filter(total_sessions__gt=0)
-            .order_by('-avg_occupancy_rate')
+            .order_by(*group, '-avg_occupancy_rate')
         )
-    
+
     @staticmethod
-    def get_movie_popularity_by_year():
-        return (
+    def get_movie_popularity_by_year(start=None, end=None, granularity=None):
+        group = ('period',) if granularity else ()
+        avg_rating = (
             Movie.objects
-            .annotate(year=F('release_year'))
-            .values('year')
+            .filter(release_year=OuterRef('year'))
+            .values('release_year')
+            .annotate(value=Avg('rating'))
+            .values('value')
+        )
+        return (
+            rollup_rows(start, end, granularity)
+            .values(*group, year=F('movie__release_year'))
             .annotate(
                 movie_count=Count('movie_id', distinct=True),
-                total_sessions=Count('sessions'),
-                tickets_sold=Count('sessions__tickets'),
-                avg_rating=Avg('rating'),
-                total_revenue=Sum('sessions__tickets__session__price'),
-                avg_price=Avg('sessions__price')
+                total_sessions=Sum('sessions'),
+                tickets_sold=Sum('sold'),
+                avg_rating=Subquery(avg_rating),
+                total_revenue=Sum('revenue'),
+                avg_price=_ratio(Sum('price_total'), Sum('sessions'))
             )
             .filter(tickets_sold__gt=0)
-            .order_by('-year')
+            .order_by(*group, '-year')
         )
-    
+
     @staticmethod
-    def get_customer_segments():
+    def get_rating_by_year():
+        # Фільми без рейтингу рахуються як 0, як у bokeh_dashboard
         return (
-            Customer.objects
-            .annotate(
-                tickets_purchased=Count('tickets'),
-                total_spent=Sum('tickets__session__price'),
-                avg_ticket_price=Avg('tickets__session__price'),
-                first_purchase=Min('tickets__purchase_date'),
-                last_purchase=Max('tickets__purchase_date'),
-                favorite_genre=Count('tickets__session__movie__genre')
-            )
-            .filter(tickets_purchased__gte=1) 
-            .order_by('-total_spent')
+            Movie.objects
+            .filter(release_year__isnull=False)
+            .values('release_year')
+            .annotate(rating=Avg(Coalesce('rating', 0, output_field=DecimalField())))
+            .order_by('release_year')
+        )
+
+    @staticmethod
+    def iter_ticket_facts(after_id=0, chunk_size=100_000, start=None, end=None, fields=TICKET_FACT_FIELDS):
+        """
+        Факти квитків партіями по chunk_size (keyset за TicketID, перше поле
+        fields - завжди ticket_id): для сегментації клієнтів і скетчів.
+        """
+        queryset = (
+            Ticket.objects
+            .filter(_period('session__start_time', start, end))
+            .order_by('ticket_id')
+            .values_list(*fields)
+        )
+        while True:
+            rows = list(queryset.filter(ticket_id__gt=after_id)[:chunk_size])
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1][0]
+
+    @staticmethod
+    def get_top_sellers(kind, start=None, end=None, limit=10):
+        """Найпопулярніші фільми/жанри за кількістю квитків з rollup-ів."""
+        key, name = TOP_SELLER_FIELDS[kind]
+        return (
+            rollup_rows(start, end)
+            .values(key, name=F(name))
+            .annotate(tickets_sold=Sum('sold'), total_revenue=Sum('revenue'))
+            .filter(tickets_sold__gt=0)
+            .order_by('-tickets_sold', key)[:limit]
         )
     
     @staticmethod
@@ -1,31 +1,68 @@
 import pandas as pd
+from django.utils.http import http_date
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import status
+from rest_framework import serializers, status
 from .analytics_repositories import AnalyticsRepository
+from .chart_data import CHARTS, get_chart_data
+from .analytics_repositories import TOP_SELLER_FIELDS
+from .models import Customer, Genre, Movie
+from .rollups import parse_period, period_label, rollup_status
+from .segmentation import SEGMENTS, customer_segments
+from .sketches import approx_top_sellers, get_sketch_config, supports, unique_customers_error
 
 
-class RevenueByGenreAPI(APIView):
+class PeriodParamsMixin:
+    """?from=&to=&granularity= (hour/day/week/month); to не включається."""
+    default_granularity = None
+
+    def get_period(self, request):
+        return parse_period(request.query_params, self.default_granularity)
+
+
+class RollupStatusMixin:
+    """Заголовки X-Rollup-*: звідки дані (rollups/live) і наскільки вони свіжі."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        state = rollup_status()
+        response['X-Rollup-Source'] = state['source']
+        if state['refreshed_at'] is not None:
+            response['X-Rollup-Refreshed-At'] = http_date(state['refreshed_at'])
+            response['X-Rollup-Ticket-Watermark'] = str(state['ticket'])
+        return response
+
+
+def wants_approx(request) -> bool:
+    """?approx=1 - наближені значення зі скетчів (analytics.sketches)."""
+    return request.query_params.get('approx', '').lower() in ('1', 'true', 'yes')
+
+
+def _with_labels(rows, granularity):
+    if granularity:
+        for row in rows:
+            row['period'] = period_label(row['period'], granularity)
+    return rows
+
+
+class RevenueByGenreAPI(RollupStatusMixin, PeriodParamsMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
     
     def get(self, request):
+        start, end, granularity = self.get_period(request)
         try:
-            queryset = AnalyticsRepository.get_revenue_by_genre()
-            data = list(queryset.values(
+            queryset = AnalyticsRepository.get_revenue_by_genre(start, end, granularity)
+            data = _with_labels(list(queryset.values(
+                *(('period',) if granularity else ()),
                 'name',
                 'total_tickets',
                 'total_revenue',
                 'avg_ticket_price',
                 'movie_count',
                 'session_count'
-            ))
-            
-            for item in data:
-                if item['total_revenue']:
-                    item['total_revenue'] = float(item['total_revenue'])
-                if item['avg_ticket_price']:
-                    item['avg_ticket_price'] = float(item['avg_ticket_price'])
+            )), granularity)
             
             return Response({
                 'success': True,
@@ -39,31 +76,40 @@ class RevenueByGenreAPI(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class MonthlyRevenueAPI(APIView):
+class MonthlyRevenueAPI(RollupStatusMixin, PeriodParamsMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
+    default_granularity = 'month'
     
     def get(self, request):
+        start, end, granularity = self.get_period(request)
         try:
-            queryset = AnalyticsRepository.get_monthly_revenue_stats()
-            data = list(queryset)
+            approx = wants_approx(request) and supports(granularity)
+            data = AnalyticsRepository.get_monthly_revenue_stats(start, end, granularity, approx)
 
             formatted_data = []
             for item in data:
                 formatted_item = {
-                    'month': item['month'].strftime('%Y-%m') if item['month'] else None,
+                    'period': period_label(item['period'], granularity),
                     'total_sessions': item['total_sessions'],
                     'tickets_sold': item['tickets_sold'],
-                    'total_revenue': float(item['total_revenue']) if item['total_revenue'] else 0,
-                    'avg_session_price': float(item['avg_session_price']) if item['avg_session_price'] else 0,
+                    'total_revenue': item['total_revenue'] or 0,
+                    'avg_session_price': item['avg_session_price'] or 0,
                     'unique_customers': item['unique_customers']
                 }
+                if granularity == 'month':
+                    formatted_item['month'] = formatted_item['period']
                 formatted_data.append(formatted_item)
             
-            return Response({
+            response = {
                 'success': True,
                 'data': formatted_data,
-                'count': len(formatted_data)
-            }, status=status.HTTP_200_OK)
+                'count': len(formatted_data),
+                'approximate': approx
+            }
+            if approx:
+                response['error_bounds'] = {'unique_customers_relative_std_error': round(unique_customers_error(), 4)}
+            return Response(response, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({
                 'success': False,
@@ -71,13 +117,16 @@ class MonthlyRevenueAPI(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HallUtilizationAPI(APIView):
+class HallUtilizationAPI(RollupStatusMixin, PeriodParamsMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
     
     def get(self, request):
+        start, end, granularity = self.get_period(request)
         try:
-            queryset = AnalyticsRepository.get_hall_utilization()
-            data = list(queryset.values(
+            queryset = AnalyticsRepository.get_hall_utilization(start, end, granularity)
+            data = _with_labels(list(queryset.values(
+                *(('period',) if granularity else ()),
                 'name',
                 'capacity',
                 'type',
@@ -86,15 +135,7 @@ class HallUtilizationAPI(APIView):
                 'avg_occupancy_rate',
                 'total_potential_revenue',
                 'actual_revenue'
-            ))
-            
-            for item in data:
-                if item['avg_occupancy_rate']:
-                    item['avg_occupancy_rate'] = float(item['avg_occupancy_rate'])
-                if item['total_potential_revenue']:
-                    item['total_potential_revenue'] = float(item['total_potential_revenue'])
-                if item['actual_revenue']:
-                    item['actual_revenue'] = float(item['actual_revenue'])
+            )), granularity)
             
             return Response({
                 'success': True,
@@ -108,24 +149,27 @@ class HallUtilizationAPI(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class MoviePopularityByYearAPI(APIView):
+class MoviePopularityByYearAPI(RollupStatusMixin, PeriodParamsMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
     
     def get(self, request):
+        start, end, granularity = self.get_period(request)
         try:
-            queryset = AnalyticsRepository.get_movie_popularity_by_year()
-            data = list(queryset)
+            queryset = AnalyticsRepository.get_movie_popularity_by_year(start, end, granularity)
+            data = _with_labels(list(queryset), granularity)
             
             formatted_data = []
             for item in data:
                 formatted_item = {
+                    **({'period': item['period']} if granularity else {}),
                     'year': item['year'],
                     'movie_count': item['movie_count'],
                     'total_sessions': item['total_sessions'],
                     'tickets_sold': item['tickets_sold'],
-                    'avg_rating': float(item['avg_rating']) if item['avg_rating'] else 0,
-                    'total_revenue': float(item['total_revenue']) if item['total_revenue'] else 0,
-                    'avg_price': float(item['avg_price']) if item['avg_price'] else 0
+                    'avg_rating': item['avg_rating'] or 0,
+                    'total_revenue': item['total_revenue'] or 0,
+                    'avg_price': item['avg_price'] or 0
                 }
                 formatted_data.append(formatted_item)
             
@@ -141,37 +185,61 @@ class MoviePopularityByYearAPI(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class CustomerSegmentsAPI(APIView):
+class CustomerSegmentsAPI(PeriodParamsMixin, APIView):
+    """
+    RFM-сегменти клієнтів (analytics.segmentation), за сумою витрат.
+    ?segment= - лише один сегмент, ?limit= - скільки клієнтів (до 1000);
+    лише from/to: сегменти рахуються по клієнтах, а не по часових бакетах.
+    """
     permission_classes = [IsAuthenticated]
-    
+    throttle_scope = 'analytics'
+    max_limit = 1000
+
     def get(self, request):
+        start, end, _ = self.get_period(request)
+        segment = request.query_params.get('segment')
+        if segment and segment not in SEGMENTS:
+            raise serializers.ValidationError({'segment': [f'Must be one of: {", ".join(SEGMENTS)}.']})
+        limit = request.query_params.get('limit', '100')
+        if not limit.isdigit() or not 0 < int(limit) <= self.max_limit:
+            raise serializers.ValidationError({'limit': [f'Must be an integer from 1 to {self.max_limit}.']})
+
         try:
-            queryset = AnalyticsRepository.get_customer_segments()
-            data = list(queryset.values(
-                'customer_id',
-                'name',
-                'email',
-                'tickets_purchased',
-                'total_spent',
-                'avg_ticket_price',
-                'first_purchase',
-                'last_purchase'
-            )[:100])  
+            segments = customer_segments(start, end)
+            summary = {name: int(count) for name, count in segments['segment'].value_counts().items()}
+            if segment:
+                segments = segments[segments['segment'] == segment]
+            page = segments.head(int(limit))
+
+            customers = Customer.objects.in_bulk(page.index.tolist())
+            genres = Genre.objects.in_bulk()
+            data = []
+            for customer_id, row in zip(page.index.tolist(), page.itertuples(index=False)):
+                customer = customers.get(customer_id)
+                genre = genres.get(row.favorite_genre_id)
+                data.append({
+                    'customer_id': customer_id,
+                    'name': customer.name if customer else None,
+                    'email': customer.email if customer else None,
+                    'tickets_purchased': int(row.tickets),
+                    'total_spent': float(row.spent),
+                    'avg_ticket_price': float(row.avg_ticket_price),
+                    'first_purchase': float(row.first_purchase),
+                    'last_purchase': float(row.last_purchase),
+                    'favorite_genre': genre.name if genre else None,
+                    'recency_days': round(float(row.recency_days), 1),
+                    'r_score': int(row.r_score),
+                    'f_score': int(row.f_score),
+                    'm_score': int(row.m_score),
+                    'rfm_score': int(row.rfm_score),
+                    'segment': row.segment
+                })
 
-            for item in data:
-                if item['total_spent']:
-                    item['total_spent'] = float(item['total_spent'])
-                if item['avg_ticket_price']:
-                    item['avg_ticket_price'] = float(item['avg_ticket_price'])
-                if item['first_purchase']:
-                    item['first_purchase'] = float(item['first_purchase'])
-                if item['last_purchase']:
-                    item['last_purchase'] = float(item['last_purchase'])
-            
             return Response({
                 'success': True,
                 'data': data,
-                'count': len(data)
+                'count': len(data),
+                'segments': summary
             }, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({
@@ -182,6 +250,7 @@ class CustomerSegmentsAPI(APIView):
 
 class EmployeeSalaryStatsAPI(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
     
     def get(self, request):
         try:
@@ -193,11 +262,11 @@ class EmployeeSalaryStatsAPI(APIView):
                 formatted_item = {
                     'position_title': item['position__title'],
                     'employee_count': item['employee_count'],
-                    'avg_salary': float(item['avg_salary']) if item['avg_salary'] else 0,
-                    'min_salary': float(item['min_salary']) if item['min_salary'] else 0,
-                    'max_salary': float(item['max_salary']) if item['max_salary'] else 0,
-                    'total_payroll': float(item['total_payroll']) if item['total_payroll'] else 0,
-                    'salary_range': float(item['salary_range']) if item['salary_range'] else 0
+                    'avg_salary': item['avg_salary'] or 0,
+                    'min_salary': item['min_salary'] or 0,
+                    'max_salary': item['max_salary'] or 0,
+                    'total_payroll': item['total_payroll'] or 0,
+                    'salary_range': item['salary_range'] or 0
                 }
                 formatted_data.append(formatted_item)
             
@@ -210,4 +279,76 @@ class EmployeeSalaryStatsAPI(APIView):
             return Response({
                 'success': False,
                 'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class TopSellersAPI(RollupStatusMixin, PeriodParamsMixin, APIView):
+    """
+    /analytics/top/<movies|genres>/ - за кількістю квитків, ?limit= (до 100).
+    ?approx=1 - зі скетчів: tickets_sold - верхня межа, lower_bound - нижня.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
+    max_limit = 100
+    names = {'movies': (Movie, 'title'), 'genres': (Genre, 'name')}
+
+    def get(self, request, kind):
+        if kind not in TOP_SELLER_FIELDS:
+            return Response({
+                'success': False,
+                'error': f'Unknown ranking "{kind}"',
+                'rankings': sorted(TOP_SELLER_FIELDS)
+            }, status=status.HTTP_404_NOT_FOUND)
+        start, end, _ = self.get_period(request)
+        limit = request.query_params.get('limit', '10')
+        if not limit.isdigit() or not 0 < int(limit) <= self.max_limit:
+            raise serializers.ValidationError({'limit': [f'Must be an integer from 1 to {self.max_limit}.']})
+        approx = wants_approx(request)
+
+        try:
+            if approx:
+                # Space-Saving тримає лише TOP_K кандидатів
+                top, bounds = approx_top_sellers(kind, start, end, min(int(limit), get_sketch_config()['TOP_K']))
+                model, field = self.names[kind]
+                objects = model.objects.in_bulk([item['id'] for item in top])
+                data = [
+                    {**item, 'name': getattr(objects[item['id']], field) if item['id'] in objects else None}
+                    for item in top
+                ]
+            else:
+                key, _ = TOP_SELLER_FIELDS[kind]
+                bounds = None
+                data = [
+                    {'id': row[key], 'name': row['name'], 'tickets_sold': row['tickets_sold'],
+                     'total_revenue': row['total_revenue']}
+                    for row in AnalyticsRepository.get_top_sellers(kind, start, end, int(limit))
+                ]
+
+            response = {
+                'success': True,
+                'data': data,
+                'count': len(data),
+                'approximate': approx
+            }
+            if approx:
+                response['error_bounds'] = bounds
+            return Response(response, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ChartDataAPI(RollupStatusMixin, APIView):
+    """Закешовані стовпці для одного графіка дашборду: /analytics/charts/<name>/."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, name):
+        if name not in CHARTS:
+            return Response({
+                'success': False,
+                'error': f'Unknown chart "{name}"',
+                'charts': sorted(CHARTS)
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({'success': True, **get_chart_data(name)}, status=status.HTTP_200_OK)
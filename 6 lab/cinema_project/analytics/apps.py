@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+
+    def ready(self):
+        # Підключає сигнали оновлення rollup-ів і скетчів
+        from . import rollups, sketches  # noqa: F401
@@ -0,0 +1,109 @@
+"""
+Компактні дані для графіків дашбордів: стовпці замість рядків
+({'name': [...], 'total_revenue': [...]}), закешовані на CHART_DATA['TTL'].
+Фігури будуються в браузері (Plotly.js / BokehJS) з тих самих визначень,
+що й серверні, тож сервер лише віддає невеликий JSON.
+"""
+import time
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .analytics_repositories import AnalyticsRepository
+
+CHART_DATA_DEFAULTS = {
+    'TTL': 300,
+    'CACHE_ALIAS': 'default',
+}
+
+
+def get_chart_data_config() -> dict:
+    return {**CHART_DATA_DEFAULTS, **getattr(settings, 'CHART_DATA', {})}
+
+
+def _columns(rows: List[dict], columns: Dict[str, Callable]) -> Dict[str, list]:
+    return {name: [convert(row) for row in rows] for name, convert in columns.items()}
+
+
+def genre_revenue() -> Dict[str, list]:
+    rows = list(AnalyticsRepository.get_revenue_by_genre().values('name', 'total_revenue', 'total_tickets'))
+    return _columns(rows, {
+        'name': lambda row: row['name'],
+        'total_revenue': lambda row: float(row['total_revenue'] or 0),
+        'total_tickets': lambda row: row['total_tickets'],
+    })
+
+
+def monthly_revenue() -> Dict[str, list]:
+    rows = list(AnalyticsRepository.get_monthly_revenue_stats())
+    return _columns(rows, {
+        'month': lambda row: row['period'].strftime('%Y-%m') if row['period'] else 'N/A',
+        'revenue': lambda row: float(row['total_revenue'] or 0),
+        'tickets': lambda row: row['tickets_sold'],
+    })
+
+
+def hall_utilization() -> Dict[str, list]:
+    rows = list(AnalyticsRepository.get_hall_utilization().values('name', 'avg_occupancy_rate', 'capacity'))
+    return _columns(rows, {
+        'name': lambda row: row['name'],
+        'avg_occupancy_rate': lambda row: float(row['avg_occupancy_rate'] or 0),
+        'capacity': lambda row: row['capacity'],
+    })
+
+
+def rating_by_year() -> Dict[str, list]:
+    rows = list(AnalyticsRepository.get_rating_by_year())
+    return _columns(rows, {
+        'release_year': lambda row: int(row['release_year']),
+        'rating': lambda row: float(row['rating'] or 0),
+    })
+
+
+CHARTS: Dict[str, Callable[[], Dict[str, list]]] = {
+    'genre-revenue': genre_revenue,
+    'monthly-revenue': monthly_revenue,
+    'hall-utilization': hall_utilization,
+    'rating-by-year': rating_by_year,
+}
+
+
+def _cache():
+    return caches[get_chart_data_config()['CACHE_ALIAS']]
+
+
+def get_chart_data(name: str) -> dict:
+    """{'chart', 'data', 'generated_at', 'build_ms'}; KeyError для невідомого графіка."""
+    builder = CHARTS[name]
+    key = f'chart-data:{name}'
+    cached = _cache().get(key)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    payload = {
+        'chart': name,
+        'data': builder(),
+        'generated_at': time.time(),
+        'build_ms': round((time.perf_counter() - start) * 1000, 2),
+    }
+    _cache().set(key, payload, get_chart_data_config()['TTL'])
+    return payload
+
+
+def get_charts(*names: str) -> Dict[str, dict]:
+    return {name: get_chart_data(name) for name in names}
+
+
+def invalidate_chart_data():
+    _cache().delete_many([f'chart-data:{name}' for name in CHARTS])
+
+
+def render_mode(request) -> str:
+    """
+    'client' - графіки малює браузер з JSON; 'server' - як раніше, HTML з Python;
+    'snapshot' - готовий HTML зі знімка (build_dashboard_snapshots).
+    """
+    mode = request.GET.get('render') or getattr(settings, 'DASHBOARD_RENDER_MODE', 'client')
+    return mode if mode in ('server', 'snapshot') else 'client'
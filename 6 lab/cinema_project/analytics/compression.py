@@ -0,0 +1,204 @@
+"""
+Стиснення відповідей gzip / brotli з LRU-кешем стиснених тіл.
+
+Файл однаковий у cinema_app і analytics лабораторної 6 (кожен зі своїм
+metrics.py): проєкти незалежні й не імпортують один одного, тож зміни
+вносяться в обидві копії в тому самому коміті.
+"""
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .metrics import CACHE_REQUESTS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_DEFAULTS = {
+    'ENABLED': True,
+    # Менші тіла не стискаємо: заголовки і CPU дорожчі за виграш
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    # LRU стиснутих тіл за хешем вмісту, щоб повторні відповіді не стискати знову
+    'CACHE_MAX_BYTES': 32 * 1024 * 1024,
+    'CACHE_MIN_SIZE': 8 * 1024,
+    'CACHE_CONTENT_TYPES': ('application/json',),
+    # Без text/html: сторінки з CSRF-токеном, стиснуті детерміновано, відкриті до BREACH
+    'CONTENT_TYPES': (
+        'application/json', 'application/javascript', 'text/css',
+        'text/plain', 'text/csv', 'image/svg+xml',
+    ),
+}
+
+
+def get_compression_config() -> dict:
+    return {**COMPRESSION_DEFAULTS, **getattr(settings, 'COMPRESSION', {})}
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Кодування з найбільшим q з Accept-Encoding; при рівних q - br перед gzip."""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, config: dict) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['BROTLI_QUALITY'])
+    # mtime=0 - однаковий вміст дає однакові байти
+    return gzip.compress(data, compresslevel=config['GZIP_LEVEL'], mtime=0)
+
+
+def _stream_compressor(encoding: str, config: dict):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['BROTLI_QUALITY'])
+        return (lambda chunk: compressor.process(chunk) + compressor.flush()), compressor.finish
+    compressor = zlib.compressobj(config['GZIP_LEVEL'], zlib.DEFLATED, 31)
+    # Z_SYNC_FLUSH після кожного шматка - клієнт отримує дані одразу, а не в кінці
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str, config: dict) -> Iterator[bytes]:
+    process, finish = _stream_compressor(encoding, config)
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def compress_async_stream(chunks, encoding: str, config: dict):
+    process, finish = _stream_compressor(encoding, config)
+    async for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+class CompressedBodyCache:
+    """LRU стиснутих тіл з обмеженням за сумарним розміром у байтах."""
+
+    def __init__(self):
+        self._items: 'OrderedDict[Tuple[str, bytes], bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, data: bytes, encoding: str, config: dict, content_type: str = '') -> bytes:
+        if (len(data) < config['CACHE_MIN_SIZE'] or not config['CACHE_MAX_BYTES']
+                or content_type not in config['CACHE_CONTENT_TYPES']):
+            return compress(data, encoding, config)
+
+        key = (encoding, hashlib.blake2b(data, digest_size=16).digest())
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None:
+                self._items.move_to_end(key)
+        if cached is not None:
+            CACHE_REQUESTS.inc('compression', 'hit')
+            return cached
+
+        CACHE_REQUESTS.inc('compression', 'miss')
+        compressed = compress(data, encoding, config)
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = compressed
+                self._size += len(compressed)
+            while self._size > config['CACHE_MAX_BYTES'] and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+        return compressed
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+compressed_bodies = CompressedBodyCache()
+
+
+def _content_type(response) -> str:
+    return response.get('Content-Type', '').split(';')[0].strip().lower()
+
+
+class CompressionMiddleware:
+    """
+    gzip/brotli за Accept-Encoding. Малі тіла і вже стиснуті відповіді
+    пропускаються, потокові стискаються по шматках, а стиснуті великі
+    JSON-тіла беруться з LRU, тож повторні однакові відповіді не стискаються знову.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        config = get_compression_config()
+        if not config['ENABLED'] or not self._compressible(response, config):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if getattr(response, 'is_async', False):
+                response.streaming_content = compress_async_stream(response.streaming_content, encoding, config)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding, config)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < config['MIN_SIZE']:
+                return response
+            compressed = compressed_bodies.get_or_compress(
+                response.content, encoding, config, _content_type(response)
+            )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # Стиснуте тіло вже не байт-у-байт те саме - сильний ETag стає слабким
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compressible(self, response, config) -> bool:
+        if response.has_header('Content-Encoding') or response.status_code in (204, 206, 304):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        return _content_type(response) in config['CONTENT_TYPES']
@@ -3,15 +3,17 @@ from bokeh.plotting import figure
 from bokeh.embed import components
 from bokeh.models import ColumnDataSource, HoverTool
 import pandas as pd
+from .chart_data import get_charts, render_mode
 from .models import Movie
+from .snapshots import snapshot_response
 
-def bokeh_dashboard(request):
+
+def build_bokeh_figure():
+    """Фігура середнього рейтингу за роками; None - немає даних."""
     movies_qs = Movie.objects.all().values('release_year', 'rating', 'title')
     df = pd.DataFrame(list(movies_qs))
 
-    script = None
-    div = "<div>Дані відсутні</div>"
-
+    p = None
     if not df.empty:
         df['rating'] = pd.to_numeric(df['rating'], errors='coerce').fillna(0)
         df = df.dropna(subset=['release_year'])
@@ -40,6 +42,30 @@ def bokeh_dashboard(request):
             ("Рейтинг", "@rating{0.2f}")
         ]))
 
-        script, div = components(p)
+    return p
+
+
+def build_bokeh_context(p=None):
+    if p is None:
+        p = build_bokeh_figure()
+    if p is None:
+        return {'script': None, 'div': "<div>Дані відсутні</div>"}
+    script, div = components(p)
+    return {'script': script, 'div': div}
+
+
+def bokeh_dashboard(request):
+    mode = render_mode(request)
+    if mode == 'snapshot':
+        response = snapshot_response('bokeh', 'all')
+        if response is not None:
+            return response
+        mode = 'client'
+
+    if mode == 'client':
+        return render(request, 'dashboard/bokeh.html', {
+            'client_render': True,
+            'charts': get_charts('rating-by-year')
+        })
 
-    return render(request, 'dashboard/bokeh.html', {'script': script, 'div': div})
\ No newline at end of file
+    return render(request, 'dashboard/bokeh.html', build_bokeh_context())
\ No newline at end of file
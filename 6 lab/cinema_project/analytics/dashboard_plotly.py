@@ -5,57 +5,59 @@ from plotly.offline import plot
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from .analytics_repositories import AnalyticsRepository
+from .chart_data import get_charts, render_mode
+from .snapshots import resolve_range, snapshot_response
+
+NO_DATA = "<div>Немає даних для відображення</div>"
 
-@login_required
-def analytics_dashboard(request):
 
-    genre_qs = AnalyticsRepository.get_revenue_by_genre()
+def build_plotly_figures(start=None, end=None):
+    """Фігури дашборду {'genre', 'month', 'hall'}; None - немає даних."""
+
+    genre_qs = AnalyticsRepository.get_revenue_by_genre(start, end)
     df_genre = pd.DataFrame(list(genre_qs.values('name', 'total_revenue', 'total_tickets')))
-    
+
+    fig_genre = None
     if not df_genre.empty:
         fig_genre = px.bar(
-            df_genre, 
-            x='name', 
+            df_genre,
+            x='name',
             y='total_revenue',
             color='total_tickets',
             title='Дохід по жанрах (колір - к-сть квитків)',
             labels={'name': 'Жанр', 'total_revenue': 'Дохід (грн)', 'total_tickets': 'Продано квитків'},
             template='plotly_white'
         )
-        plot_div_genre = plot(fig_genre, output_type='div', include_plotlyjs=False)
-    else:
-        plot_div_genre = "<div>Немає даних для відображення</div>"
 
-    month_qs = AnalyticsRepository.get_monthly_revenue_stats()
+    month_qs = AnalyticsRepository.get_monthly_revenue_stats(start, end)
     data_month = []
     for item in month_qs:
         data_month.append({
-            'month': item['month'].strftime('%Y-%m') if item['month'] else 'N/A',
+            'month': item['period'].strftime('%Y-%m') if item['period'] else 'N/A',
             'revenue': float(item['total_revenue'] or 0),
             'tickets': item['tickets_sold']
         })
     df_month = pd.DataFrame(data_month)
 
+    fig_month = None
     if not df_month.empty:
         fig_month = px.line(
-            df_month, 
-            x='month', 
+            df_month,
+            x='month',
             y='revenue',
             markers=True,
             title='Динаміка доходів по місяцях',
             labels={'month': 'Місяць', 'revenue': 'Дохід (грн)'},
             template='plotly_white'
         )
-        plot_div_month = plot(fig_month, output_type='div', include_plotlyjs=False)
-    else:
-        plot_div_month = "<div>Немає даних для відображення</div>"
 
-    hall_qs = AnalyticsRepository.get_hall_utilization()
+    hall_qs = AnalyticsRepository.get_hall_utilization(start, end)
     df_hall = pd.DataFrame(list(hall_qs.values('name', 'avg_occupancy_rate', 'capacity')))
-    
+
+    fig_hall = None
     if not df_hall.empty:
         df_hall['avg_occupancy_rate'] = df_hall['avg_occupancy_rate'].astype(float)
-        
+
         fig_hall = px.bar(
             df_hall,
             x='name',
@@ -67,15 +69,38 @@ def analytics_dashboard(request):
             template='plotly_white'
         )
         fig_hall.update_layout(yaxis_range=[0, 100])
-        plot_div_hall = plot(fig_hall, output_type='div', include_plotlyjs=False)
-    else:
-        plot_div_hall = "<div>Немає даних для відображення</div>"
 
+    return {'genre': fig_genre, 'month': fig_month, 'hall': fig_hall}
+
+
+def build_plotly_context(start=None, end=None, figures=None):
+    if figures is None:
+        figures = build_plotly_figures(start, end)
     context = {
-        'plot_div_genre': plot_div_genre,
-        'plot_div_month': plot_div_month,
-        'plot_div_hall': plot_div_hall,
-        'page_title': 'Cinema Analytics (Plotly)'
+        f'plot_div_{name}': plot(fig, output_type='div', include_plotlyjs=False) if fig is not None else NO_DATA
+        for name, fig in figures.items()
     }
-    
-    return render(request, 'analytics/dashboard.html', context)
\ No newline at end of file
+    context['page_title'] = 'Cinema Analytics (Plotly)'
+    return context
+
+
+@login_required
+def analytics_dashboard(request):
+    mode = render_mode(request)
+    range_name = request.GET.get('range', 'all')
+    start, end = resolve_range(range_name)
+    if mode == 'snapshot':
+        response = snapshot_response('plotly', range_name)
+        if response is not None:
+            return response
+        # Клієнтські графіки завжди за весь час - діапазон без знімка рендеримо на сервері
+        mode = 'client' if start is None and end is None else 'server'
+
+    if mode == 'client':
+        return render(request, 'analytics/dashboard.html', {
+            'client_render': True,
+            'charts': get_charts('genre-revenue', 'monthly-revenue', 'hall-utilization'),
+            'page_title': 'Cinema Analytics (Plotly)'
+        })
+
+    return render(request, 'analytics/dashboard.html', build_plotly_context(start, end))
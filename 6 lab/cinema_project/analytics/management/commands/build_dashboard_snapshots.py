@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.chart_data import invalidate_chart_data
+from analytics.rollups import refresh
+from analytics.snapshots import (
+    DASHBOARDS, build_snapshots, data_watermark, get_snapshot_config, snapshot_store,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Збирає HTML-знімки дашбордів для стандартних діапазонів дат. '
+        'Знімки перезбираються лише коли змінилися дані (або з --force). '
+        'Перенесення сеансів чи квитків без зміни кількостей і сум не '
+        'помітне - після такого запускайте з --force.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dashboard', action='append', choices=sorted(DASHBOARDS),
+                            help='Лише вказані дашборди (можна кілька разів).')
+        parser.add_argument('--range', action='append', dest='ranges',
+                            help='Лише вказані діапазони (можна кілька разів).')
+        parser.add_argument('--images', action='store_true',
+                            help='Також експортувати PNG/SVG графіків Plotly (потрібен kaleido).')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Повторювати кожні N секунд; 0 - один прохід.')
+        parser.add_argument('--force', action='store_true', help='Збирати навіть без змін у даних.')
+
+    def handle(self, *args, **options):
+        known = get_snapshot_config()['RANGES']
+        unknown = [name for name in options['ranges'] or [] if name not in known]
+        if unknown:
+            raise CommandError(f'Unknown ranges: {", ".join(unknown)} (available: {", ".join(known)})')
+
+        force = options['force']
+        while True:
+            self._run_once(options, force)
+            if not options['interval']:
+                break
+            force = False
+            time.sleep(options['interval'])
+
+    def _run_once(self, options, force):
+        watermark = data_watermark()
+        if not force and watermark == snapshot_store.read_watermark():
+            self.stdout.write('Data unchanged, snapshots are up to date')
+            return
+
+        # Дашборди читають rollup-и - спершу доганяємо їх до нових квитків
+        refresh()
+        invalidate_chart_data()
+        built = build_snapshots(options['dashboard'], options['ranges'], options['images'])
+        for meta in built:
+            images = f'  images={len(meta.images)}' if options['images'] else ''
+            self.stdout.write(
+                f'{meta.dashboard:<8} {meta.range:<6} {meta.build_ms:>9.1f} ms  '
+                f'queries={meta.queries:<3} db={meta.db_ms:.1f} ms  {meta.bytes:>9} B{images}'
+            )
+        snapshot_store.write_watermark(watermark)
+        self.stdout.write(self.style.SUCCESS(f'Built {len(built)} snapshots in {snapshot_store.root}'))
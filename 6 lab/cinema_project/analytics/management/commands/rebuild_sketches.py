@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.analytics_repositories import AnalyticsRepository
+from analytics.sketches import SKETCH_FACT_FIELDS, sketch_store
+
+
+class Command(BaseCommand):
+    help = (
+        'Перезбирає скетчі квитків (HyperLogLog, Count-Min, Space-Saving) '
+        'по днях і місяцях. Потрібно один раз, після масового імпорту чи '
+        'видалення квитків в обхід ORM і регулярно, якщо квитки продає '
+        'cinema_project - сигнали бачать лише зміни, зроблені цим проєктом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        chunks = AnalyticsRepository.iter_ticket_facts(chunk_size=options['chunk_size'], fields=SKETCH_FACT_FIELDS)
+        buckets = sketch_store.rebuild(chunks)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} sketch buckets in {elapsed:.1f} ms'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.chart_data import invalidate_chart_data
+from analytics.rollups import refresh
+from analytics.snapshots import build_snapshots, data_watermark, snapshot_store
+
+
+class Command(BaseCommand):
+    help = (
+        'Оновлює часові rollup-и продажів (година -> день -> місяць). '
+        'За замовчуванням інкрементально - лише бакети з новими квитками/сеансами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Перезібрати всі rollup-и (після скасувань чи змін квитків).')
+        parser.add_argument('--snapshots', action='store_true',
+                            help='Після оновлення перезібрати знімки дашбордів.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = refresh(full=options['full'])
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f'Rollups: hour={counts["hour"]} day={counts["day"]} month={counts["month"]} '
+            f'rows in {elapsed:.1f} ms'
+        )
+
+        # Дані дашбордів читаються з rollup-ів - кеш графіків уже застарів
+        invalidate_chart_data()
+        if options['snapshots']:
+            built = build_snapshots()
+            snapshot_store.write_watermark(data_watermark())
+            self.stdout.write(f'Rebuilt {len(built)} dashboard snapshots')
+        self.stdout.write(self.style.SUCCESS('Done'))
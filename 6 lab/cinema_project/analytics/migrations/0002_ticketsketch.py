@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Година'), ('day', 'День'), ('month', 'Місяць')], max_length=5)),
+                ('bucket', models.DateTimeField()),
+                ('tickets', models.BigIntegerField(default=0)),
+                ('customers', models.BinaryField()),
+                ('movies', models.BinaryField()),
+                ('movie_top', models.JSONField(default=list)),
+                ('genres', models.BinaryField()),
+                ('genre_top', models.JSONField(default=list)),
+            ],
+            options={
+                'db_table': 'TicketSketch',
+                'unique_together': {('granularity', 'bucket')},
+            },
+        ),
+    ]
@@ -180,4 +180,77 @@ class Ticket(models.Model):
         return f"Ticket #{self.ticket_id} - Seat {self.seat_number}"
 
     def __repr__(self):
-        return f"Ticket(id={self.ticket_id}, session_id={self.session_id}, customer_id={self.customer_id})"
\ No newline at end of file
+        return f"Ticket(id={self.ticket_id}, session_id={self.session_id}, customer_id={self.customer_id})"
+
+ROLLUP_GRANULARITIES = (
+    ('hour', 'Година'),
+    ('day', 'День'),
+    ('month', 'Місяць'),
+)
+
+
+class SalesRollup(models.Model):
+    """
+    Підсумки продажів за часовий бакет (за часом початку сеансу) у розрізі
+    фільм/зал. Годинні рядки будуються з квитків, денні - з годинних,
+    місячні - з денних (команда refresh_rollups).
+    """
+    granularity = models.CharField(max_length=5, choices=ROLLUP_GRANULARITIES)
+    bucket = models.DateTimeField()
+    movie = models.ForeignKey(Movie, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    hall = models.ForeignKey(Hall, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    genre = models.ForeignKey(Genre, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    sessions = models.PositiveIntegerField(default=0)
+    sold = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Суми по сеансах: ціна (для середньої), місткість залу і потенційний дохід
+    price_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    seats = models.PositiveIntegerField(default=0)
+    potential_revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'SalesRollup'
+        unique_together = (('granularity', 'bucket', 'movie', 'hall'),)
+
+    def __repr__(self):
+        return f"SalesRollup({self.granularity} {self.bucket}, movie_id={self.movie_id}, hall_id={self.hall_id})"
+
+
+class AudienceRollup(models.Model):
+    """Кількість унікальних покупців за бакет - не сумується, тож окремо для кожного рівня."""
+    granularity = models.CharField(max_length=5, choices=ROLLUP_GRANULARITIES)
+    bucket = models.DateTimeField()
+    unique_customers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'AudienceRollup'
+        unique_together = (('granularity', 'bucket'),)
+
+
+class RollupState(models.Model):
+    """Водяні знаки інкрементального оновлення: останні оброблені TicketID/SessionID."""
+    key = models.CharField(max_length=30, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'RollupState'
+
+
+class TicketSketch(models.Model):
+    """
+    Імовірнісні скетчі квитків за бакет (день або місяць за часом сеансу):
+    HyperLogLog покупців, Count-Min і Space-Saving по фільмах і жанрах.
+    Зливаються між бакетами - див. analytics.sketches.
+    """
+    granularity = models.CharField(max_length=5, choices=ROLLUP_GRANULARITIES)
+    bucket = models.DateTimeField()
+    tickets = models.BigIntegerField(default=0)
+    customers = models.BinaryField()
+    movies = models.BinaryField()
+    movie_top = models.JSONField(default=list)
+    genres = models.BinaryField()
+    genre_top = models.JSONField(default=list)
+
+    class Meta:
+        db_table = 'TicketSketch'
+        unique_together = (('granularity', 'bucket'),)
@@ -0,0 +1,210 @@
+"""
+Профілювання SQL-запитів - копія спільної частини cinema_app/profiling.py
+(без SamplingProfilerMiddleware). Проєкти лабораторних незалежні й не
+імпортують один одного, тож зміни вносяться в обидві копії в тому самому коміті.
+"""
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+DEFAULTS = {
+    'ENABLED': None,
+    'SLOW_QUERY_MS': 100,
+    'DUPLICATE_THRESHOLD': 3,
+    'QUERY_BUDGET': None,
+    'RAISE_ON_BUDGET': False,
+}
+
+
+def get_config() -> dict:
+    config = {**DEFAULTS, **getattr(settings, 'QUERY_PROFILING', {})}
+    if config['ENABLED'] is None:
+        config['ENABLED'] = settings.DEBUG
+    return config
+
+
+def fingerprint(sql: str) -> str:
+    """Нормалізує SQL до сигнатури: літерали та списки IN (...) замінюються на ?."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (?)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class QueryRecord:
+    sql: str
+    duration: float
+    many: bool = False
+    params: Any = None
+
+
+class QueryProfile:
+    """
+    Контекстний менеджер, що записує всі SQL-запити через
+    connection.execute_wrapper для кожного підключення.
+
+        with QueryProfile(budget=5) as profile:
+            client.get('/sessions/')
+        profile.duplicates
+    """
+
+    def __init__(self, slow_query_ms: Optional[float] = None,
+                 duplicate_threshold: Optional[int] = None,
+                 budget: Optional[int] = None, label: str = ''):
+        config = get_config()
+        self.slow_query_ms = config['SLOW_QUERY_MS'] if slow_query_ms is None else slow_query_ms
+        self.duplicate_threshold = (
+            config['DUPLICATE_THRESHOLD'] if duplicate_threshold is None else duplicate_threshold
+        )
+        self.budget = budget
+        self.label = label
+        self.queries: List[QueryRecord] = []
+        self.started_at: Optional[float] = None
+        self.elapsed = 0.0
+        self._stack: Optional[ExitStack] = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(QueryRecord(sql, time.perf_counter() - start, many, params))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.elapsed = time.perf_counter() - self.started_at
+        self._stack.close()
+        if exc_type is None and self.over_budget:
+            raise QueryBudgetExceeded(
+                f'{self.label or "block"} executed {self.count} queries '
+                f'(budget {self.budget}): {self.duplicates[:3]}'
+            )
+        return False
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def db_time(self) -> float:
+        return sum(query.duration for query in self.queries)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+    @property
+    def duplicates(self) -> List[Dict]:
+        groups = defaultdict(lambda: [0, 0.0])
+        for query in self.queries:
+            group = groups[fingerprint(query.sql)]
+            group[0] += 1
+            group[1] += query.duration
+        return sorted(
+            (
+                {'sql': sql, 'count': count, 'time_ms': round(total * 1000, 2)}
+                for sql, (count, total) in groups.items()
+                if count >= self.duplicate_threshold
+            ),
+            key=lambda group: -group['count']
+        )
+
+    @property
+    def slow_queries(self) -> List[Dict]:
+        threshold = self.slow_query_ms / 1000.0
+        return [
+            {'sql': query.sql, 'time_ms': round(query.duration * 1000, 2)}
+            for query in self.queries
+            if query.duration >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.count} queries", '
+            f'total;dur={self.elapsed * 1000:.2f}'
+        )
+
+    def summary(self) -> dict:
+        return {
+            'label': self.label,
+            'queries': self.count,
+            'db_ms': round(self.db_time * 1000, 2),
+            'total_ms': round(self.elapsed * 1000, 2),
+            'duplicates': self.duplicates,
+            'slow': self.slow_queries,
+            'budget': self.budget,
+        }
+
+
+def assert_max_queries(budget: int, label: str = '') -> QueryProfile:
+    return QueryProfile(budget=budget, label=label)
+
+
+class QueryProfilingMiddleware:
+    """
+    Рахує SQL-запити кожного запиту, додає заголовок Server-Timing та
+    пише JSON-рядок у лог `analytics.profiling`. Ліміт запитів задається
+    атрибутом `query_budget` на view або QUERY_PROFILING['QUERY_BUDGET'].
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        profile = QueryProfile(label=f'{request.method} {request.path}')
+        request.query_budget = config['QUERY_BUDGET']
+        with profile:
+            response = self.get_response(request)
+
+        profile.budget = getattr(request, 'query_budget', None)
+        summary = profile.summary()
+        summary['status'] = response.status_code
+        response['Server-Timing'] = profile.server_timing()
+
+        problems = profile.over_budget or summary['duplicates'] or summary['slow']
+        logger.log(
+            logging.WARNING if problems else logging.INFO,
+            json.dumps(summary, ensure_ascii=False)
+        )
+        if profile.over_budget and config['RAISE_ON_BUDGET']:
+            raise QueryBudgetExceeded(
+                f'{profile.label} executed {profile.count} queries (budget {profile.budget})'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+        if budget is not None:
+            request.query_budget = budget
+        return None
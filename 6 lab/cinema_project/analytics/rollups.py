@@ -0,0 +1,556 @@
+"""
+Ієрархія часових rollup-ів продажів: година -> день -> місяць.
+
+Діапазон [start, end) покривається найгрубшими бакетами, що повністю в нього
+вміщуються, а краї добираються дрібнішими: 30 днів - це ~30 денних рядків
+замість усіх квитків. Межі округлюються до години.
+
+Rollup-и доганяються у фоні (RollupRefresher): при читанні не частіше ніж раз
+на REFRESH_INTERVAL і одразу після збереження/видалення квитків і сеансів цього
+проєкту. До першого оновлення дані читаються живими запитами по сеансах.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (
+    Count, DecimalField, ExpressionWrapper, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, Trunc
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+
+from .models import AudienceRollup, RollupState, SalesRollup, Session, Ticket
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_DEFAULTS = {
+    # Фонове оновлення з читань і сигналів; False - лише refresh_rollups / build_dashboard_snapshots
+    'AUTO_REFRESH': True,
+    # Як часто (секунд) читання перевіряє нові квитки й сеанси
+    'REFRESH_INTERVAL': 60,
+}
+
+LEVELS = ('month', 'day', 'hour')
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+# Найгрубший рівень rollup-ів, з якого можна зібрати бакет такої гранулярності
+SOURCE_LEVEL = {'hour': 'hour', 'day': 'day', 'week': 'day', 'month': 'month'}
+
+BATCH_SIZE = 1000
+# Скільки діапазонів бакетів у одному OR-фільтрі при інкрементальному оновленні
+PERIODS_PER_QUERY = 200
+
+
+def get_rollup_config() -> dict:
+    return {**ROLLUP_DEFAULTS, **getattr(settings, 'ROLLUPS', {})}
+
+
+def floor(value: datetime, level: str) -> datetime:
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if level in ('day', 'week', 'month'):
+        value = value.replace(hour=0)
+    if level == 'week':
+        value -= timedelta(days=value.weekday())
+    if level == 'month':
+        value = value.replace(day=1)
+    return value
+
+
+def next_bucket(value: datetime, level: str) -> datetime:
+    if level == 'month':
+        return value.replace(year=value.year + value.month // 12, month=value.month % 12 + 1)
+    return value + {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[level]
+
+
+def ceil(value: datetime, level: str) -> datetime:
+    floored = floor(value, level)
+    return floored if floored == value else next_bucket(floored, level)
+
+
+def _local(value: Optional[datetime]) -> Optional[datetime]:
+    # Бакети в БД - у поточному часовому поясі (Trunc), тож і межі рахуємо в ньому
+    if value is not None and timezone.is_aware(value):
+        return timezone.localtime(value)
+    return value
+
+
+def _open_range(field: str, start: Optional[datetime], end: Optional[datetime]) -> Q:
+    q = Q()
+    if start is not None:
+        q &= Q(**{f'{field}__gte': start})
+    if end is not None:
+        q &= Q(**{f'{field}__lt': end})
+    return q
+
+
+def _bucket_range(level: str, start: Optional[datetime], end: Optional[datetime]) -> Q:
+    return Q(granularity=level) & _open_range('bucket', start, end)
+
+
+def _cover(start: Optional[datetime], end: Optional[datetime], levels: Sequence[str]) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    level, finer = levels[0], levels[1:]
+    if not finer:
+        return [(level, start, end)]
+
+    low = None if start is None else ceil(start, level)
+    high = None if end is None else floor(end, level)
+    if low is not None and high is not None and low >= high:
+        return _cover(start, end, finer)
+
+    ranges = [(level, low, high)]
+    if start is not None and start < low:
+        ranges += _cover(start, low, finer)
+    if end is not None and high < end:
+        ranges += _cover(high, end, finer)
+    return ranges
+
+
+def _bounds(start: Optional[datetime], end: Optional[datetime],
+            finest: str = 'hour') -> Tuple[Optional[datetime], Optional[datetime]]:
+    start, end = _local(start), _local(end)
+    return (
+        None if start is None else floor(start, finest),
+        None if end is None else ceil(end, finest),
+    )
+
+
+def cover_ranges(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 granularity: Optional[str] = None,
+                 levels: Sequence[str] = LEVELS) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """
+    (рівень, low, high) бакетів, що рівно один раз покривають [start, end);
+    межі округлюються до найдрібнішого з levels. Порожньо, якщо жоден із
+    levels не дрібніший за granularity.
+    """
+    coarsest = LEVELS.index(SOURCE_LEVEL[granularity] if granularity else 'month')
+    levels = [level for level in levels if LEVELS.index(level) >= coarsest]
+    if not levels:
+        return []
+    start, end = _bounds(start, end, levels[-1])
+    return _cover(start, end, levels)
+
+
+def cover(start: Optional[datetime] = None, end: Optional[datetime] = None,
+          granularity: Optional[str] = None) -> Q:
+    """Фільтр SalesRollup, що рівно один раз покриває [start, end)."""
+    return bucket_filter(cover_ranges(start, end, granularity))
+
+
+def bucket_filter(ranges: Iterable[Tuple[str, Optional[datetime], Optional[datetime]]]) -> Q:
+    q = Q()
+    for level, low, high in ranges:
+        q |= _bucket_range(level, low, high)
+    return q
+
+
+def _live_rows(start=None, end=None):
+    """Сеанси з тими ж полями, що й SalesRollup - поки rollup-и ще не зібрані."""
+    start, end = _bounds(start, end)
+    sold = (
+        Ticket.objects.filter(session_id=OuterRef('pk'))
+        .order_by().values('session_id')
+        .annotate(count=Count('ticket_id')).values('count')
+    )
+    money = DecimalField(max_digits=16, decimal_places=2)
+    return Session.objects.filter(_open_range('start_time', start, end)).annotate(
+        bucket=F('start_time'),
+        genre_id=F('movie__genre_id'),
+        genre_name=F('movie__genre__name'),
+        sessions=Value(1, output_field=IntegerField()),
+        sold=Coalesce(Subquery(sold, output_field=IntegerField()), 0),
+        revenue=ExpressionWrapper(F('price') * F('sold'), output_field=money),
+        price_total=F('price'),
+        seats=F('hall__capacity'),
+        potential_revenue=ExpressionWrapper(F('price') * F('hall__capacity'), output_field=money),
+    )
+
+
+def rollup_rows(start=None, end=None, granularity: Optional[str] = None):
+    """
+    Рядки rollup-ів за період (до першого оновлення - живі рядки сеансів);
+    з granularity - з полем 'period' для групування.
+    """
+    refresher.ensure_fresh()
+    if rollups_ready():
+        queryset = SalesRollup.objects.filter(cover(start, end, granularity)).annotate(genre_name=F('genre__name'))
+    else:
+        queryset = _live_rows(start, end)
+    if granularity:
+        queryset = queryset.annotate(period=Trunc('bucket', granularity))
+    return queryset
+
+
+def is_full_period(period: datetime, granularity: str, start=None, end=None) -> bool:
+    start, end = _bounds(start, end)
+    return ((start is None or start <= period)
+            and (end is None or next_bucket(period, granularity) <= end))
+
+
+def unique_customers(periods: Iterable[datetime], granularity: str, start=None, end=None) -> Dict[datetime, int]:
+    """
+    Унікальні покупці по періодах. Повні години/дні/місяці читаються з
+    AudienceRollup; тижні та обрізані краї діапазону рахуються по квитках
+    лише в межах свого періоду.
+    """
+    periods = list(periods)
+    stored = [
+        period for period in periods
+        if granularity in LEVELS and is_full_period(period, granularity, start, end)
+    ] if rollups_ready() else []
+    result = dict(
+        AudienceRollup.objects
+        .filter(granularity=granularity, bucket__in=stored)
+        .values_list('bucket', 'unique_customers')
+    ) if stored else {}
+
+    rest = [period for period in periods if period not in result]
+    if rest:
+        start, end = _bounds(start, end)
+        bounds = Q()
+        for period in rest:
+            low, high = period, next_bucket(period, granularity)
+            if start is not None:
+                low = max(low, start)
+            if end is not None:
+                high = min(high, end)
+            bounds |= Q(session__start_time__gte=low, session__start_time__lt=high)
+        result.update(
+            Ticket.objects.filter(bounds)
+            .annotate(period=Trunc('session__start_time', granularity))
+            .values('period')
+            .annotate(customers=Count('customer', distinct=True))
+            .values_list('period', 'customers')
+        )
+    return {period: result.get(period, 0) for period in periods}
+
+
+def parse_moment(value: Optional[str], field: str) -> Optional[datetime]:
+    """'2024-01-01' або ISO datetime."""
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, datetime.min.time()) if day else None
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise serializers.ValidationError({field: ['Must be a date (YYYY-MM-DD) or ISO datetime.']})
+    if settings.USE_TZ and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    if not settings.USE_TZ and timezone.is_aware(moment):
+        moment = timezone.make_naive(moment)
+    return moment
+
+
+def parse_period(params, default_granularity: Optional[str] = None) -> Tuple[Optional[datetime], Optional[datetime], Optional[str]]:
+    """?from=&to=&granularity= -> (start, end, granularity); to не включається."""
+    start = parse_moment(params.get('from'), 'from')
+    end = parse_moment(params.get('to'), 'to')
+    if start is not None and end is not None and start >= end:
+        raise serializers.ValidationError({'to': ['Must be later than "from".']})
+    granularity = params.get('granularity') or default_granularity
+    if granularity is not None and granularity not in GRANULARITIES:
+        raise serializers.ValidationError({'granularity': [f'Must be one of: {", ".join(GRANULARITIES)}.']})
+    return start, end, granularity
+
+
+def period_label(value: Optional[datetime], granularity: str) -> Optional[str]:
+    if value is None:
+        return None
+    return value.strftime({'hour': '%Y-%m-%dT%H:00', 'month': '%Y-%m'}.get(granularity, '%Y-%m-%d'))
+
+
+# ---------------------------------------------------------------- оновлення
+
+
+def _chunks(level: str, periods: Optional[Set[datetime]]) -> List[Optional[list]]:
+    """
+    Суміжні бакети зливаються в діапазони [low, high), по PERIODS_PER_QUERY
+    діапазонів на запит; None - повне перезбирання одним проходом.
+    """
+    if periods is None:
+        return [None]
+    ranges: List[list] = []
+    for period in sorted(periods):
+        end = next_bucket(period, level)
+        if ranges and ranges[-1][1] == period:
+            ranges[-1][1] = end
+        else:
+            ranges.append([period, end])
+    return [ranges[i:i + PERIODS_PER_QUERY] for i in range(0, len(ranges), PERIODS_PER_QUERY)]
+
+
+def _within(field: str, ranges: Optional[list]) -> Q:
+    q = Q()
+    for low, high in ranges or ():
+        q |= Q(**{f'{field}__gte': low, f'{field}__lt': high})
+    return q
+
+
+def _build_hourly(scope: Q) -> List[SalesRollup]:
+    # Один рядок на сеанс з кількістю квитків, далі сумуємо по (година, фільм, зал)
+    sessions = (
+        Session.objects.filter(scope)
+        .annotate(hour=Trunc('start_time', 'hour'), sold=Count('tickets'))
+        .values_list('hour', 'movie_id', 'hall_id', 'movie__genre_id', 'price', 'hall__capacity', 'sold')
+    )
+    rows: Dict[tuple, SalesRollup] = {}
+    for hour, movie_id, hall_id, genre_id, price, capacity, sold in sessions.iterator(chunk_size=BATCH_SIZE):
+        row = rows.get((hour, movie_id, hall_id))
+        if row is None:
+            row = rows[(hour, movie_id, hall_id)] = SalesRollup(
+                granularity='hour', bucket=hour, movie_id=movie_id, hall_id=hall_id, genre_id=genre_id,
+                revenue=Decimal(0), price_total=Decimal(0), potential_revenue=Decimal(0),
+            )
+        row.sessions += 1
+        row.sold += sold
+        row.revenue += price * sold
+        row.price_total += price
+        row.seats += capacity
+        row.potential_revenue += price * capacity
+    return list(rows.values())
+
+
+def _build_from(level: str, source: str, scope: Q) -> List[SalesRollup]:
+    grouped = (
+        SalesRollup.objects.filter(scope, granularity=source)
+        .annotate(period=Trunc('bucket', level))
+        .values('period', 'movie_id', 'hall_id', 'genre_id')
+        .annotate(
+            total_sessions=Sum('sessions'), total_sold=Sum('sold'), total_revenue=Sum('revenue'),
+            total_price=Sum('price_total'), total_seats=Sum('seats'), total_potential=Sum('potential_revenue'),
+        )
+    )
+    return [
+        SalesRollup(
+            granularity=level, bucket=row['period'], movie_id=row['movie_id'], hall_id=row['hall_id'],
+            genre_id=row['genre_id'], sessions=row['total_sessions'], sold=row['total_sold'],
+            revenue=row['total_revenue'], price_total=row['total_price'], seats=row['total_seats'],
+            potential_revenue=row['total_potential'],
+        )
+        for row in grouped.iterator(chunk_size=BATCH_SIZE)
+    ]
+
+
+def _build_audience(level: str, scope: Q) -> List[AudienceRollup]:
+    grouped = (
+        Ticket.objects.filter(scope)
+        .annotate(period=Trunc('session__start_time', level))
+        .values('period')
+        .annotate(customers=Count('customer', distinct=True))
+    )
+    return [
+        AudienceRollup(granularity=level, bucket=row['period'], unique_customers=row['customers'])
+        for row in grouped
+    ]
+
+
+def _touched_hours(ticket_mark: int, session_mark: int) -> Set[datetime]:
+    changed = Q(session_id__gt=session_mark) | Q(
+        session_id__in=Ticket.objects.filter(ticket_id__gt=ticket_mark).values('session_id')
+    )
+    return set(
+        Session.objects.filter(changed)
+        .annotate(hour=Trunc('start_time', 'hour'))
+        .values_list('hour', flat=True)
+        .distinct()
+    )
+
+
+def _watermarks() -> Tuple[int, int]:
+    return (
+        Ticket.objects.aggregate(value=Max('ticket_id'))['value'] or 0,
+        Session.objects.aggregate(value=Max('session_id'))['value'] or 0,
+    )
+
+
+_ready = threading.Event()
+
+
+def rollups_ready() -> bool:
+    """Чи було хоч одне оновлення rollup-ів (до нього читаємо живі запити)."""
+    if not _ready.is_set() and RollupState.objects.filter(key='ticket').exists():
+        _ready.set()
+    return _ready.is_set()
+
+
+def rollup_status() -> Dict[str, object]:
+    """Джерело даних і водяні знаки - для заголовків відповідей API."""
+    states = dict(RollupState.objects.values_list('key', 'value'))
+    return {
+        'source': 'rollups' if 'ticket' in states else 'live',
+        'refreshed_at': states.get('refreshed_at'),
+        'ticket': states.get('ticket'),
+        'session': states.get('session'),
+    }
+
+
+def refresh(full: bool = False, hours: Iterable[datetime] = ()) -> Dict[str, int]:
+    """
+    Оновлює rollup-и. Інкрементально перезбираються лише години (і дні/місяці,
+    що їх містять) із сеансами або квитками новішими за водяні знаки, а також
+    передані hours. Скасовані/змінені в обхід цього проєкту квитки водяні
+    знаки не бачать - для них full=True.
+    """
+    RollupState.objects.get_or_create(key='lock')
+    counts = {}
+    with transaction.atomic():
+        # Одне оновлення за раз на всі процеси; стан читаємо вже під блокуванням
+        list(RollupState.objects.select_for_update().filter(key='lock'))
+        states = dict(RollupState.objects.values_list('key', 'value'))
+        ticket_mark, session_mark = _watermarks()
+        if 'ticket' not in states:
+            full = True
+
+        if full:
+            touched = {level: None for level in LEVELS}
+        else:
+            hours = _touched_hours(states.get('ticket', 0), states.get('session', 0)) | set(hours)
+            touched = {
+                'hour': hours,
+                'day': {floor(hour, 'day') for hour in hours},
+                'month': {floor(hour, 'month') for hour in hours},
+            }
+
+        for level, source in (('hour', None), ('day', 'hour'), ('month', 'day')):
+            created = 0
+            for ranges in _chunks(level, touched[level]):
+                buckets = _within('bucket', ranges)
+                SalesRollup.objects.filter(buckets, granularity=level).delete()
+                AudienceRollup.objects.filter(buckets, granularity=level).delete()
+                if source is None:
+                    rows = _build_hourly(_within('start_time', ranges))
+                else:
+                    rows = _build_from(level, source, buckets)
+                created += len(SalesRollup.objects.bulk_create(rows, batch_size=BATCH_SIZE))
+                AudienceRollup.objects.bulk_create(
+                    _build_audience(level, _within('session__start_time', ranges)), batch_size=BATCH_SIZE
+                )
+            counts[level] = created
+
+        for key, value in (('ticket', ticket_mark), ('session', session_mark), ('refreshed_at', int(time.time()))):
+            RollupState.objects.update_or_create(key=key, defaults={'value': value})
+    _ready.set()
+    refresher.checked()
+    return counts
+
+
+class RollupRefresher:
+    """
+    Фонове інкрементальне оновлення в процесі - не більше одного потоку.
+    Квитки, додані cinema_project (та сама БД), підхоплюються водяними
+    знаками при наступній перевірці; їх видалення - лише refresh_rollups --full.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hours: Set[datetime] = set()
+        self._checked_at: Optional[float] = None
+        self._running = False
+        self._again = False
+
+    def checked(self):
+        self._checked_at = time.monotonic()
+
+    def ensure_fresh(self):
+        config = get_rollup_config()
+        if not config['AUTO_REFRESH']:
+            return
+        if self._checked_at is not None and time.monotonic() - self._checked_at < config['REFRESH_INTERVAL']:
+            return
+        self._start()
+
+    def mark(self, hours: Iterable[datetime]):
+        if not get_rollup_config()['AUTO_REFRESH']:
+            return
+        with self._lock:
+            self._hours.update(hours)
+        self._start()
+
+    def _start(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._running:
+                self._again = True
+                return
+            self._running = True
+        threading.Thread(target=self._run, name='rollup-refresh', daemon=True).start()
+
+    def _run(self):
+        from .chart_data import invalidate_chart_data
+        try:
+            while True:
+                with self._lock:
+                    hours, self._hours, self._again = self._hours, set(), False
+                try:
+                    counts = refresh(hours=hours)
+                    if hours or any(counts.values()):
+                        invalidate_chart_data()
+                except Exception:
+                    logger.exception('background rollup refresh failed')
+                    with self._lock:
+                        # Години повернуться в роботу з наступним запуском
+                        self._hours |= hours
+                        self._running = False
+                    return
+                with self._lock:
+                    if not self._again and not self._hours:
+                        self._running = False
+                        return
+        finally:
+            connection.close()
+
+
+refresher = RollupRefresher()
+
+
+def _session_hour(session_id: int) -> Set[datetime]:
+    start_time = Session.objects.filter(pk=session_id).values_list('start_time', flat=True).first()
+    return set() if start_time is None else {floor(_local(start_time), 'hour')}
+
+
+def _ticket_saving(sender, instance, **kwargs):
+    # Година сеансу, з якого квиток переносять, теж застаріє
+    if instance.pk is not None and get_rollup_config()['AUTO_REFRESH']:
+        session_id = Ticket.objects.filter(pk=instance.pk).values_list('session_id', flat=True).first()
+        instance._rollup_previous_hours = set() if session_id is None else _session_hour(session_id)
+
+
+def _session_saving(sender, instance, **kwargs):
+    # Година, з якої сеанс переносять, теж застаріє
+    if instance.pk is not None and get_rollup_config()['AUTO_REFRESH']:
+        instance._rollup_previous_hours = _session_hour(instance.pk)
+
+
+def _ticket_changed(sender, instance, **kwargs):
+    if not get_rollup_config()['AUTO_REFRESH']:
+        return
+    # Нові квитки видно за водяним знаком; змінені/видалені - перезбираємо годину сеансу
+    hours = set() if kwargs.get('created') else _session_hour(instance.session_id)
+    hours |= instance.__dict__.pop('_rollup_previous_hours', set())
+    transaction.on_commit(lambda: refresher.mark(hours), robust=True)
+
+
+def _session_changed(sender, instance, **kwargs):
+    if not get_rollup_config()['AUTO_REFRESH']:
+        return
+    hours = {floor(_local(instance.start_time), 'hour')} | instance.__dict__.pop('_rollup_previous_hours', set())
+    transaction.on_commit(lambda: refresher.mark(hours), robust=True)
+
+
+pre_save.connect(_ticket_saving, sender=Ticket, dispatch_uid='analytics_rollup_ticket_saving')
+pre_save.connect(_session_saving, sender=Session, dispatch_uid='analytics_rollup_session_saving')
+post_save.connect(_ticket_changed, sender=Ticket, dispatch_uid='analytics_rollup_ticket_saved')
+post_delete.connect(_ticket_changed, sender=Ticket, dispatch_uid='analytics_rollup_ticket_deleted')
+post_save.connect(_session_changed, sender=Session, dispatch_uid='analytics_rollup_session_saved')
+post_delete.connect(_session_changed, sender=Session, dispatch_uid='analytics_rollup_session_deleted')
+
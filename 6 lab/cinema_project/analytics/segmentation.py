@@ -0,0 +1,213 @@
+"""
+RFM-сегментація клієнтів на pandas/NumPy.
+
+Факти квитків читаються партіями (AnalyticsRepository.iter_ticket_facts) і
+одразу згортаються до стану по клієнтах, тож пам'ять залежить від кількості
+клієнтів, а не квитків. Улюблений жанр - справжній argmax кількості квитків
+по жанрах. Сегменти за весь час кешуються в процесі й доганяються лише
+новими квитками (водяний знак TicketID).
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from .analytics_repositories import AnalyticsRepository
+
+SEGMENTATION_DEFAULTS = {
+    'CHUNK_SIZE': 100_000,
+    # Як часто (секунд) перевіряти нові квитки для закешованих сегментів
+    'REFRESH_INTERVAL': 60,
+    # Мінімум квитків для f = 2..5. Частота - фіксовані пороги: у більшості
+    # клієнтів кінотеатру один квиток, і квінтилі за рангом злипаються
+    'FREQUENCY_THRESHOLDS': (2, 3, 5, 10),
+}
+
+FACT_COLUMNS = ['ticket_id', 'customer_id', 'genre_id', 'price', 'visit', 'purchase_date']
+
+# Перша умова, що виконалась, визначає сегмент; r/m - квінтилі 1..5, f - пороги 1..5
+SEGMENT_RULES = (
+    ('champions', lambda r, f, m: (r >= 4) & (f >= 4) & (m >= 4)),
+    ('loyal', lambda r, f, m: f >= 4),
+    ('new', lambda r, f, m: (r >= 4) & (f <= 1)),
+    ('promising', lambda r, f, m: r >= 4),
+    ('at_risk', lambda r, f, m: (r <= 2) & (f >= 3)),
+    ('hibernating', lambda r, f, m: r <= 2),
+)
+DEFAULT_SEGMENT = 'regular'
+SEGMENTS = tuple(name for name, _ in SEGMENT_RULES) + (DEFAULT_SEGMENT,)
+
+
+def get_segmentation_config() -> dict:
+    return {**SEGMENTATION_DEFAULTS, **getattr(settings, 'SEGMENTATION', {})}
+
+
+def _empty_state() -> Tuple[pd.DataFrame, pd.Series]:
+    customers = pd.DataFrame(
+        {
+            'tickets': pd.Series(dtype='int64'),
+            'spent': pd.Series(dtype='float64'),
+            'first_purchase': pd.Series(dtype='float64'),
+            'last_purchase': pd.Series(dtype='float64'),
+            'last_visit': pd.Series(dtype='datetime64[ns]'),
+        },
+        index=pd.Index([], dtype='int64', name='customer_id'),
+    )
+    genres = pd.Series(
+        dtype='int64',
+        index=pd.MultiIndex.from_arrays([[], []], names=['customer_id', 'genre_id']),
+    )
+    return customers, genres
+
+
+def _frame(rows: list) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(rows, columns=FACT_COLUMNS)
+    frame['price'] = frame['price'].astype('float64')
+    frame['purchase_date'] = frame['purchase_date'].astype('float64')
+    visit = pd.to_datetime(frame['visit'])
+    if visit.dt.tz is not None:
+        visit = visit.dt.tz_convert(timezone.get_current_timezone()).dt.tz_localize(None)
+    frame['visit'] = visit.astype('datetime64[ns]')
+    return frame
+
+
+def _fold(state: Tuple[pd.DataFrame, pd.Series], rows: list) -> Tuple[pd.DataFrame, pd.Series]:
+    """Згортає партію фактів у стан (по клієнтах, по парах клієнт-жанр)."""
+    customers, genres = state
+    frame = _frame(rows)
+    chunk = frame.groupby('customer_id').agg(
+        tickets=('ticket_id', 'size'),
+        spent=('price', 'sum'),
+        first_purchase=('purchase_date', 'min'),
+        last_purchase=('purchase_date', 'max'),
+        last_visit=('visit', 'max'),
+    )
+    customers = pd.concat([customers, chunk]).groupby(level=0).agg({
+        'tickets': 'sum',
+        'spent': 'sum',
+        'first_purchase': 'min',
+        'last_purchase': 'max',
+        'last_visit': 'max',
+    })
+    genre_counts = frame.groupby(['customer_id', 'genre_id']).size()
+    genres = genres.add(genre_counts, fill_value=0).astype('int64')
+    return customers, genres
+
+
+def _quintile(values: pd.Series) -> np.ndarray:
+    # Рівні за розміром групи за рангом; однакові значення - в одній групі з
+    # найменшим рангом, тож масові мінімальні значення лишаються в балі 1
+    if values.empty:
+        return np.zeros(0, dtype='int64')
+    ranks = values.rank(method='min').to_numpy()
+    return np.clip(np.ceil(ranks * 5 / len(values)), 1, 5).astype('int64')
+
+
+def _frequency_score(tickets: pd.Series, thresholds) -> np.ndarray:
+    return (np.searchsorted(np.asarray(thresholds), tickets.to_numpy(), side='right') + 1).astype('int64')
+
+
+def _favorite_genres(genres: pd.Series) -> pd.Series:
+    # argmax по жанрах; при рівних кількостях - менший GenreID
+    ranked = genres.rename('count').reset_index().sort_values(
+        ['customer_id', 'count', 'genre_id'], ascending=[True, False, True]
+    )
+    return ranked.drop_duplicates('customer_id').set_index('customer_id')['genre_id']
+
+
+def score(state: Tuple[pd.DataFrame, pd.Series], now: Optional[datetime] = None) -> pd.DataFrame:
+    """Таблиця сегментів по клієнтах, відсортована за сумою витрат."""
+    customers, genres = state
+    segments = customers.copy()
+    if now is None:
+        now = timezone.localtime() if settings.USE_TZ else datetime.now()
+    reference = np.datetime64(now.replace(tzinfo=None), 'ns')
+    segments['recency_days'] = ((reference - segments['last_visit'].to_numpy()) / np.timedelta64(1, 'D')).astype('float64')
+    segments['avg_ticket_price'] = segments['spent'] / segments['tickets']
+    segments['favorite_genre_id'] = _favorite_genres(genres).reindex(segments.index)
+
+    r = _quintile(-segments['recency_days'])
+    f = _frequency_score(segments['tickets'], get_segmentation_config()['FREQUENCY_THRESHOLDS'])
+    m = _quintile(segments['spent'])
+    segments['r_score'], segments['f_score'], segments['m_score'] = r, f, m
+    segments['rfm_score'] = r * 100 + f * 10 + m
+    segments['segment'] = np.select(
+        [rule(r, f, m) for _, rule in SEGMENT_RULES],
+        [name for name, _ in SEGMENT_RULES],
+        default=DEFAULT_SEGMENT,
+    )
+    return segments.sort_values('spent', ascending=False, kind='stable')
+
+
+def fold_facts(chunks: Iterable[list]) -> Tuple[pd.DataFrame, pd.Series]:
+    state = _empty_state()
+    for rows in chunks:
+        state = _fold(state, rows)
+    return state
+
+
+def compute_segments(start=None, end=None, now: Optional[datetime] = None) -> pd.DataFrame:
+    """Сегменти лише за квитками сеансів у [start, end) - без кешу."""
+    chunk_size = get_segmentation_config()['CHUNK_SIZE']
+    return score(fold_facts(AnalyticsRepository.iter_ticket_facts(0, chunk_size, start, end)), now)
+
+
+class SegmentationEngine:
+    """
+    Сегменти за весь час у пам'яті процесу. Не частіше ніж раз на
+    REFRESH_INTERVAL стан доганяється квитками з TicketID > водяного знака;
+    бали перераховуються, якщо були нові квитки або змінилася дата.
+    Видалені/змінені квитки водяний знак не бачить - для них rebuild().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = _empty_state()
+        self._watermark = 0
+        self._segments: Optional[pd.DataFrame] = None
+        self._scored_on = None
+        self._checked_at = 0.0
+
+    @property
+    def watermark(self) -> int:
+        return self._watermark
+
+    def segments(self) -> pd.DataFrame:
+        config = get_segmentation_config()
+        with self._lock:
+            if self._segments is None or time.monotonic() - self._checked_at >= config['REFRESH_INTERVAL']:
+                self._update(config['CHUNK_SIZE'])
+            return self._segments
+
+    def rebuild(self) -> pd.DataFrame:
+        with self._lock:
+            self._state, self._watermark, self._segments = _empty_state(), 0, None
+            self._update(get_segmentation_config()['CHUNK_SIZE'])
+            return self._segments
+
+    def _update(self, chunk_size: int):
+        changed = False
+        for rows in AnalyticsRepository.iter_ticket_facts(self._watermark, chunk_size):
+            self._state = _fold(self._state, rows)
+            self._watermark = rows[-1][0]
+            changed = True
+
+        today = timezone.localdate() if settings.USE_TZ else datetime.now().date()
+        if changed or self._segments is None or self._scored_on != today:
+            self._segments = score(self._state)
+            self._scored_on = today
+        self._checked_at = time.monotonic()
+
+
+segmentation_engine = SegmentationEngine()
+
+
+def customer_segments(start=None, end=None) -> pd.DataFrame:
+    if start is None and end is None:
+        return segmentation_engine.segments()
+    return compute_segments(start, end)
@@ -0,0 +1,533 @@
+"""
+Імовірнісні скетчі квитків для наближеної аналітики (?approx=1).
+
+На кожен денний і місячний бакет (за часом сеансу) зберігаються:
+
+* HyperLogLog покупців - унікальні покупці з відносною стандартною
+  похибкою 1.04 / sqrt(2 ** HLL_PRECISION) (~1.6% для 12);
+* Count-Min по фільмах і жанрах - оцінка кількості квитків ніколи не
+  менша за точну і з імовірністю 1 - CMS_DELTA перевищує її не більше
+  ніж на CMS_EPSILON * N (N - усі квитки діапазону);
+* Space-Saving (TOP_K лічильників) - кандидати в топ: кожен ключ із
+  часткою квитків > N / TOP_K гарантовано в ньому, а похибка кожного
+  лічильника зберігається окремо.
+
+Усі три структури зливаються (max / сума / злиття лічильників), тож
+діапазон збирається з місячних і денних бакетів. Новий квиток зливається
+в БД сигналом post_save одразу після коміту. Відняти квиток зі скетча не
+можна, тому видалений чи змінений квиток і перенесений на інший день
+сеанс перезбирають свої дні з БД, а їхні місяці - злиттям днів. Зміни в
+обхід цього проєкту (cinema_project на тій самій БД, імпорт SQL) сигналів
+не дають - після них потрібна команда rebuild_sketches, інакше межі
+похибки стосуються лише врахованих квитків.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .models import Session, Ticket, TicketSketch
+from .rollups import bucket_filter, cover_ranges, floor, next_bucket
+
+SKETCH_DEFAULTS = {
+    'HLL_PRECISION': 12,
+    'CMS_EPSILON': 0.01,
+    'CMS_DELTA': 0.01,
+    'TOP_K': 64,
+}
+
+SKETCH_LEVELS = ('month', 'day')
+# Одиниці datetime64 для округлення бакетів у NumPy
+_NUMPY_UNITS = {'month': 'M', 'day': 'D'}
+SKETCH_FACT_FIELDS = (
+    'ticket_id', 'customer_id', 'session__movie_id',
+    'session__movie__genre_id', 'session__start_time',
+)
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def get_sketch_config() -> dict:
+    return {**SKETCH_DEFAULTS, **getattr(settings, 'SKETCHES', {})}
+
+
+def mix64(keys, seed: int = 0) -> np.ndarray:
+    """splitmix64 - швидкий векторний хеш цілих ключів."""
+    with np.errstate(over='ignore'):
+        z = np.asarray(keys, dtype=np.uint64) + np.uint64((0x9E3779B97F4A7C15 * (seed + 1)) & 0xFFFFFFFFFFFFFFFF)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (z ^ (z >> np.uint64(31))) & _MASK64
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    values = values.copy()
+    length = np.zeros(values.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= (np.uint64(1) << np.uint64(shift))
+        length[high] += shift
+        values[high] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+class HyperLogLog:
+
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def add_many(self, keys):
+        hashes = mix64(keys)
+        if not hashes.size:
+            return
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Позиція першої одиниці в решті бітів (1 - старший біт)
+        rank = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Мала кардинальність - точніше лінійний підрахунок
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        registers = np.frombuffer(bytes(data), dtype=np.uint8).copy()
+        return cls(int(len(registers)).bit_length() - 1, registers)
+
+
+class CountMinSketch:
+
+    def __init__(self, width: int, depth: int, counters: Optional[np.ndarray] = None):
+        self.width, self.depth = width, depth
+        self.counters = np.zeros((depth, width), dtype=np.uint32) if counters is None else counters
+
+    @classmethod
+    def for_error(cls, epsilon: float, delta: float) -> 'CountMinSketch':
+        return cls(int(np.ceil(np.e / epsilon)), int(np.ceil(np.log(1 / delta))))
+
+    def _columns(self, keys) -> np.ndarray:
+        # Подвійне хешування: рядок i - (h1 + i * h2) mod width
+        first, second = mix64(keys, 1), mix64(keys, 2) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        with np.errstate(over='ignore'):
+            return ((first[None, :] + rows * second[None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def add_many(self, keys, counts=None):
+        keys = np.asarray(keys, dtype=np.uint64)
+        if not keys.size:
+            return
+        counts = np.ones(keys.shape, dtype=np.uint32) if counts is None else np.asarray(counts, dtype=np.uint32)
+        for row, columns in enumerate(self._columns(keys)):
+            np.add.at(self.counters[row], columns, counts)
+
+    def estimate_many(self, keys) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.uint64)
+        if not keys.size:
+            return np.zeros(0, dtype=np.int64)
+        columns = self._columns(keys)
+        return self.counters[np.arange(self.depth)[:, None], columns].min(axis=0).astype(np.int64)
+
+    def merge(self, other: 'CountMinSketch') -> 'CountMinSketch':
+        self.counters += other.counters
+        return self
+
+    def to_bytes(self) -> bytes:
+        return np.array([self.width, self.depth], dtype=np.uint32).tobytes() + self.counters.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CountMinSketch':
+        data = bytes(data)
+        width, depth = (int(value) for value in np.frombuffer(data[:8], dtype=np.uint32))
+        counters = np.frombuffer(data[8:], dtype=np.uint32).reshape(depth, width).copy()
+        return cls(width, depth, counters)
+
+
+class SpaceSaving:
+    """Не більше k лічильників {ключ: [оцінка, похибка]}; оцінка - верхня межа."""
+
+    def __init__(self, k: int, items: Optional[Dict[int, List[int]]] = None):
+        self.k = k
+        self.items: Dict[int, List[int]] = items or {}
+
+    def _floor(self) -> int:
+        # Ключ поза повним summary зустрічався не частіше за мінімальний лічильник
+        return min(count for count, _ in self.items.values()) if len(self.items) >= self.k else 0
+
+    def add_many(self, keys, counts):
+        for key, count in zip(np.asarray(keys).tolist(), np.asarray(counts).tolist()):
+            item = self.items.get(key)
+            if item is not None:
+                item[0] += count
+            elif len(self.items) < self.k:
+                self.items[key] = [count, 0]
+            else:
+                evicted = min(self.items, key=lambda name: self.items[name][0])
+                minimum = self.items.pop(evicted)[0]
+                self.items[key] = [minimum + count, minimum]
+
+    def merge(self, other: 'SpaceSaving') -> 'SpaceSaving':
+        own_floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for key in self.items.keys() | other.items.keys():
+            own = self.items.get(key, [own_floor, own_floor])
+            theirs = other.items.get(key, [other_floor, other_floor])
+            merged[key] = [own[0] + theirs[0], own[1] + theirs[1]]
+        top = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:self.k]
+        self.items = dict(top)
+        return self
+
+    def top(self, n: int) -> List[Tuple[int, int, int]]:
+        ranked = sorted(self.items.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(key, count, error) for key, (count, error) in ranked[:n]]
+
+    def to_list(self) -> list:
+        return [[key, count, error] for key, (count, error) in self.items.items()]
+
+    @classmethod
+    def from_list(cls, k: int, items: list) -> 'SpaceSaving':
+        return cls(k, {key: [count, error] for key, count, error in items})
+
+
+class BucketSketch:
+    """Скетчі одного бакета або злиття кількох."""
+
+    def __init__(self, config: Optional[dict] = None):
+        config = config or get_sketch_config()
+        self.k = config['TOP_K']
+        self.tickets = 0
+        self.customers = HyperLogLog(config['HLL_PRECISION'])
+        self.frequencies = {
+            kind: CountMinSketch.for_error(config['CMS_EPSILON'], config['CMS_DELTA'])
+            for kind in ('movies', 'genres')
+        }
+        self.candidates = {kind: SpaceSaving(self.k) for kind in ('movies', 'genres')}
+
+    def add_many(self, customer_ids, movie_ids, genre_ids):
+        self.tickets += len(customer_ids)
+        self.customers.add_many(customer_ids)
+        for kind, ids in (('movies', movie_ids), ('genres', genre_ids)):
+            keys, counts = np.unique(np.asarray(ids, dtype=np.int64), return_counts=True)
+            self.frequencies[kind].add_many(keys, counts)
+            self.candidates[kind].add_many(keys, counts)
+
+    def merge(self, other: 'BucketSketch') -> 'BucketSketch':
+        self.tickets += other.tickets
+        self.customers.merge(other.customers)
+        for kind in ('movies', 'genres'):
+            self.frequencies[kind].merge(other.frequencies[kind])
+            self.candidates[kind].merge(other.candidates[kind])
+        return self
+
+    def top(self, kind: str, n: int) -> List[dict]:
+        """
+        Топ за Space-Saving; оцінка - менша з верхніх меж Space-Saving і
+        Count-Min, нижня межа - лічильник Space-Saving мінус його похибка.
+        """
+        candidates = self.candidates[kind].top(self.k)
+        if not candidates:
+            return []
+        keys = np.array([key for key, _, _ in candidates], dtype=np.uint64)
+        estimates = self.frequencies[kind].estimate_many(keys)
+        ranked = sorted(
+            (
+                {'id': key, 'tickets_sold': int(min(count, estimate)), 'lower_bound': int(count - error)}
+                for (key, count, error), estimate in zip(candidates, estimates)
+            ),
+            key=lambda item: (-item['tickets_sold'], item['id']),
+        )
+        return ranked[:n]
+
+    def to_fields(self) -> dict:
+        return {
+            'tickets': self.tickets,
+            'customers': self.customers.to_bytes(),
+            'movies': self.frequencies['movies'].to_bytes(),
+            'movie_top': self.candidates['movies'].to_list(),
+            'genres': self.frequencies['genres'].to_bytes(),
+            'genre_top': self.candidates['genres'].to_list(),
+        }
+
+    @classmethod
+    def from_row(cls, row: TicketSketch, config: Optional[dict] = None) -> 'BucketSketch':
+        sketch = cls(config)
+        sketch.tickets = row.tickets
+        sketch.customers = HyperLogLog.from_bytes(row.customers)
+        sketch.frequencies = {
+            'movies': CountMinSketch.from_bytes(row.movies),
+            'genres': CountMinSketch.from_bytes(row.genres),
+        }
+        sketch.candidates = {
+            'movies': SpaceSaving.from_list(sketch.k, row.movie_top),
+            'genres': SpaceSaving.from_list(sketch.k, row.genre_top),
+        }
+        return sketch
+
+
+def _local_naive(moment):
+    # Бакети - у поточному часовому поясі, як і rollup-и
+    return timezone.localtime(moment).replace(tzinfo=None) if settings.USE_TZ else moment
+
+
+def _bucket_key(moment, level: str):
+    bucket = floor(moment, level)
+    if settings.USE_TZ:
+        bucket = timezone.make_aware(bucket)
+    return level, bucket
+
+
+def _local_moments(values: Sequence) -> np.ndarray:
+    moments = pd.DatetimeIndex(pd.to_datetime(list(values)))
+    if moments.tz is not None:
+        moments = moments.tz_convert(timezone.get_current_timezone()).tz_localize(None)
+    return moments.values.astype('datetime64[ns]')
+
+
+class SketchStore:
+    """
+    Скетчі в БД (TicketSketch). Внесок нового квитка зливається в рядки його
+    дня і місяця під select_for_update - злиття комутативне, тож процеси не
+    затирають внески один одного і нічого не лишається в пам'яті процесу.
+    """
+
+    def add_ticket(self, customer_id: int, movie_id: int, genre_id: int, start_time):
+        sketches = {}
+        config = get_sketch_config()
+        for level in SKETCH_LEVELS:
+            sketch = sketches[_bucket_key(_local_naive(start_time), level)] = BucketSketch(config)
+            sketch.add_many([customer_id], [movie_id], [genre_id])
+        self.merge(sketches)
+
+    def merge(self, sketches: Dict[Tuple[str, object], BucketSketch]):
+        with transaction.atomic():
+            for (level, bucket), sketch in sorted(sketches.items(), key=lambda item: item[0]):
+                row, created = TicketSketch.objects.select_for_update().get_or_create(
+                    granularity=level, bucket=bucket, defaults=sketch.to_fields()
+                )
+                if not created:
+                    merged = BucketSketch.from_row(row).merge(sketch)
+                    for name, value in merged.to_fields().items():
+                        setattr(row, name, value)
+                    row.save()
+
+    def _build(self, chunks: Iterable[list], levels: Sequence[str] = SKETCH_LEVELS) -> Dict[Tuple[str, object], BucketSketch]:
+        config = get_sketch_config()
+        sketches: Dict[Tuple[str, object], BucketSketch] = {}
+        for rows in chunks:
+            columns = list(zip(*rows))
+            customers, movies, genres = (np.asarray(columns[i], dtype=np.int64) for i in (1, 2, 3))
+            moments = _local_moments(columns[4])
+            for level in levels:
+                # Округлення і групування один раз на партію: O(n log n), а не O(n * бакети)
+                buckets, inverse = np.unique(moments.astype(f'datetime64[{_NUMPY_UNITS[level]}]'), return_inverse=True)
+                order = np.argsort(inverse, kind='stable')
+                groups = np.split(order, np.cumsum(np.bincount(inverse, minlength=len(buckets)))[:-1])
+                for bucket, index in zip(buckets, groups):
+                    key = _bucket_key(bucket.astype('datetime64[us]').astype(datetime), level)
+                    sketch = sketches.get(key)
+                    if sketch is None:
+                        sketch = sketches[key] = BucketSketch(config)
+                    sketch.add_many(customers[index], movies[index], genres[index])
+        return sketches
+
+    def rebuild(self, chunks: Iterable[list]) -> int:
+        """Перезбирає всі скетчі з фактів SKETCH_FACT_FIELDS (партії рядків)."""
+        sketches = self._build(chunks)
+        with transaction.atomic():
+            TicketSketch.objects.all().delete()
+            TicketSketch.objects.bulk_create(
+                [
+                    TicketSketch(granularity=level, bucket=bucket, **sketch.to_fields())
+                    for (level, bucket), sketch in sketches.items()
+                ],
+                batch_size=200,
+            )
+        return len(sketches)
+
+    def _replace(self, key: Tuple[str, object], sketch: Optional[BucketSketch]):
+        level, bucket = key
+        TicketSketch.objects.filter(granularity=level, bucket=bucket).delete()
+        if sketch is not None and sketch.tickets:
+            TicketSketch.objects.create(granularity=level, bucket=bucket, **sketch.to_fields())
+
+    def rebuild_days(self, days: Set[datetime]):
+        """
+        Перезбирає денні бакети (локальні дати без часового поясу) з квитків
+        у БД, а місяці, що їх містять, - злиттям їхніх днів.
+        """
+        config = get_sketch_config()
+        day_keys = sorted(_bucket_key(day, 'day') for day in days)
+        month_keys = sorted({_bucket_key(day, 'month') for day in days})
+        with transaction.atomic():
+            # Ті самі рядки і той самий порядок блокування, що й у merge()
+            list(TicketSketch.objects.select_for_update().filter(
+                granularity='day', bucket__in=[bucket for _, bucket in day_keys]
+            ).order_by('bucket'))
+            for key in day_keys:
+                start, end = key[1], next_bucket(key[1], 'day')
+                facts = Ticket.objects.filter(
+                    session__start_time__gte=start, session__start_time__lt=end
+                ).values_list(*SKETCH_FACT_FIELDS)
+                rows = list(facts)
+                self._replace(key, self._build([rows], ('day',)).get(key) if rows else None)
+            for key in month_keys:
+                start, end = key[1], next_bucket(key[1], 'month')
+                merged = None
+                for row in TicketSketch.objects.select_for_update().filter(
+                    granularity='day', bucket__gte=start, bucket__lt=end
+                ).order_by('bucket'):
+                    sketch = BucketSketch.from_row(row, config)
+                    merged = sketch if merged is None else merged.merge(sketch)
+                self._replace(key, merged)
+
+    def load(self, start=None, end=None, granularity: Optional[str] = None) -> Optional[Dict[object, BucketSketch]]:
+        """
+        Злиті скетчі діапазону по періодах granularity (без неї - один ключ None).
+        Межі округлюються до днів; None - для годинних періодів скетчів немає.
+        """
+        ranges = cover_ranges(start, end, granularity, SKETCH_LEVELS)
+        if not ranges:
+            return None
+        config = get_sketch_config()
+        merged: Dict[object, BucketSketch] = {}
+        for row in TicketSketch.objects.filter(bucket_filter(ranges)).order_by('bucket').iterator():
+            bucket = _local_naive(row.bucket)
+            period = floor(bucket, granularity) if granularity else None
+            if settings.USE_TZ and period is not None:
+                period = timezone.make_aware(period)
+            sketch = BucketSketch.from_row(row, config)
+            if period in merged:
+                merged[period].merge(sketch)
+            else:
+                merged[period] = sketch
+        return merged
+
+
+sketch_store = SketchStore()
+
+
+def supports(granularity: Optional[str]) -> bool:
+    """Скетчі є лише для днів і місяців - годинні періоди рахуються точно."""
+    return bool(cover_ranges(None, None, granularity, SKETCH_LEVELS))
+
+
+def unique_customers_error() -> float:
+    return 1.04 / np.sqrt(1 << get_sketch_config()['HLL_PRECISION'])
+
+
+def approx_unique_customers(periods: Sequence, granularity: str, start=None, end=None) -> Optional[Dict[object, int]]:
+    merged = sketch_store.load(start, end, granularity)
+    if merged is None:
+        return None
+    return {
+        period: int(round(merged[period].customers.count())) if period in merged else 0
+        for period in periods
+    }
+
+
+def approx_top_sellers(kind: str, start=None, end=None, limit: int = 10) -> Tuple[List[dict], dict]:
+    """(топ, межі похибки) з межами, описаними в документації модуля."""
+    merged = sketch_store.load(start, end).get(None)
+    config = get_sketch_config()
+    if merged is None:
+        return [], {
+            'tickets': 0,
+            'count_min_overestimate': 0,
+            'count_min_confidence': 1 - config['CMS_DELTA'],
+            'space_saving_guarantee': 0,
+        }
+    return merged.top(kind, limit), {
+        'tickets': merged.tickets,
+        # З імовірністю 1 - CMS_DELTA оцінка більша за точну не більше ніж на це число
+        'count_min_overestimate': int(np.ceil(config['CMS_EPSILON'] * merged.tickets)),
+        'count_min_confidence': 1 - config['CMS_DELTA'],
+        # Кожен ключ, що має більше квитків, гарантовано є в топі
+        'space_saving_guarantee': merged.tickets // merged.k,
+    }
+
+
+def _session_days(*session_ids) -> Set[datetime]:
+    moments = Session.objects.filter(pk__in=session_ids).values_list('start_time', flat=True)
+    return {floor(_local_naive(moment), 'day') for moment in moments}
+
+
+def _rebuild_on_commit(days: Set[datetime]):
+    if days:
+        transaction.on_commit(lambda: sketch_store.rebuild_days(days), robust=True)
+
+
+def _ticket_saving(sender, instance, **kwargs):
+    # Сеанс до зміни: його день теж треба перезібрати
+    if instance.pk is not None:
+        instance._sketch_previous_session = (
+            Ticket.objects.filter(pk=instance.pk).values_list('session_id', flat=True).first()
+        )
+
+
+def _session_saving(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._sketch_previous_days = _session_days(instance.pk)
+
+
+def _session_saved(sender, instance, created, **kwargs):
+    # Перенесений на інший день сеанс забирає свої квитки в інші бакети
+    previous = instance.__dict__.pop('_sketch_previous_days', set())
+    current = {floor(_local_naive(instance.start_time), 'day')}
+    if not created and previous != current:
+        _rebuild_on_commit(previous | current)
+
+
+def _ticket_deleted(sender, instance, **kwargs):
+    _rebuild_on_commit(_session_days(instance.session_id))
+
+
+def _ticket_saved(sender, instance, created, **kwargs):
+    if not created:
+        previous = instance.__dict__.pop('_sketch_previous_session', None)
+        _rebuild_on_commit(_session_days(instance.session_id, previous))
+        return
+    session = (
+        Session.objects.filter(pk=instance.session_id)
+        .values_list('start_time', 'movie_id', 'movie__genre_id')
+        .first()
+    )
+    if session is None:
+        return
+    start_time, movie_id, genre_id = session
+    customer_id = instance.customer_id
+    # Лише після коміту: відкочений квиток не має потрапити в скетч; robust - збій
+    # скетча лише логується і не перетворює збережений квиток на 500
+    transaction.on_commit(
+        lambda: sketch_store.add_ticket(customer_id, movie_id, genre_id, start_time),
+        robust=True,
+    )
+
+
+pre_save.connect(_ticket_saving, sender=Ticket, dispatch_uid='analytics_ticket_sketches_saving')
+post_save.connect(_ticket_saved, sender=Ticket, dispatch_uid='analytics_ticket_sketches')
+post_delete.connect(_ticket_deleted, sender=Ticket, dispatch_uid='analytics_ticket_sketches_deleted')
+pre_save.connect(_session_saving, sender=Session, dispatch_uid='analytics_session_sketches_saving')
+post_save.connect(_session_saved, sender=Session, dispatch_uid='analytics_session_sketches')
@@ -0,0 +1,220 @@
+"""
+Попередньо зібрані HTML-знімки дашбордів (серверний рендер) у файловому
+кеші. Збирає команда build_dashboard_snapshots - разово або з --interval
+після кожної зміни даних; view у режимі snapshot віддає готовий файл
+без жодного запиту до БД.
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .profiling import QueryProfile
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DEFAULTS = {
+    # None - BASE_DIR / 'var' / 'snapshots'
+    'DIR': None,
+    'MAX_AGE': 24 * 3600,
+    # Стандартні діапазони: назва -> кількість днів до сьогодні (None - уся історія)
+    'RANGES': {'all': None, '7d': 7, '30d': 30, '90d': 90, '365d': 365},
+    'IMAGE_FORMATS': ('svg', 'png'),
+}
+
+
+def get_snapshot_config() -> dict:
+    return {**SNAPSHOT_DEFAULTS, **getattr(settings, 'DASHBOARD_SNAPSHOTS', {})}
+
+
+def resolve_range(name: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """(start, end) для назви діапазону; невідома назва - уся історія."""
+    days = get_snapshot_config()['RANGES'].get(name)
+    if days is None:
+        return None, None
+    start = datetime.combine(date.today() - timedelta(days=days), datetime.min.time())
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+    return start, None
+
+
+@dataclass
+class SnapshotMeta:
+    dashboard: str
+    range: str
+    built_at: float
+    build_ms: float
+    db_ms: float
+    queries: int
+    bytes: int
+    images: List[str] = field(default_factory=list)
+
+
+class SnapshotStore:
+
+    def __init__(self, root: Optional[Path] = None):
+        self._root = root
+
+    @property
+    def root(self) -> Path:
+        if self._root is not None:
+            return Path(self._root)
+        configured = get_snapshot_config()['DIR']
+        return Path(configured) if configured else Path(settings.BASE_DIR) / 'var' / 'snapshots'
+
+    def path(self, dashboard: str, range_name: str, suffix: str = '.html') -> Path:
+        return self.root / dashboard / f'{range_name}{suffix}'
+
+    def _write(self, path: Path, data: bytes):
+        # Тимчасовий файл + os.replace: читач ніколи не бачить напівзаписаний знімок
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def write(self, html: str, meta: SnapshotMeta):
+        self._write(self.path(meta.dashboard, meta.range), html.encode())
+        self._write(self.path(meta.dashboard, meta.range, '.json'), json.dumps(asdict(meta)).encode())
+
+    def read(self, dashboard: str, range_name: str, max_age: Optional[float] = None) -> Optional[Tuple[bytes, dict]]:
+        try:
+            meta = json.loads(self.path(dashboard, range_name, '.json').read_bytes())
+            html = self.path(dashboard, range_name).read_bytes()
+        except (OSError, ValueError):
+            return None
+        if max_age is not None and time.time() - meta['built_at'] > max_age:
+            return None
+        return html, meta
+
+    def read_watermark(self) -> Optional[dict]:
+        try:
+            return json.loads((self.root / 'watermark.json').read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def write_watermark(self, watermark: dict):
+        self._write(self.root / 'watermark.json', json.dumps(watermark).encode())
+
+
+snapshot_store = SnapshotStore()
+
+
+def _build_plotly(start, end):
+    from .dashboard_plotly import build_plotly_context, build_plotly_figures
+    figures = build_plotly_figures(start, end)
+    html = render_to_string('analytics/dashboard.html', build_plotly_context(figures=figures))
+    return html, figures
+
+
+def _build_bokeh(start, end):
+    from .dashboard_bokeh import build_bokeh_context, build_bokeh_figure
+    html = render_to_string('dashboard/bokeh.html', build_bokeh_context(build_bokeh_figure()))
+    # Експорт PNG/SVG з Bokeh потребує браузера (selenium), тому лише HTML
+    return html, {}
+
+
+# Назва -> (чи залежить від діапазону дат, функція збирання)
+DASHBOARDS = {
+    'plotly': (True, _build_plotly),
+    'bokeh': (False, _build_bokeh),
+}
+
+
+def _export_images(figures: dict, dashboard: str, range_name: str, formats: Sequence[str]) -> List[str]:
+    # Plotly пише PNG/SVG через kaleido без браузера; без kaleido просто пропускаємо
+    written = []
+    for name, fig in figures.items():
+        if fig is None:
+            continue
+        for fmt in formats:
+            path = snapshot_store.path(dashboard, f'{range_name}-{name}', f'.{fmt}')
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fig.write_image(str(path), format=fmt)
+            except (ImportError, ValueError, RuntimeError) as exc:
+                logger.warning('image export for %s/%s skipped: %s', dashboard, range_name, exc)
+                return written
+            written.append(path.name)
+    return written
+
+
+def build_snapshot(dashboard: str, range_name: str, images: bool = False) -> SnapshotMeta:
+    _, build = DASHBOARDS[dashboard]
+    start, end = resolve_range(range_name)
+    started = time.perf_counter()
+    with QueryProfile(label=f'snapshot {dashboard}/{range_name}') as profile:
+        html, figures = build(start, end)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    meta = SnapshotMeta(
+        dashboard=dashboard,
+        range=range_name,
+        built_at=time.time(),
+        build_ms=round(build_ms, 2),
+        db_ms=round(profile.db_time * 1000, 2),
+        queries=profile.count,
+        bytes=len(html.encode()),
+    )
+    if images:
+        meta.images = _export_images(figures, dashboard, range_name, get_snapshot_config()['IMAGE_FORMATS'])
+    snapshot_store.write(html, meta)
+    return meta
+
+
+def build_snapshots(dashboards: Optional[Sequence[str]] = None, ranges: Optional[Sequence[str]] = None,
+                    images: bool = False) -> List[SnapshotMeta]:
+    ranges = list(ranges or get_snapshot_config()['RANGES'])
+    built = []
+    for dashboard in dashboards or DASHBOARDS:
+        ranged, _ = DASHBOARDS[dashboard]
+        for range_name in (ranges if ranged else ['all']):
+            built.append(build_snapshot(dashboard, range_name, images))
+    return built
+
+
+def data_watermark() -> Dict[str, object]:
+    """
+    Змінюється з новими, видаленими (повернення) квитками і сеансами, зі
+    зміною цін і щодня (відносні діапазони зсуваються). Зміни, що не
+    чіпають кількостей і сум (перенесення сеансу в інший час чи зал,
+    квиток на інший сеанс), не видно - після них потрібен --force.
+    """
+    from .models import Session, Ticket
+    tickets = Ticket.objects.aggregate(last=Max('ticket_id'), count=Count('ticket_id'), total=Sum('purchase_date'))
+    sessions = Session.objects.aggregate(last=Max('session_id'), count=Count('session_id'), total=Sum('price'))
+    return {
+        'ticket': [tickets['last'], tickets['count'], str(tickets['total'] or 0)],
+        'session': [sessions['last'], sessions['count'], str(sessions['total'] or 0)],
+        'day': date.today().isoformat(),
+    }
+
+
+def snapshot_response(dashboard: str, range_name: str) -> Optional[HttpResponse]:
+    if range_name not in get_snapshot_config()['RANGES']:
+        return None
+    found = snapshot_store.read(dashboard, range_name, get_snapshot_config()['MAX_AGE'])
+    if found is None:
+        return None
+    html, meta = found
+    response = HttpResponse(html)
+    response['X-Snapshot-Built-At'] = http_date(meta['built_at'])
+    response['X-Snapshot-Build-Ms'] = str(meta['build_ms'])
+    return response
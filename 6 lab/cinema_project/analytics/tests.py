@@ -1,3 +1,353 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.apps import apps
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from . import rollups
+from .models import Customer, Genre, Hall, Movie, RollupState, SalesRollup, Session, Ticket, TicketSketch
+from .rollups import PERIODS_PER_QUERY, _chunks, cover_ranges, is_full_period, next_bucket
+from .segmentation import SEGMENTS, fold_facts, score
+from .sketches import CountMinSketch, HyperLogLog, SpaceSaving, approx_top_sellers
+from .throttling import TokenBucketThrottle, _LocalBuckets, limiter
+
+
+class SegmentationTests(SimpleTestCase):
+
+    def skewed_facts(self, customers=3000, seed=7):
+        # Як у кінотеатрі: більшість клієнтів має один квиток, мало хто - десяток
+        rng = np.random.default_rng(seed)
+        now = datetime(2024, 6, 1)
+        rows, ticket_id = [], 0
+        for customer_id, tickets in enumerate(rng.geometric(0.55, customers), start=1):
+            last_visit = now - timedelta(days=int(rng.integers(0, 365)))
+            for _ in range(tickets):
+                ticket_id += 1
+                visit = last_visit - timedelta(days=int(rng.integers(0, 60)))
+                price = float(rng.integers(80, 300))
+                rows.append((ticket_id, customer_id, int(rng.integers(1, 6)), price, visit, price))
+        return rows, now
+
+    def test_every_segment_is_reachable_on_skewed_frequencies(self):
+        rows, now = self.skewed_facts()
+        segments = score(fold_facts([rows]), now)
+
+        single = segments['tickets'] == 1
+        self.assertGreater(single.mean(), 0.5)
+        self.assertTrue((segments.loc[single, 'f_score'] == 1).all())
+        self.assertEqual(set(segments['segment']), set(SEGMENTS))
+
+
+class ThrottlingTests(SimpleTestCase):
+    RATES = {'catalog': {'rate': '600/min', 'burst': 120}, 'analytics': {'rate': '6/min', 'burst': 3}}
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        limiter.reset()
+        self.addCleanup(limiter.reset)
+
+    def test_bucket_refills_over_time(self):
+        buckets = _LocalBuckets(stripes=4, max_keys=100)
+        for _ in range(3):
+            self.assertEqual(buckets.consume('analytics:u1', 0.1, 3), 0.0)
+        self.assertAlmostEqual(buckets.consume('analytics:u1', 0.1, 3), 10.0)
+        self.now += 5
+        self.assertAlmostEqual(buckets.consume('analytics:u1', 0.1, 3), 5.0)
+        self.now += 5
+        self.assertEqual(buckets.consume('analytics:u1', 0.1, 3), 0.0)
+
+    def test_scopes_and_users_have_separate_buckets(self):
+        with override_settings(THROTTLING={'RATES': self.RATES, 'CACHE_ALIAS': None}):
+            for _ in range(3):
+                limiter.consume('analytics', 'user-1')
+            self.assertGreater(limiter.consume('analytics', 'user-1'), 0)
+            self.assertEqual(limiter.consume('catalog', 'user-1'), 0.0)
+            self.assertEqual(limiter.consume('analytics', 'user-2'), 0.0)
+
+    def test_pruning_keeps_depleted_buckets(self):
+        # Одна смуга на 1 ключ: кожен новий ключ запускає прибирання
+        buckets = _LocalBuckets(stripes=1, max_keys=1)
+        for _ in range(4):
+            buckets.consume('analytics:u1', 0.1, 3)
+        # Каталожний кошик повний через 12 с, аналітичний - лише через 30 с
+        self.now += 13
+        for index in range(5):
+            buckets.consume(f'catalog:u{index}', 10.0, 120)
+        self.assertEqual(buckets.consume('analytics:u1', 0.1, 3), 0.0)
+        self.assertAlmostEqual(buckets.consume('analytics:u1', 0.1, 3), 7.0)
+
+    def test_rejected_request_gets_retry_after(self):
+        class LimitedView(APIView):
+            authentication_classes = []
+            permission_classes = []
+            throttle_classes = [TokenBucketThrottle]
+            throttle_scope = 'analytics'
+
+            def get(self, request):
+                return Response({'ok': True})
+
+        view = LimitedView.as_view()
+        factory = APIRequestFactory()
+        with override_settings(THROTTLING={'ENABLED': True, 'RATES': self.RATES, 'CACHE_ALIAS': None}):
+            statuses = [view(factory.get('/limited/')).status_code for _ in range(3)]
+            rejected = view(factory.get('/limited/'))
+        self.assertEqual(statuses, [200, 200, 200])
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(rejected['Retry-After'], '10')
+
+
+class UnmanagedTablesMixin:
+    """Таблиці legacy-моделей (managed = False) створюються лише на час тестів."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.unmanaged = [m for m in apps.get_app_config('analytics').get_models() if not m._meta.managed]
+        with connection.schema_editor() as editor:
+            for model in cls.unmanaged:
+                editor.create_model(model)
+
+    def tearDown(self):
+        # flush() між тестами чистить лише керовані таблиці
+        with connection.cursor() as cursor:
+            for model in reversed(self.unmanaged):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        super().tearDown()
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            for model in reversed(cls.unmanaged):
+                editor.delete_model(model)
+        super().tearDownClass()
+
+
+def _hours(ranges):
+    total = 0
+    for level, low, high in ranges:
+        while low < high:
+            nxt = next_bucket(low, level)
+            total += (nxt - low) // timedelta(hours=1)
+            low = nxt
+    return total
+
+
+class RollupCoverTests(SimpleTestCase):
+
+    def test_cover_uses_coarsest_buckets_and_rounds_to_hours(self):
+        ranges = cover_ranges(datetime(2024, 1, 30, 7, 30), datetime(2024, 3, 2, 13, 10))
+        self.assertIn(('month', datetime(2024, 2, 1), datetime(2024, 3, 1)), ranges)
+        self.assertIn(('day', datetime(2024, 1, 31), datetime(2024, 2, 1)), ranges)
+        self.assertIn(('day', datetime(2024, 3, 1), datetime(2024, 3, 2)), ranges)
+        self.assertIn(('hour', datetime(2024, 1, 30, 7), datetime(2024, 1, 31)), ranges)
+        self.assertIn(('hour', datetime(2024, 3, 2), datetime(2024, 3, 2, 14)), ranges)
+
+    def test_cover_counts_every_hour_once(self):
+        for start, end in [
+            (datetime(2024, 1, 30, 7, 30), datetime(2024, 3, 2, 13, 10)),
+            (datetime(2024, 2, 10, 3), datetime(2024, 2, 10, 9)),
+            (datetime(2023, 12, 31, 23), datetime(2025, 1, 1, 1)),
+        ]:
+            expected = (rollups.ceil(end, 'hour') - rollups.floor(start, 'hour')) // timedelta(hours=1)
+            self.assertEqual(_hours(cover_ranges(start, end)), expected)
+
+    def test_granularity_limits_levels(self):
+        ranges = cover_ranges(datetime(2024, 1, 30), datetime(2024, 3, 2), 'day')
+        self.assertEqual({level for level, _, _ in ranges}, {'day'})
+        self.assertEqual(cover_ranges(None, None, 'month'), [('month', None, None)])
+
+    def test_chunks_merge_adjacent_buckets(self):
+        hours = {datetime(2024, 1, 1, h) for h in (1, 2, 3, 7)}
+        self.assertEqual(_chunks('hour', hours), [[
+            [datetime(2024, 1, 1, 1), datetime(2024, 1, 1, 4)],
+            [datetime(2024, 1, 1, 7), datetime(2024, 1, 1, 8)],
+        ]])
+        days = {datetime(2024, 1, 1) + timedelta(days=2 * i) for i in range(PERIODS_PER_QUERY + 1)}
+        self.assertEqual([len(chunk) for chunk in _chunks('day', days)], [PERIODS_PER_QUERY, 1])
+        self.assertEqual(_chunks('month', None), [None])
+
+    def test_is_full_period(self):
+        february = datetime(2024, 2, 1)
+        self.assertTrue(is_full_period(february, 'month'))
+        self.assertTrue(is_full_period(february, 'month', datetime(2024, 1, 15), datetime(2024, 3, 1)))
+        self.assertFalse(is_full_period(february, 'month', datetime(2024, 2, 1, 1), None))
+        self.assertFalse(is_full_period(february, 'month', None, datetime(2024, 2, 29, 22, 30)))
+        # Межі округлюються до години: 23:30 покриває лютий до кінця
+        self.assertTrue(is_full_period(february, 'month', None, datetime(2024, 2, 29, 23, 30)))
+
+
+@override_settings(ROLLUPS={'AUTO_REFRESH': False})
+class RollupRefreshTests(UnmanagedTablesMixin, TransactionTestCase):
+
+    def setUp(self):
+        rollups._ready.clear()
+        self.addCleanup(rollups._ready.clear)
+        genre = Genre.objects.create(name='Drama')
+        movie = Movie.objects.create(title='M', genre=genre, duration=90, age_limit=0, release_year=2020)
+        hall = Hall.objects.create(name='H', capacity=50, type='Standard')
+        self.customer = Customer.objects.create(name='C', email='c@x')
+        self.sessions = [
+            Session.objects.create(movie=movie, hall=hall, start_time=datetime(2024, 1, 10, 18) + timedelta(days=i),
+                                   price=Decimal('100'))
+            for i in range(3)
+        ]
+        for session in self.sessions:
+            self.sell(session, 2)
+
+    def sell(self, session, count):
+        taken = Ticket.objects.filter(session=session).count()
+        for seat in range(taken + 1, taken + count + 1):
+            Ticket.objects.create(session=session, customer=self.customer, seat_number=seat, purchase_date=Decimal('1'))
+
+    def stored(self, level):
+        return dict(
+            SalesRollup.objects.filter(granularity=level).values_list('bucket').annotate(n=Sum('sold')).values_list('bucket', 'n')
+        )
+
+    def test_full_then_incremental_refresh(self):
+        self.assertFalse(rollups.rollups_ready())
+        rollups.refresh()
+        self.assertTrue(rollups.rollups_ready())
+        self.assertEqual(self.stored('month'), {datetime(2024, 1, 1): 6})
+
+        self.sell(self.sessions[1], 3)
+        counts = rollups.refresh()
+        self.assertEqual(counts['hour'], 1)
+        self.assertEqual(self.stored('day')[datetime(2024, 1, 11)], 5)
+        self.assertEqual(self.stored('month'), {datetime(2024, 1, 1): 9})
+        self.assertEqual(RollupState.objects.get(key='ticket').value, Ticket.objects.order_by('-ticket_id')[0].ticket_id)
+
+    def test_moved_session_marks_old_and_new_hour(self):
+        rollups.refresh()
+        session = self.sessions[0]
+        session.start_time = datetime(2024, 2, 5, 12)
+        marked = []
+        with override_settings(ROLLUPS={'AUTO_REFRESH': True}), \
+                mock.patch.object(rollups.refresher, 'mark', side_effect=marked.append):
+            session.save()
+        self.assertEqual(marked, [{datetime(2024, 1, 10, 18), datetime(2024, 2, 5, 12)}])
+
+        rollups.refresh(hours=marked[0])
+        truth = dict(
+            Ticket.objects.values_list('session__start_time__month').annotate(n=Count('ticket_id')).values_list('session__start_time__month', 'n')
+        )
+        self.assertEqual(self.stored('month'), {datetime(2024, 1, 1): truth[1], datetime(2024, 2, 1): truth[2]})
+
+
+class SketchTests(SimpleTestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(11)
+
+    def stream(self, size=20000, keys=500):
+        # Zipf-подібний розподіл: кілька фільмів продають більшість квитків
+        return self.rng.zipf(1.3, size * 2)[:size] % keys
+
+    def test_hyperloglog_merge_is_union_and_within_error(self):
+        left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        left.add_many(np.arange(0, 12000))
+        right.add_many(np.arange(8000, 20000))
+        union.add_many(np.arange(0, 20000))
+
+        merged = left.merge(right)
+        np.testing.assert_array_equal(merged.registers, union.registers)
+        self.assertLess(abs(merged.count() - 20000) / 20000, 3 * merged.relative_error)
+        self.assertAlmostEqual(HyperLogLog().count(), 0.0)
+
+    def test_count_min_never_underestimates_and_merges_by_sum(self):
+        epsilon, delta = 0.01, 0.01
+        stream = self.stream()
+        keys, truth = np.unique(stream, return_counts=True)
+        whole = CountMinSketch.for_error(epsilon, delta)
+        whole.add_many(keys, truth)
+
+        estimates = whole.estimate_many(keys)
+        self.assertTrue((estimates >= truth).all())
+        # Межа epsilon * N порушується з імовірністю не більше delta на ключ
+        self.assertLessEqual(np.mean(estimates > truth + epsilon * len(stream)), 2 * delta)
+
+        halves = [CountMinSketch.for_error(epsilon, delta) for _ in range(2)]
+        for sketch, part in zip(halves, np.array_split(stream, 2)):
+            part_keys, part_counts = np.unique(part, return_counts=True)
+            sketch.add_many(part_keys, part_counts)
+        np.testing.assert_array_equal(halves[0].merge(halves[1]).counters, whole.counters)
+
+    def test_space_saving_keeps_heavy_hitters_after_merge(self):
+        k = 16
+        stream = self.stream()
+        self.rng.shuffle(stream)
+        keys, truth = np.unique(stream, return_counts=True)
+        true_counts = dict(zip(keys.tolist(), truth.tolist()))
+        heavy = {key for key, count in true_counts.items() if count > len(stream) / k}
+        self.assertTrue(heavy)
+
+        halves = [SpaceSaving(k) for _ in range(2)]
+        for summary, part in zip(halves, np.array_split(stream, 2)):
+            summary.add_many(part, np.ones(len(part), dtype=np.int64))
+            self.assertEqual(sum(count for count, _ in summary.items.values()), len(part))
+        merged = halves[0].merge(halves[1])
+
+        self.assertLessEqual(len(merged.items), k)
+        self.assertLessEqual(heavy, set(merged.items))
+        for key, count, error in merged.top(k):
+            # Оцінка - верхня межа, оцінка мінус похибка - нижня
+            self.assertGreaterEqual(count, true_counts[key])
+            self.assertLessEqual(count - error, true_counts[key])
+
+
+@override_settings(ROLLUPS={'AUTO_REFRESH': False})
+class SketchSignalTests(UnmanagedTablesMixin, TransactionTestCase):
+
+    def setUp(self):
+        genre = Genre.objects.create(name='Drama')
+        movie = Movie.objects.create(title='M', genre=genre, duration=90, age_limit=0, release_year=2020)
+        hall = Hall.objects.create(name='H', capacity=50, type='Standard')
+        self.customer = Customer.objects.create(name='C', email='c@x')
+        self.sessions = [
+            Session.objects.create(movie=movie, hall=hall, start_time=datetime(2024, 1, 10, 18) + timedelta(days=i),
+                                   price=Decimal('100'))
+            for i in range(2)
+        ]
+        self.tickets = [
+            Ticket.objects.create(session=session, customer=self.customer, seat_number=seat, purchase_date=Decimal('1'))
+            for session in self.sessions for seat in (1, 2)
+        ]
+
+    def stored(self):
+        # Денних бакетів 1-го числа в тестах немає, тож ключі не перетинаються
+        return dict(TicketSketch.objects.values_list('bucket', 'tickets'))
+
+    def test_no_data_bounds_have_the_same_shape(self):
+        _, bounds = approx_top_sellers('movies')
+        TicketSketch.objects.all().delete()
+        empty, empty_bounds = approx_top_sellers('movies')
+        self.assertEqual(empty, [])
+        self.assertEqual(set(empty_bounds), set(bounds))
+
+    def test_deleted_ticket_rebuilds_day_and_month(self):
+        self.assertEqual(self.stored()[datetime(2024, 1, 1)], 4)
+        self.tickets[0].delete()
+        stored = self.stored()
+        self.assertEqual(stored[datetime(2024, 1, 10)], 1)
+        self.assertEqual(stored[datetime(2024, 1, 11)], 2)
+        self.assertEqual(stored[datetime(2024, 1, 1)], 3)
+
+    def test_moved_session_rebuilds_both_months(self):
+        session = self.sessions[0]
+        session.start_time = datetime(2024, 2, 5, 12)
+        session.save()
+        self.assertEqual(self.stored(), {
+            datetime(2024, 1, 11): 2, datetime(2024, 1, 1): 2,
+            datetime(2024, 2, 5): 2, datetime(2024, 2, 1): 2,
+        })
@@ -0,0 +1,173 @@
+"""
+Throttling маршрутів за алгоритмом token bucket, окремий кошик на клас
+маршрутів і користувача.
+
+Файл однаковий у cinema_app і analytics лабораторної 6 (кожен зі своїм
+metrics.py): проєкти незалежні й не імпортують один одного, тож зміни
+вносяться в обидві копії в тому самому коміті.
+"""
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import THROTTLED_REQUESTS
+
+THROTTLING_DEFAULTS = {
+    'ENABLED': True,
+    # Псевдонім із CACHES для спільних між процесами кошиків; None - пам'ять процесу
+    'CACHE_ALIAS': None,
+    'STRIPES': 64,
+    'MAX_KEYS_PER_STRIPE': 2048,
+    'DEFAULT_SCOPE': 'catalog',
+    # Швидкість поповнення і місткість кошика (максимальний сплеск) для кожного класу маршрутів
+    'RATES': {
+        'catalog': {'rate': '600/min', 'burst': 120},
+        'booking': {'rate': '60/min', 'burst': 20},
+        'analytics': {'rate': '6/min', 'burst': 3},
+        'auth': {'rate': '10/min', 'burst': 5},
+    },
+}
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_throttling_config() -> dict:
+    config = {**THROTTLING_DEFAULTS, **getattr(settings, 'THROTTLING', {})}
+    config['RATES'] = {**THROTTLING_DEFAULTS['RATES'], **config['RATES']}
+    return config
+
+
+def parse_rate(rate: str) -> float:
+    """'600/min' -> токенів за секунду."""
+    count, period = rate.split('/')
+    return int(count) / _PERIODS[period[0]]
+
+
+class _LocalBuckets:
+    """
+    Кошики в пам'яті процесу. Ключі розкладені по смугах, кожна зі своїм
+    замком, тож запити різних користувачів не чекають один на одного.
+    """
+
+    def __init__(self, stripes: int, max_keys: int):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        # ключ -> (токени, час оновлення, секунд до повного кошика за його власним лімітом)
+        self._buckets: List[Dict[str, Tuple[float, float, float]]] = [{} for _ in range(stripes)]
+        self._max_keys = max_keys
+
+    def _prune(self, buckets: Dict[str, Tuple[float, float, float]], now: float):
+        # Кошик, що встиг поповнитись до повного, нічим не відрізняється від відсутнього
+        for key in [key for key, (_, updated, full_after) in buckets.items() if now - updated >= full_after]:
+            del buckets[key]
+
+    def consume(self, key: str, rate: float, burst: float) -> float:
+        stripe = zlib.crc32(key.encode()) % len(self._locks)
+        now = time.monotonic()
+        with self._locks[stripe]:
+            buckets = self._buckets[stripe]
+            full_after = burst / rate
+            tokens, updated, _ = buckets.get(key, (burst, now, full_after))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                buckets[key] = (tokens - 1, now, full_after)
+                if len(buckets) > self._max_keys:
+                    self._prune(buckets, now)
+                return 0.0
+            buckets[key] = (tokens, now, full_after)
+            return (1 - tokens) / rate
+
+
+class _CacheBuckets:
+    """
+    Кошики у спільному кеші Django. Читання і запис не атомарні, тож при
+    одночасних запитах з кількох процесів ліміт може бути трохи перевищено.
+    """
+
+    def __init__(self, alias: str):
+        self.cache = caches[alias]
+
+    def consume(self, key: str, rate: float, burst: float) -> float:
+        cache_key = f'throttle:{key}'
+        now = time.time()
+        tokens, updated = self.cache.get(cache_key) or (burst, now)
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        ttl = int(burst / rate) + 1
+        if tokens >= 1:
+            self.cache.set(cache_key, (tokens - 1, now), ttl)
+            return 0.0
+        self.cache.set(cache_key, (tokens, now), ttl)
+        return (1 - tokens) / rate
+
+
+class TokenBucketLimiter:
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    config = get_throttling_config()
+                    if config['CACHE_ALIAS']:
+                        self._backend = _CacheBuckets(config['CACHE_ALIAS'])
+                    else:
+                        self._backend = _LocalBuckets(config['STRIPES'], config['MAX_KEYS_PER_STRIPE'])
+        return self._backend
+
+    def consume(self, scope: str, ident: str) -> float:
+        """Забирає токен з кошика (scope, ident); повертає 0 або скільки секунд чекати."""
+        limits = get_throttling_config()['RATES'].get(scope)
+        if not limits:
+            return 0.0
+        return self.backend.consume(f'{scope}:{ident}', parse_rate(limits['rate']), float(limits['burst']))
+
+    def reset(self):
+        self._backend = None
+
+
+limiter = TokenBucketLimiter()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Ліміт на користувача (анонімів - на IP) у межах класу маршрутів.
+    Клас береться з `throttle_scopes[action]` або `throttle_scope` view,
+    інакше DEFAULT_SCOPE. DRF сам додає Retry-After із wait().
+    """
+
+    def __init__(self):
+        self._wait: Optional[float] = None
+
+    def get_scope(self, view) -> str:
+        action = getattr(view, 'action', None)
+        scopes = getattr(view, 'throttle_scopes', {})
+        if action in scopes:
+            return scopes[action]
+        return getattr(view, 'throttle_scope', None) or get_throttling_config()['DEFAULT_SCOPE']
+
+    def get_cache_key(self, request) -> str:
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user-{user.pk}'
+        return f'ip-{self.get_ident(request)}'
+
+    def allow_request(self, request, view) -> bool:
+        if not get_throttling_config()['ENABLED']:
+            return True
+        scope = self.get_scope(view)
+        self._wait = limiter.consume(scope, self.get_cache_key(request))
+        if self._wait:
+            THROTTLED_REQUESTS.inc(scope)
+            return False
+        return True
+
+    def wait(self) -> Optional[float]:
+        return self._wait
@@ -20,7 +20,9 @@ from .analytics_views import (
     HallUtilizationAPI,
     MoviePopularityByYearAPI,
     CustomerSegmentsAPI,
-    EmployeeSalaryStatsAPI
+    EmployeeSalaryStatsAPI,
+    ChartDataAPI,
+    TopSellersAPI
 )
 from .dashboard_plotly import analytics_dashboard       
 from .dashboard_bokeh import bokeh_dashboard            
@@ -48,6 +50,9 @@ urlpatterns = [
     path('analytics/movie-popularity/', MoviePopularityByYearAPI.as_view(), name='movie_popularity'),
     path('analytics/customer-segments/', CustomerSegmentsAPI.as_view(), name='customer_segments'),
     path('analytics/employee-salaries/', EmployeeSalaryStatsAPI.as_view(), name='employee_salaries'),
+    path('analytics/charts/<str:name>/', ChartDataAPI.as_view(), name='chart_data'),
+    path('analytics/top/<str:kind>/', TopSellersAPI.as_view(), name='top_sellers'),
+    path('analytics/metrics/', views.metrics, name='metrics'),
     
     path('dashboard/', analytics_dashboard, name='analytics_dashboard'),
     path('dashboard/bokeh/', bokeh_dashboard, name='analytics_bokeh'),
@@ -3,7 +3,9 @@ from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.db.models import Avg
+from django.http import HttpResponse, HttpResponseForbidden
 import pandas as pd
 
 from .models import Genre, Hall, JobPosition, Employee, Movie, Customer, Session, Ticket
@@ -12,10 +14,23 @@ from .serializers import (
     EmployeeSerializer, MovieSerializer, CustomerSerializer,
     SessionSerializer, TicketSerializer
 )
+from .metrics import REGISTRY
 from .unit_of_work import UnitOfWork
 
+
+def metrics(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        REGISTRY.expose(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
 class CinemaReportAPI(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
 
     def get(self, request):
         try:
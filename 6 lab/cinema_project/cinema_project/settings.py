@@ -28,9 +28,61 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'analytics.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'analytics.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+CHART_DATA = {
+    'TTL': 300,
+}
+# client - дашборди малюють графіки в браузері з JSON; server - HTML з Python (?render=server);
+# snapshot - готові знімки з build_dashboard_snapshots (без знімка - як client)
+DASHBOARD_RENDER_MODE = os.getenv('DASHBOARD_RENDER_MODE', 'client')
+DASHBOARD_SNAPSHOTS = {
+    'DIR': BASE_DIR / 'var' / 'snapshots',
+    'MAX_AGE': 24 * 3600,
+}
+COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'CACHE_MAX_BYTES': 32 * 1024 * 1024,
+}
+# auto: orjson, якщо встановлений, інакше ujson, інакше стандартний json
+JSON_RENDERER_BACKEND = os.getenv('JSON_RENDERER_BACKEND', 'auto')
+# Фонове оновлення rollup-ів: при читанні раз на REFRESH_INTERVAL і після змін квитків/сеансів
+ROLLUPS = {
+    'AUTO_REFRESH': True,
+    'REFRESH_INTERVAL': 60,
+}
+SEGMENTATION = {
+    'CHUNK_SIZE': 100_000,
+    'REFRESH_INTERVAL': 60,
+    'FREQUENCY_THRESHOLDS': (2, 3, 5, 10),
+}
+# Скетчі для ?approx=1: HLL ~1.6% похибки, Count-Min +1% від квитків з імовірністю 99%
+SKETCHES = {
+    'HLL_PRECISION': 12,
+    'CMS_EPSILON': 0.01,
+    'CMS_DELTA': 0.01,
+    'TOP_K': 64,
+}
+THROTTLING = {
+    'ENABLED': os.getenv('THROTTLING_ENABLED', '1') == '1',
+    'CACHE_ALIAS': None,
+    'RATES': {
+        'catalog': {'rate': '600/min', 'burst': 120},
+        'analytics': {'rate': '6/min', 'burst': 3},
+    },
 }
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'analytics.compression.CompressionMiddleware',
+    'analytics.profiling.QueryProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -38,6 +90,13 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+QUERY_PROFILING = {
+    'ENABLED': DEBUG,
+    'SLOW_QUERY_MS': 100,
+    'DUPLICATE_THRESHOLD': 3,
+    'QUERY_BUDGET': None,
+    'RAISE_ON_BUDGET': False,
+}
 ROOT_URLCONF = 'cinema_project.urls'
 WSGI_APPLICATION = 'cinema_project.wsgi.application'
 TEMPLATES = [
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CinemaAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cinema_app'
+
+    def ready(self):
+        from .authentication import check_token_store
+        from .holds import check_hold_store
+        check_token_store()
+        check_hold_store()
@@ -0,0 +1,233 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, BasicAuthentication, get_authorization_header
+
+from .metrics import CACHE_REQUESTS
+
+AUTH_TOKEN_DEFAULTS = {
+    'TTL': 12 * 3600,
+    'USER_CACHE_TTL': 60,
+    'BASIC_CACHE_TTL': 60,
+    # Псевдонім із CACHES, спільний для всіх процесів; None - пам'ять процесу (лише один процес)
+    'CACHE_ALIAS': 'default',
+    'KEYWORDS': ('Token', 'Bearer'),
+}
+
+
+def get_auth_config() -> dict:
+    return {**AUTH_TOKEN_DEFAULTS, **getattr(settings, 'AUTH_TOKENS', {})}
+
+
+def token_store_is_process_local() -> bool:
+    alias = get_auth_config()['CACHE_ALIAS']
+    return not alias or isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def check_token_store():
+    """
+    Викликається при старті: токени в пам'яті процесу не бачать інші
+    воркери (401 і невидиме відкликання), тож це помилка конфігурації.
+    """
+    workers = getattr(settings, 'WORKERS', 1)
+    if workers > 1 and token_store_is_process_local():
+        raise ImproperlyConfigured(
+            f'AUTH_TOKENS["CACHE_ALIAS"] points to a process-local store, but WORKERS={workers}; '
+            'configure a shared cache (e.g. REDIS_URL) for token authentication.'
+        )
+
+
+def _digest(value: str) -> str:
+    # Ключі зберігаються лише як HMAC, тож дамп кешу не розкриває токени чи паролі
+    return hmac.new(settings.SECRET_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+
+class _LocalStore:
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[object, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            with self._lock:
+                self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [key for key, (value, _) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+
+class _CacheStore:
+
+    def __init__(self, alias: str):
+        self.cache = caches[alias]
+
+    def get(self, key: str):
+        return self.cache.get(f'auth:{key}')
+
+    def set(self, key: str, value, ttl: float):
+        self.cache.set(f'auth:{key}', value, int(ttl))
+
+    def delete(self, key: str):
+        self.cache.delete(f'auth:{key}')
+
+
+class TokenStore:
+    """
+    Токени доступу з TTL і відкликанням. Для кожного користувача зберігається
+    список його токенів, щоб revoke_user працював і зі спільним кешем.
+    """
+
+    def __init__(self):
+        self._store = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            alias = get_auth_config()['CACHE_ALIAS']
+            self._store = _CacheStore(alias) if alias else _LocalStore()
+        return self._store
+
+    def issue(self, user) -> Tuple[str, float]:
+        ttl = get_auth_config()['TTL']
+        token = secrets.token_urlsafe(32)
+        digest = _digest(token)
+        self.store.set(f'token:{digest}', user.pk, ttl)
+        with self._lock:
+            tokens = [
+                item for item in (self.store.get(f'user-tokens:{user.pk}') or [])
+                if self.store.get(f'token:{item}') is not None
+            ]
+            self.store.set(f'user-tokens:{user.pk}', tokens + [digest], ttl)
+        return token, ttl
+
+    def user_id(self, token: str) -> Optional[int]:
+        return self.store.get(f'token:{_digest(token)}')
+
+    def revoke(self, token: str):
+        self.store.delete(f'token:{_digest(token)}')
+
+    def revoke_user(self, user_id: int):
+        for digest in self.store.get(f'user-tokens:{user_id}') or []:
+            self.store.delete(f'token:{digest}')
+        self.store.delete(f'user-tokens:{user_id}')
+
+
+class UserCache:
+    """Короткоживучий кеш користувачів за id; скидається сигналами збереження/видалення."""
+
+    def __init__(self):
+        self._store = _LocalStore()
+
+    def get(self, user_id: int):
+        user = self._store.get(user_id)
+        if user is not None:
+            CACHE_REQUESTS.inc('auth_user', 'hit')
+            return user
+        CACHE_REQUESTS.inc('auth_user', 'miss')
+        user = get_user_model()._default_manager.filter(pk=user_id).first()
+        if user is not None:
+            self._store.set(user_id, user, get_auth_config()['USER_CACHE_TTL'])
+        return user
+
+    def invalidate(self, user_id: int):
+        self._store.delete(user_id)
+
+
+token_store = TokenStore()
+user_cache = UserCache()
+_basic_credentials = _LocalStore()
+
+
+class TokenAuthentication(BaseAuthentication):
+    """Заголовок `Authorization: Token <ключ>` (або Bearer); ключ видає POST /auth/token/."""
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        keywords = [keyword.lower().encode() for keyword in get_auth_config()['KEYWORDS']]
+        if not auth or auth[0].lower() not in keywords:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        user_id = token_store.user_id(token)
+        user = user_cache.get(user_id) if user_id is not None else None
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+        return user, token
+
+    def authenticate_header(self, request):
+        return get_auth_config()['KEYWORDS'][0]
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    BasicAuthentication, що запам'ятовує HMAC перевірених облікових даних
+    на BASIC_CACHE_TTL секунд, тож хешер паролів запускається раз на TTL,
+    а не на кожен запит.
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        digest = _digest(f'{userid}:{password}')
+        user_id = _basic_credentials.get(digest)
+        if user_id is not None:
+            user = user_cache.get(user_id)
+            if user is not None and user.is_active:
+                CACHE_REQUESTS.inc('basic_auth', 'hit')
+                return user, None
+        CACHE_REQUESTS.inc('basic_auth', 'miss')
+        user, auth = super().authenticate_credentials(userid, password, request)
+        _basic_credentials.set(digest, user.pk, get_auth_config()['BASIC_CACHE_TTL'])
+        return user, auth
+
+
+def issue_token(user) -> dict:
+    token, ttl = token_store.issue(user)
+    return {'token': token, 'expires_at': timezone.now() + timedelta(seconds=ttl)}
+
+
+def _user_changed(sender, instance, **kwargs):
+    # Зміна пароля чи деактивація має діяти одразу, а не після TTL
+    user_cache.invalidate(instance.pk)
+    _basic_credentials.delete_where(lambda user_id: user_id == instance.pk)
+    if not getattr(instance, 'is_active', True) or kwargs.get('signal') is post_delete:
+        token_store.revoke_user(instance.pk)
+
+
+post_save.connect(_user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='cinema_auth_user_saved')
+post_delete.connect(_user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='cinema_auth_user_deleted')
@@ -0,0 +1,207 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+
+from .holds import seat_holds
+from .models import Ticket
+from .occupancy import occupancy_cache, seat_bit
+from .unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+BOOKING_QUEUE_DEFAULTS = {
+    'ENABLED': False,
+    'BATCH_WINDOW_MS': 5,
+    'MAX_BATCH': 200,
+    'IDLE_SECONDS': 30,
+    'TIMEOUT': 10,
+}
+
+
+def get_booking_queue_config() -> dict:
+    return {**BOOKING_QUEUE_DEFAULTS, **getattr(settings, 'BOOKING_QUEUE', {})}
+
+
+@dataclass
+class BookingRequest:
+    session_id: int
+    customer_id: int
+    seat_number: int
+    purchase_date: Decimal
+    hold_token: Optional[str] = None
+    owner: Optional[int] = None
+    future: Future = field(default_factory=Future)
+
+
+@dataclass
+class BookingResult:
+    status: str
+    ticket: Optional[Ticket] = None
+    error: str = ''
+
+    @property
+    def created(self) -> bool:
+        return self.status == 'created'
+
+
+class SessionBookingWorker(threading.Thread):
+    """
+    Актор одного сеансу: збирає запити протягом BATCH_WINDOW_MS, вирішує
+    конфлікти в пам'яті за бітовою маскою місць і записує партію одним
+    bulk_create. Після IDLE_SECONDS без запитів потік завершується.
+    """
+
+    def __init__(self, owner: 'BookingQueue', session_id: int, config: dict):
+        super().__init__(name=f'booking-session-{session_id}', daemon=True)
+        self.owner = owner
+        self.session_id = session_id
+        self.config = config
+        self.requests: 'queue.Queue[BookingRequest]' = queue.Queue()
+
+    def run(self):
+        window = self.config['BATCH_WINDOW_MS'] / 1000.0
+        try:
+            while True:
+                try:
+                    first = self.requests.get(timeout=self.config['IDLE_SECONDS'])
+                except queue.Empty:
+                    if self.owner._retire(self):
+                        return
+                    continue
+
+                batch = [first]
+                deadline = time.monotonic() + window
+                while len(batch) < self.config['MAX_BATCH']:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self.requests.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                self._process(batch)
+        finally:
+            connection.close()
+
+    def _resolve(self, batch: List[BookingRequest]) -> List[BookingRequest]:
+        occupancy = occupancy_cache.get(self.session_id)
+        taken = occupancy.seats if occupancy else 0
+        accepted = []
+        for request in batch:
+            bit = seat_bit(request.seat_number, occupancy.capacity) if occupancy else 0
+            hold = seat_holds.holder(self.session_id, request.seat_number)
+            if not bit:
+                request.future.set_result(BookingResult('invalid', error=f'Seat {request.seat_number} does not exist'))
+            elif taken & bit:
+                request.future.set_result(BookingResult('taken', error=f'Seat {request.seat_number} is already taken'))
+            elif hold is not None and (hold.token != request.hold_token or not hold.owned_by(request.owner)):
+                request.future.set_result(BookingResult('held', error=f'Seat {request.seat_number} is held'))
+            else:
+                taken |= bit
+                accepted.append(request)
+        return accepted
+
+    def _insert(self, accepted: List[BookingRequest]) -> List[BookingRequest]:
+        rows = [
+            {
+                'session_id': self.session_id,
+                'customer_id': request.customer_id,
+                'seat_number': request.seat_number,
+                'purchase_date': request.purchase_date,
+            }
+            for request in accepted
+        ]
+        uow = UnitOfWork()
+        try:
+            uow.tickets.bulk_create(rows)
+            return accepted
+        except IntegrityError:
+            # Місце продав інший процес - маска застаріла; вставляємо поштучно
+            occupancy_cache.invalidate(self.session_id)
+        inserted = []
+        for request, row in zip(accepted, rows):
+            try:
+                with transaction.atomic():
+                    uow.tickets.create(**row)
+                inserted.append(request)
+            except IntegrityError:
+                request.future.set_result(
+                    BookingResult('taken', error=f'Seat {request.seat_number} is already taken')
+                )
+        return inserted
+
+    def _process(self, batch: List[BookingRequest]):
+        close_old_connections()
+        try:
+            accepted = self._resolve(batch)
+            if not accepted:
+                return
+            inserted = self._insert(accepted)
+            # bulk_create на MySQL не повертає ключі - перечитуємо квитки за місцями
+            tickets: Dict[int, Ticket] = {
+                ticket.seat_number: ticket
+                for ticket in Ticket.objects.filter(
+                    session_id=self.session_id,
+                    seat_number__in=[request.seat_number for request in inserted]
+                )
+            }
+            for request in inserted:
+                if request.hold_token:
+                    seat_holds.consume(request.hold_token, [request.seat_number])
+                request.future.set_result(BookingResult('created', tickets.get(request.seat_number)))
+        except Exception as exc:
+            logger.exception('booking batch for session %s failed', self.session_id)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(exc)
+
+
+class BookingQueue:
+
+    def __init__(self):
+        self._workers: Dict[int, SessionBookingWorker] = {}
+        self._lock = threading.Lock()
+
+    def _retire(self, worker: SessionBookingWorker) -> bool:
+        # Запит міг потрапити в чергу між таймаутом і блокуванням - тоді працюємо далі
+        with self._lock:
+            if not worker.requests.empty():
+                return False
+            if self._workers.get(worker.session_id) is worker:
+                del self._workers[worker.session_id]
+            return True
+
+    def submit(self, request: BookingRequest) -> Future:
+        with self._lock:
+            worker = self._workers.get(request.session_id)
+            if worker is None:
+                worker = SessionBookingWorker(self, request.session_id, get_booking_queue_config())
+                self._workers[request.session_id] = worker
+                worker.start()
+            worker.requests.put(request)
+        return request.future
+
+    def book(self, request: BookingRequest, timeout: Optional[float] = None) -> BookingResult:
+        """
+        Не кидає винятків: після таймауту чи збою партії запис міг уже
+        закомітитись, тож результат 'pending' / 'failed' означає "невідомо".
+        """
+        if timeout is None:
+            timeout = get_booking_queue_config()['TIMEOUT']
+        try:
+            return self.submit(request).result(timeout=timeout)
+        except FutureTimeoutError:
+            return BookingResult('pending', error=f'Booking of seat {request.seat_number} is still in progress')
+        except Exception:
+            return BookingResult('failed', error=f'Booking of seat {request.seat_number} failed')
+
+
+booking_queue = BookingQueue()
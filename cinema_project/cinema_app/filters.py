@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import serializers
+
+from .specifications import AllOf, Lookup, OnDate, Query, Specification
+
+
+def _date(value: str):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+def _datetime(value: str):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed = parse_datetime(f'{_date(value)}T00:00:00')
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _decimal(value: str) -> Decimal:
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(value)
+
+
+CASTS: Dict[str, Callable[[str], Any]] = {
+    'int': int,
+    'str': str,
+    'decimal': _decimal,
+    'date': _date,
+    'datetime': _datetime,
+}
+
+
+@dataclass(frozen=True)
+class FilterParam:
+    """
+    Параметр запиту -> специфікація. lookup='date' - увесь день (OnDate);
+    для 'exact' кілька значень через кому стають 'in'.
+    """
+    field: str
+    cast: str = 'int'
+    lookup: str = 'exact'
+
+    def spec(self, raw: str) -> Specification:
+        cast = CASTS[self.cast]
+        if self.lookup == 'date':
+            return OnDate(self.field, _date(raw))
+        if self.lookup in ('exact', 'in') and (',' in raw or self.lookup == 'in'):
+            return Lookup(self.field, 'in', [cast(item) for item in raw.split(',') if item])
+        return Lookup(self.field, self.lookup, cast(raw))
+
+
+def _non_negative(params: Mapping[str, str], name: str) -> Optional[int]:
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise serializers.ValidationError({name: ['Must be a non-negative integer.']})
+    return value
+
+
+def build_query(params: Mapping[str, str], filters: Mapping[str, FilterParam],
+                ordering_fields: Sequence[str]) -> Query:
+    """
+    ?<фільтр>=...&ordering=-field,field&limit=&offset= -> Query.
+    Невідомі параметри ігноруються, некоректні значення дають 400.
+    """
+    specs: List[Specification] = []
+    errors = {}
+    for name, param in filters.items():
+        raw = params.get(name)
+        if raw in (None, ''):
+            continue
+        try:
+            specs.append(param.spec(raw))
+        except (TypeError, ValueError):
+            errors[name] = [f'Invalid value "{raw}".']
+
+    ordering = []
+    for item in (params.get('ordering') or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item.lstrip('-') not in ordering_fields:
+            errors['ordering'] = [f"Cannot order by \"{item}\". Available: {', '.join(ordering_fields)}"]
+            continue
+        ordering.append(item)
+
+    if errors:
+        raise serializers.ValidationError(errors)
+
+    where = None
+    if len(specs) == 1:
+        where = specs[0]
+    elif specs:
+        where = AllOf(tuple(specs))
+    return Query(
+        where=where,
+        ordering=tuple(ordering),
+        limit=_non_negative(params, 'limit'),
+        offset=_non_negative(params, 'offset') or 0,
+    )
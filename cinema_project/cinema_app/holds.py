@@ -0,0 +1,182 @@
+import heapq
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def hold_seconds() -> int:
+    return getattr(settings, 'SEAT_HOLD_SECONDS', 120)
+
+
+def check_hold_store():
+    """
+    Викликається при старті: утримання живуть у пам'яті процесу, тож інший
+    воркер не бачить утриманого місця і продає його - це помилка конфігурації.
+    """
+    workers = getattr(settings, 'WORKERS', 1)
+    if workers > 1:
+        raise ImproperlyConfigured(
+            f'Seat holds are kept in process memory, but WORKERS={workers}; '
+            'seat holds are not shared between processes, run a single worker (threads are fine).'
+        )
+
+
+@dataclass
+class SeatHold:
+    token: str
+    session_id: int
+    seats: List[int]
+    expires_at: float
+    owner: Optional[int] = None
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def owned_by(self, owner: Optional[int]) -> bool:
+        return self.owner is None or self.owner == owner
+
+    def to_dict(self) -> dict:
+        return {
+            'token': self.token,
+            'session': self.session_id,
+            'seats': self.seats,
+            'expires_at': timezone.now() + timedelta(seconds=self.expires_at - time.time()),
+        }
+
+
+class SeatHoldStore:
+    """
+    Тимчасові утримання місць у пам'яті процесу, ключ - (сеанс, місце).
+    Терміни зберігаються в купі, тож фоновий sweeper знімає всі
+    прострочені утримання одним проходом без перебору всього сховища.
+    """
+
+    def __init__(self, sweep_interval: Optional[float] = None):
+        self._holds: Dict[str, SeatHold] = {}
+        self._seats: Dict[int, Dict[int, str]] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._sweeper: Optional[threading.Thread] = None
+
+    def _drop(self, hold: SeatHold, seats: Optional[Sequence[int]] = None):
+        held = self._seats.get(hold.session_id, {})
+        for seat in hold.seats if seats is None else seats:
+            if held.get(seat) == hold.token:
+                del held[seat]
+        if not held:
+            self._seats.pop(hold.session_id, None)
+        if seats is None:
+            self._holds.pop(hold.token, None)
+        else:
+            consumed = set(seats)
+            hold.seats = [seat for seat in hold.seats if seat not in consumed]
+            if not hold.seats:
+                self._holds.pop(hold.token, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        expired = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, token = heapq.heappop(self._expiry)
+                hold = self._holds.get(token)
+                if hold is not None and hold.expires_at <= now:
+                    self._drop(hold)
+                    expired += 1
+        return expired
+
+    def _run_sweeper(self):
+        interval = self._sweep_interval or getattr(settings, 'SEAT_HOLD_SWEEP_SECONDS', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                expired = self.sweep()
+                if expired:
+                    logger.debug('expired %s seat holds', expired)
+            except Exception:
+                logger.exception('seat hold sweep failed')
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._run_sweeper, name='seat-hold-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _active(self, token: Optional[str], now: float) -> Optional[SeatHold]:
+        hold = self._holds.get(token) if token else None
+        return hold if hold is not None and hold.expires_at > now else None
+
+    def held_seats(self, session_id: int, exclude_token: Optional[str] = None) -> List[int]:
+        now = time.time()
+        with self._lock:
+            return sorted(
+                seat for seat, token in self._seats.get(session_id, {}).items()
+                if token != exclude_token and self._active(token, now)
+            )
+
+    def held_bitmap(self, session_id: int, exclude_token: Optional[str] = None) -> int:
+        bitmap = 0
+        for seat in self.held_seats(session_id, exclude_token):
+            if seat >= 1:
+                bitmap |= 1 << (seat - 1)
+        return bitmap
+
+    def holder(self, session_id: int, seat_number: int) -> Optional[SeatHold]:
+        with self._lock:
+            return self._active(self._seats.get(session_id, {}).get(seat_number), time.time())
+
+    def hold(self, session_id: int, seats: Sequence[int], seconds: Optional[int] = None,
+             owner: Optional[int] = None,
+             verify: Optional[Callable[[Sequence[int]], bool]] = None) -> Optional[SeatHold]:
+        """
+        Атомарно утримує всі місця або жодного (None, якщо хоч одне вже
+        утримано або verify(seats) під блокуванням повернув False).
+        """
+        seconds = hold_seconds() if seconds is None else seconds
+        now = time.time()
+        with self._lock:
+            held = self._seats.setdefault(session_id, {})
+            if any(self._active(held.get(seat), now) for seat in seats):
+                return None
+            if verify is not None and not verify(seats):
+                return None
+            hold = SeatHold(uuid.uuid4().hex, session_id, sorted(seats), now + seconds, owner)
+            self._holds[hold.token] = hold
+            for seat in seats:
+                held[seat] = hold.token
+            heapq.heappush(self._expiry, (hold.expires_at, hold.token))
+            self._ensure_sweeper()
+        return hold
+
+    def get(self, token: str) -> Optional[SeatHold]:
+        with self._lock:
+            return self._active(token, time.time())
+
+    def release(self, token: str) -> bool:
+        with self._lock:
+            hold = self._holds.get(token)
+            if hold is None:
+                return False
+            self._drop(hold)
+            return True
+
+    def consume(self, token: str, seats: Sequence[int]):
+        """Знімає утримання з місць, які щойно стали квитками."""
+        with self._lock:
+            hold = self._holds.get(token)
+            if hold is not None:
+                self._drop(hold, seats)
+
+
+seat_holds = SeatHoldStore()
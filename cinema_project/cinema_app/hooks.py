@@ -0,0 +1,94 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import models
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOOKS = ['cinema_app.metrics.MetricsHook', 'cinema_app.occupancy.OccupancyHook']
+
+
+@dataclass
+class RepositoryCall:
+    model: str
+    method: str
+    args: Tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    duration: Optional[float] = None
+    rows: Optional[int] = None
+    result: Any = None
+    error: Optional[BaseException] = None
+    context: Dict[str, Any] = field(default_factory=dict)
+
+
+class RepositoryHook:
+    """
+    Базовий клас хука репозиторію. `before` викликається перед методом,
+    `after` - після нього (також при винятку, тоді заповнено `call.error`).
+    """
+
+    def before(self, call: RepositoryCall):
+        pass
+
+    def after(self, call: RepositoryCall):
+        pass
+
+
+class SlowCallLoggingHook(RepositoryHook):
+
+    def __init__(self, threshold_ms: Optional[float] = None):
+        if threshold_ms is None:
+            threshold_ms = getattr(settings, 'REPOSITORY_SLOW_CALL_MS', 200)
+        self.threshold = threshold_ms / 1000.0
+
+    def after(self, call: RepositoryCall):
+        if call.duration >= self.threshold:
+            logger.warning(
+                '%s.%s took %.1f ms (rows=%s, args=%r, kwargs=%r)',
+                call.model, call.method, call.duration * 1000,
+                call.rows, call.args, call.kwargs
+            )
+
+
+def count_rows(result) -> Optional[int]:
+    if result is None:
+        return 0
+    if isinstance(result, models.Model):
+        return 1
+    if isinstance(result, (list, tuple, set, dict)):
+        return len(result)
+    return None
+
+
+_hooks: Optional[Tuple[RepositoryHook, ...]] = None
+_hooks_lock = threading.Lock()
+
+
+def get_hooks() -> Tuple[RepositoryHook, ...]:
+    global _hooks
+    if _hooks is None:
+        with _hooks_lock:
+            if _hooks is None:
+                paths = getattr(settings, 'REPOSITORY_HOOKS', DEFAULT_HOOKS)
+                _hooks = tuple(import_string(path)() for path in paths)
+    return _hooks
+
+
+def register_hook(hook: RepositoryHook) -> RepositoryHook:
+    global _hooks
+    get_hooks()
+    with _hooks_lock:
+        # Кортеж замінюється цілком, тож читання у get_hooks не потребує блокування
+        _hooks = _hooks + (hook,)
+    return hook
+
+
+def unregister_hook(hook: RepositoryHook):
+    global _hooks
+    get_hooks()
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
@@ -0,0 +1,235 @@
+"""
+Навантажувальні сценарії для API: перегляд каталогу, схеми залу та
+одночасні покупки квитків на один сеанс. Запускаються командою
+`manage.py loadtest` проти локального сервера.
+"""
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+_SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+CONFLICT_STATUSES = {400, 409}
+# Відмова throttling-у (429) - окремий результат, не успіх і не конфлікт
+THROTTLED_STATUS = 429
+
+
+@dataclass
+class Sample:
+    scenario: str
+    name: str
+    status: int
+    latency: float
+    queries: Optional[int] = None
+    db_ms: Optional[float] = None
+    error: str = ''
+
+
+class LoadClient:
+    """Один потік навантаження: власна keep-alive сесія requests і свій список вимірів."""
+
+    def __init__(self, base_url: str, auth: Optional[Tuple[str, str]], timeout: float = 10.0):
+        self.base_url = base_url.rstrip('/')
+        self.http = requests.Session()
+        self.http.auth = auth
+        self.timeout = timeout
+        self.samples: List[Sample] = []
+
+    def request(self, scenario: str, name: str, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException as exc:
+            self.samples.append(Sample(scenario, name, 0, time.perf_counter() - start, error=str(exc)))
+            return None
+        latency = time.perf_counter() - start
+
+        queries = db_ms = None
+        match = _SERVER_TIMING_DB.search(response.headers.get('Server-Timing', ''))
+        if match:
+            db_ms, queries = float(match.group(1)), int(match.group(2))
+        self.samples.append(Sample(scenario, name, response.status_code, latency, queries, db_ms))
+        return response
+
+
+class Scenario(ABC):
+    name = ''
+
+    def __init__(self, weight: float = 1.0):
+        self.weight = weight
+
+    def setup(self, client: LoadClient):
+        pass
+
+    @abstractmethod
+    def step(self, client: LoadClient, rng: random.Random):
+        ...
+
+
+class CatalogScenario(Scenario):
+    name = 'catalog'
+    queries = ('the', 'love', 'war', 'star', 'night', 'dark', 'man')
+
+    def step(self, client, rng):
+        choice = rng.random()
+        if choice < 0.5:
+            client.request(self.name, 'GET /movies/', 'GET', '/movies/')
+        elif choice < 0.8:
+            client.request(self.name, 'GET /movies/search/', 'GET', '/movies/search/',
+                           params={'q': rng.choice(self.queries)})
+        else:
+            client.request(self.name, 'GET /sessions/upcoming/', 'GET', '/sessions/upcoming/')
+
+
+class SeatMapScenario(Scenario):
+    name = 'seatmap'
+
+    def __init__(self, session_id: int, weight: float = 1.0):
+        super().__init__(weight)
+        self.session_id = session_id
+
+    def step(self, client, rng):
+        if rng.random() < 0.6:
+            client.request(self.name, 'GET /sessions/{id}/seats/', 'GET', f'/sessions/{self.session_id}/seats/')
+        else:
+            client.request(self.name, 'GET /sessions/{id}/best-seats/', 'GET',
+                           f'/sessions/{self.session_id}/best-seats/', params={'n': rng.randint(1, 4)})
+
+
+class BookingScenario(Scenario):
+    """Одночасні POST /tickets/ на один сеанс; 400/409 - конфлікти місць, 429 - throttled."""
+    name = 'booking'
+
+    def __init__(self, session_id: int, customer_id: int, capacity: int, weight: float = 1.0):
+        super().__init__(weight)
+        self.session_id = session_id
+        self.customer_id = customer_id
+        self.capacity = capacity
+
+    def step(self, client, rng):
+        client.request(self.name, 'POST /tickets/', 'POST', '/tickets/', json={
+            'session': self.session_id,
+            'customer': self.customer_id,
+            'seat_number': rng.randint(1, self.capacity),
+            'purchase_date': '0.00',
+        })
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+@dataclass
+class ScenarioStats:
+    scenario: str
+    requests: int = 0
+    throughput: float = 0.0
+    p50_ms: float = 0.0
+    p90_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+    max_ms: float = 0.0
+    error_rate: float = 0.0
+    conflict_rate: float = 0.0
+    throttled_rate: float = 0.0
+    avg_queries: Optional[float] = None
+    avg_db_ms: Optional[float] = None
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+def summarize(samples: Sequence[Sample], elapsed: float) -> List[ScenarioStats]:
+    groups: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        groups[sample.scenario].append(sample)
+        groups['total'].append(sample)
+
+    result = []
+    for scenario, items in groups.items():
+        latencies = sorted(sample.latency * 1000 for sample in items)
+        statuses: Dict[int, int] = defaultdict(int)
+        for sample in items:
+            statuses[sample.status] += 1
+        errors = sum(1 for sample in items if sample.status == 0 or sample.status >= 500)
+        conflicts = sum(
+            1 for sample in items
+            if sample.scenario == BookingScenario.name and sample.status in CONFLICT_STATUSES
+        )
+        throttled = sum(1 for sample in items if sample.status == THROTTLED_STATUS)
+        profiled = [sample for sample in items if sample.queries is not None]
+        result.append(ScenarioStats(
+            scenario=scenario,
+            requests=len(items),
+            throughput=len(items) / elapsed if elapsed else 0.0,
+            p50_ms=percentile(latencies, 0.50),
+            p90_ms=percentile(latencies, 0.90),
+            p95_ms=percentile(latencies, 0.95),
+            p99_ms=percentile(latencies, 0.99),
+            max_ms=latencies[-1],
+            error_rate=errors / len(items),
+            conflict_rate=conflicts / len(items),
+            throttled_rate=throttled / len(items),
+            avg_queries=sum(s.queries for s in profiled) / len(profiled) if profiled else None,
+            avg_db_ms=sum(s.db_ms for s in profiled) / len(profiled) if profiled else None,
+            statuses=dict(sorted(statuses.items())),
+        ))
+    return sorted(result, key=lambda stats: (stats.scenario == 'total', stats.scenario))
+
+
+def run_load_test(base_url: str, scenarios: Sequence[Scenario], concurrency: int = 10,
+                  duration: float = 30.0, auth: Optional[Tuple[str, str]] = None,
+                  seed: Optional[int] = None,
+                  client_auth: Optional[Sequence[Tuple[str, str]]] = None) -> Tuple[List[ScenarioStats], float]:
+    """
+    Кожен із `concurrency` потоків до завершення `duration` обирає сценарій
+    за вагою і виконує один його крок. Повертає статистику та тривалість.
+    `client_auth` - окремі облікові дані для кожного потоку: throttling
+    рахує запити на користувача, тож спільний `auth` швидко впирається в 429.
+    """
+    weights = [scenario.weight for scenario in scenarios]
+    clients = [
+        LoadClient(base_url, client_auth[index % len(client_auth)] if client_auth else auth)
+        for index in range(concurrency)
+    ]
+    setup_client = LoadClient(base_url, auth)
+    for scenario in scenarios:
+        scenario.setup(setup_client)
+
+    start_barrier = threading.Barrier(concurrency + 1)
+    stop_at = [0.0]
+
+    def worker(client: LoadClient, worker_seed):
+        rng = random.Random(worker_seed)
+        start_barrier.wait()
+        while time.perf_counter() < stop_at[0]:
+            rng.choices(scenarios, weights)[0].step(client, rng)
+
+    threads = [
+        threading.Thread(target=worker, args=(client, None if seed is None else seed + index), daemon=True)
+        for index, client in enumerate(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    stop_at[0] = started + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for client in clients for sample in client.samples]
+    return summarize(samples, elapsed), elapsed
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema_app import serializers
+from cinema_app.profiling import QueryProfile
+from cinema_app.unit_of_work import UnitOfWork
+
+TARGETS = {
+    'genres': ('GenreSerializer', 'GenreRowSerializer'),
+    'halls': ('HallSerializer', 'HallRowSerializer'),
+    'job_positions': ('JobPositionSerializer', 'JobPositionRowSerializer'),
+    'employees': ('EmployeeSerializer', 'EmployeeRowSerializer'),
+    'movies': ('MovieSerializer', 'MovieRowSerializer'),
+    'customers': ('CustomerSerializer', 'CustomerRowSerializer'),
+    'sessions': ('SessionSerializer', 'SessionRowSerializer'),
+    'tickets': ('TicketSerializer', 'TicketRowSerializer'),
+}
+
+
+def _by_pk(items):
+    return sorted(items, key=lambda item: next(iter(item.values())))
+
+
+class Command(BaseCommand):
+    help = (
+        'Порівнює list через ModelSerializer і через швидкі RowSerializer: '
+        'час на рядок, кількість SQL-запитів і чи збігається вивід.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(TARGETS), action='append',
+                            help='Репозиторій для заміру (можна кілька разів), за замовчуванням усі.')
+        parser.add_argument('--repeat', type=int, default=3, help='Кращий із N прогонів.')
+
+    def measure(self, run, repeat):
+        best = None
+        for _ in range(repeat):
+            with QueryProfile() as profile:
+                data = run()
+            if best is None or profile.elapsed < best[1].elapsed:
+                best = (data, profile)
+        return best
+
+    def handle(self, *args, **options):
+        uow = UnitOfWork()
+        repeat = max(1, options['repeat'])
+        self.stdout.write(
+            f'{"repository":<14} {"rows":>7} {"model us/row":>13} {"rows us/row":>12} '
+            f'{"speedup":>8} {"queries":>13} {"same":>5}'
+        )
+        mismatches = []
+        for name in options['model'] or list(TARGETS):
+            model_name, row_name = TARGETS[name]
+            model_serializer = getattr(serializers, model_name)
+            reader = getattr(serializers, row_name)()
+            repository = getattr(uow, name)
+
+            slow, slow_profile = self.measure(
+                lambda: model_serializer(repository.get_all(), many=True).data, repeat
+            )
+            fast, fast_profile = self.measure(lambda: reader.render(reader.fetch(repository)), repeat)
+
+            rows = len(fast)
+            same = _by_pk([dict(item) for item in slow]) == _by_pk(fast)
+            if not same:
+                mismatches.append(name)
+            per_row = max(rows, 1)
+            self.stdout.write(
+                f'{name:<14} {rows:>7} {slow_profile.elapsed / per_row * 1e6:>13.1f} '
+                f'{fast_profile.elapsed / per_row * 1e6:>12.1f} '
+                f'{slow_profile.elapsed / max(fast_profile.elapsed, 1e-9):>7.1f}x '
+                f'{slow_profile.count:>6} -> {fast_profile.count:<4} {"yes" if same else "NO":>5}'
+            )
+
+        if mismatches:
+            raise CommandError(f'Row serializers differ from ModelSerializer for: {", ".join(mismatches)}')
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from cinema_app.models import Customer, Genre, Hall, Session
+from cinema_app.profiling import QueryProfile
+from cinema_app.unit_of_work import UnitOfWork
+
+FULL_SCAN_TYPES = {'ALL', 'index'}
+
+
+def _first_pk(model) -> int:
+    return model.objects.values_list('pk', flat=True).order_by('pk').first() or 1
+
+
+def build_probes(uow: UnitOfWork):
+    session = Session.objects.order_by('-start_time').values('start_time', 'hall_id').first()
+    day = timezone.localtime(session['start_time']).date() if session else timezone.localdate()
+    hall_id = session['hall_id'] if session else _first_pk(Hall)
+    genre_id = _first_pk(Genre)
+    customer_id = _first_pk(Customer)
+    session_id = _first_pk(Session)
+
+    return [
+        ('sessions.get_upcoming_sessions', lambda: uow.sessions.get_upcoming_sessions()),
+        ('sessions.get_by_date', lambda: uow.sessions.get_by_date(day)),
+        ('sessions.get_by_hall', lambda: uow.sessions.get_by_hall(hall_id)),
+        ('tickets.get_by_customer', lambda: uow.tickets.get_by_customer(customer_id)),
+        ('tickets.get_occupied_seats', lambda: uow.tickets.get_occupied_seats(session_id)),
+        ('movies.get_by_genre', lambda: uow.movies.get_by_genre(genre_id)),
+        ('movies.get_by_year', lambda: uow.movies.get_by_year(day.year)),
+        ('movies.get_by_age_limit', lambda: uow.movies.get_by_age_limit(12)),
+        ('employees.get_by_salary_range', lambda: uow.employees.get_by_salary_range(10000, 20000)),
+        ('employees.get_highest_paid', lambda: uow.employees.get_highest_paid()),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Виконує запити репозиторіїв, запускає для них EXPLAIN '
+        'і показує ті, що досі роблять повне сканування таблиці.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-scan', action='store_true',
+            help='Завершитись з помилкою, якщо знайдено повне сканування.'
+        )
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError(f'EXPLAIN format is only supported for MySQL, not {connection.vendor}')
+
+        full_scans = 0
+        for label, probe in build_probes(UnitOfWork()):
+            with QueryProfile(label=label) as profile:
+                probe()
+
+            for query in profile.queries:
+                if not query.sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                for row in self.explain(query.sql, query.params):
+                    line = (
+                        f"{label}: table={row.get('table')} type={row.get('type')} "
+                        f"key={row.get('key')} rows={row.get('rows')}"
+                    )
+                    if row.get('type') in FULL_SCAN_TYPES:
+                        full_scans += 1
+                        self.stdout.write(self.style.WARNING(f'FULL SCAN  {line}'))
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f'ok         {line}'))
+
+        if full_scans and options['fail_on_scan']:
+            raise CommandError(f'{full_scans} repository queries still scan full tables')
+        self.stdout.write(f'Full scans: {full_scans}')
@@ -0,0 +1,159 @@
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Count
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from cinema_app.models import Hall, Movie, Session, Ticket
+from cinema_app.schedule_optimizer import DayInput, HallInfo, MovieStats, optimize_schedule
+from cinema_app.scheduling import SessionCandidate, SessionScheduler, locked_halls, opening_window
+from cinema_app.unit_of_work import UnitOfWork
+
+
+def load_movie_stats(movie_ids=None):
+    """Попит фільму - середня кількість проданих квитків на сеанс."""
+    movies = Movie.objects.all()
+    if movie_ids:
+        movies = movies.filter(movie_id__in=movie_ids)
+    movies = list(movies.values_list('movie_id', 'duration'))
+
+    sessions = {
+        row['movie_id']: row
+        for row in Session.objects.values('movie_id').annotate(count=Count('pk'), price=Avg('price'))
+    }
+    tickets = dict(
+        Ticket.objects.values('session__movie_id').annotate(count=Count('pk'))
+        .values_list('session__movie_id', 'count')
+    )
+
+    demand = {
+        movie_id: tickets.get(movie_id, 0) / row['count']
+        for movie_id, row in sessions.items() if row['count']
+    }
+    # фільми без історії отримують медіанний попит
+    fallback_demand = statistics.median(demand.values()) if demand else 1.0
+    default_price = float(getattr(settings, 'SCHEDULE_DEFAULT_PRICE', 150))
+
+    return [
+        MovieStats(
+            movie_id=movie_id,
+            duration=duration,
+            demand=demand.get(movie_id, fallback_demand),
+            price=float(sessions[movie_id]['price']) if movie_id in sessions else default_price,
+        )
+        for movie_id, duration in movies
+    ]
+
+
+def load_halls(hall_ids=None):
+    factors = getattr(settings, 'SCHEDULE_HALL_PRICE_FACTORS', {})
+    halls = Hall.objects.all()
+    if hall_ids:
+        halls = halls.filter(hall_id__in=hall_ids)
+    return [
+        HallInfo(hall_id=hall_id, capacity=capacity, price_factor=factors.get(hall_type, 1.0))
+        for hall_id, capacity, hall_type in halls.values_list('hall_id', 'capacity', 'type')
+    ]
+
+
+def load_days(first_day: date, days: int, hall_ids, scheduler: SessionScheduler):
+    """Вже заплановані сеанси перетворюються на зайняті проміжки в хвилинах від відкриття."""
+    windows = [opening_window(first_day + timedelta(days=offset)) for offset in range(days)]
+    schedules = scheduler.load(hall_ids, windows[0][0], windows[-1][1])
+
+    result = []
+    for open_at, close_at in windows:
+        day = DayInput(open_at=open_at, close_at=close_at)
+        for hall_id, schedule in schedules.items():
+            for conflict in schedule.conflicts(open_at, close_at):
+                start = int((conflict.start - open_at).total_seconds() // 60)
+                end = -(-int((conflict.end - open_at).total_seconds()) // 60)
+                day.busy.setdefault(hall_id, []).append((start, end))
+        result.append(day)
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерує розклад сеансів на тиждень: жадібне заповнення залів '
+        'за очікуваним доходом і локальний пошук у межах бюджету часу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Перший день (YYYY-MM-DD), за замовчуванням завтра.')
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--time-budget', type=float, default=10.0,
+                            help='Загальний час оптимізації в секундах.')
+        parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 7),
+                            help='Кількість процесів (дні оптимізуються паралельно).')
+        parser.add_argument('--decay', type=float, default=0.8,
+                            help='Спад попиту на кожен наступний сеанс того ж фільму за день.')
+        parser.add_argument('--halls', type=int, nargs='*', help='ID залів (за замовчуванням усі).')
+        parser.add_argument('--movies', type=int, nargs='*', help='ID фільмів (за замовчуванням усі).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати розклад.')
+
+    def handle(self, *args, **options):
+        if options['start']:
+            first_day = parse_date(options['start'])
+            if first_day is None:
+                raise CommandError('--start має бути у форматі YYYY-MM-DD')
+        else:
+            first_day = timezone.localdate() + timedelta(days=1)
+
+        movies = load_movie_stats(options['movies'])
+        halls = load_halls(options['halls'])
+        if not movies or not halls:
+            raise CommandError('Немає фільмів або залів для планування')
+
+        scheduler = SessionScheduler()
+        buffer_minutes = int(scheduler.buffer.total_seconds() // 60)
+        days = load_days(first_day, options['days'], [hall.hall_id for hall in halls], scheduler)
+
+        started = time.perf_counter()
+        planned = optimize_schedule(
+            days, movies, halls,
+            buffer_minutes=buffer_minutes,
+            decay=options['decay'],
+            hour_weights=getattr(settings, 'SCHEDULE_HOUR_WEIGHTS', None),
+            time_budget=options['time_budget'],
+            workers=options['workers'],
+            seed=options['seed'],
+        )
+        elapsed = time.perf_counter() - started
+
+        durations = {movie.movie_id: movie.duration for movie in movies}
+        for session in sorted(planned, key=lambda item: (item.start_time, item.hall_id)):
+            self.stdout.write(
+                f'{timezone.localtime(session.start_time):%Y-%m-%d %H:%M}  hall={session.hall_id:<4} '
+                f'movie={session.movie_id:<5} price={session.price:>8.2f}  '
+                f'expected={session.expected_revenue:>10.2f}'
+            )
+        total = sum(session.expected_revenue for session in planned)
+        self.stdout.write(
+            f'Sessions: {len(planned)}, expected revenue: {total:.2f}, optimized in {elapsed:.1f}s'
+        )
+        if options['dry_run'] or not planned:
+            return
+
+        with locked_halls({session.hall_id for session in planned}):
+            errors = scheduler.validate([
+                SessionCandidate(hall_id=session.hall_id, start_time=session.start_time,
+                                 duration=durations[session.movie_id], index=index)
+                for index, session in enumerate(planned)
+            ])
+            if errors:
+                raise CommandError(f'Згенерований розклад перетинається з існуючим: {errors[:3]}')
+
+            created = UnitOfWork().sessions.bulk_create([
+                {'movie_id': session.movie_id, 'hall_id': session.hall_id,
+                 'start_time': session.start_time, 'price': Decimal(f'{session.price:.2f}')}
+                for session in planned
+            ])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} sessions'))
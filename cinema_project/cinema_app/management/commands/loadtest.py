@@ -0,0 +1,106 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cinema_app.loadtest import BookingScenario, CatalogScenario, SeatMapScenario, run_load_test
+from cinema_app.models import Customer, Session
+
+SCENARIOS = ('catalog', 'seatmap', 'booking')
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускає навантажувальні сценарії (каталог, схема залу, покупки) '
+        'проти запущеного сервера і виводить пропускну здатність, перцентилі '
+        'затримки, частку конфліктів/помилок та кількість SQL-запитів. '
+        'Кожен потік ходить під власним користувачем loadtest-N, щоб '
+        'вимірювався сервер, а не ліміт throttling-у одного користувача.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--password', default='admin')
+        parser.add_argument('--shared-user', action='store_true',
+                            help='Усі потоки під --username (упиратимуться в throttling цього користувача).')
+        parser.add_argument('--user-prefix', default='loadtest',
+                            help='Префікс користувачів потоків; створюються з паролем --password.')
+        parser.add_argument('--scenario', choices=SCENARIOS, action='append',
+                            help='Сценарій (можна кілька разів), за замовчуванням усі.')
+        parser.add_argument('--duration', type=float, default=30.0, help='Тривалість у секундах.')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--session', type=int, help='Сеанс для покупок і схеми залу.')
+        parser.add_argument('--customer', type=int, help='Покупець для POST /tickets/.')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--json', action='store_true', help='Вивести результат як JSON.')
+
+    def _target_session(self, session_id):
+        sessions = Session.objects.select_related('hall')
+        if session_id:
+            session = sessions.filter(pk=session_id).first()
+        else:
+            session = sessions.filter(start_time__gte=timezone.now()).order_by('start_time').first()
+        if session is None:
+            raise CommandError('Немає сеансу для навантаження, вкажіть --session')
+        return session
+
+    def _client_users(self, prefix, count, password):
+        users = []
+        for index in range(1, count + 1):
+            user, created = get_user_model().objects.get_or_create(username=f'{prefix}-{index}')
+            if created or not user.check_password(password):
+                user.set_password(password)
+                user.save(update_fields=['password'])
+            users.append((user.get_username(), password))
+        return users
+
+    def handle(self, *args, **options):
+        names = options['scenario'] or list(SCENARIOS)
+        scenarios = []
+        if 'catalog' in names:
+            scenarios.append(CatalogScenario(weight=3))
+        if 'seatmap' in names or 'booking' in names:
+            session = self._target_session(options['session'])
+            if 'seatmap' in names:
+                scenarios.append(SeatMapScenario(session.session_id, weight=2))
+            if 'booking' in names:
+                customer_id = options['customer'] or Customer.objects.values_list('pk', flat=True).first()
+                if customer_id is None:
+                    raise CommandError('Немає покупців, вкажіть --customer')
+                scenarios.append(BookingScenario(session.session_id, customer_id, session.hall.capacity, weight=1))
+
+        client_auth = None
+        if not options['shared_user']:
+            client_auth = self._client_users(options['user_prefix'], options['concurrency'], options['password'])
+
+        stats, elapsed = run_load_test(
+            options['base_url'], scenarios,
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            auth=(options['username'], options['password']),
+            seed=options['seed'],
+            client_auth=client_auth,
+        )
+
+        if options['json']:
+            self.stdout.write(json.dumps([item.to_dict() for item in stats], indent=2))
+            return
+
+        self.stdout.write(f'Ran {len(scenarios)} scenarios for {elapsed:.1f}s with {options["concurrency"]} workers')
+        self.stdout.write(
+            f'{"scenario":<10} {"reqs":>7} {"rps":>8} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"max":>8} {"err%":>6} {"conf%":>6} {"429%":>6} {"queries":>8} {"db ms":>7}'
+        )
+        for item in stats:
+            queries = f'{item.avg_queries:.1f}' if item.avg_queries is not None else '-'
+            db_ms = f'{item.avg_db_ms:.1f}' if item.avg_db_ms is not None else '-'
+            self.stdout.write(
+                f'{item.scenario:<10} {item.requests:>7} {item.throughput:>8.1f} {item.p50_ms:>8.1f} '
+                f'{item.p95_ms:>8.1f} {item.p99_ms:>8.1f} {item.max_ms:>8.1f} '
+                f'{item.error_rate * 100:>6.1f} {item.conflict_rate * 100:>6.1f} '
+                f'{item.throttled_rate * 100:>6.1f} {queries:>8} {db_ms:>7}'
+            )
+        if all(item.avg_queries is None for item in stats):
+            self.stdout.write('SQL counts need QUERY_PROFILING enabled on the server (Server-Timing header).')
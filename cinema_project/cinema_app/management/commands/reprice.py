@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from cinema_app.pricing import pricing_engine
+
+
+class Command(BaseCommand):
+    help = (
+        'Перераховує рекомендовані ціни майбутніх сеансів і записує '
+        'змінені ціни одним UPDATE на партію.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=168,
+                            help='Горизонт: сеанси, що починаються протягом N годин.')
+        parser.add_argument('--min-change', type=Decimal, default=Decimal('5'),
+                            help='Мінімальна різниця з поточною ціною для оновлення.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Лише показати нові ціни.')
+
+    def handle(self, *args, **options):
+        session_ids = pricing_engine.upcoming_session_ids(options['hours'])
+        quotes = pricing_engine.quote_many(session_ids)
+        prices = pricing_engine.changed(quotes.values(), options['min_change'])
+
+        for session_id, price in sorted(prices.items()):
+            quote = quotes[session_id]
+            self.stdout.write(
+                f'session={session_id:<6} {quote.current_price:>8} -> {price:>8}  '
+                f'sold={quote.sold}/{quote.capacity} pace={quote.pace:.2f} '
+                f'hours={quote.hours_to_show:.1f}'
+            )
+        self.stdout.write(f'Quoted {len(quotes)} sessions, {len(prices)} prices changed')
+
+        if prices and not options['dry_run']:
+            updated = pricing_engine.apply(prices, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Updated {updated} sessions'))
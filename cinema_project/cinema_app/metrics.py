@@ -0,0 +1,257 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import ExitStack
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.db import connections
+
+from .hooks import RepositoryCall, RepositoryHook
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Iterable, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    """
+    Кожен потік пише у власний словник (shard) без блокувань;
+    блокування береться лише при реєстрації нового потоку.
+    Під час scrape shards зливаються в один результат, а shards
+    завершених потоків переносяться в загальний підсумок і забуваються.
+    """
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: 'Registry' = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        self._retired: Dict = {}
+        self._shards_lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, 'data', None)
+        if shard is None:
+            shard = self._local.data = {}
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _merged(self) -> Dict:
+        with self._shards_lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    # Потік завершився - його shard уже не зміниться
+                    self._merge(self._retired, list(shard.items()))
+            self._shards = live
+            merged = self._merge({}, list(self._retired.items()))
+        for _, shard in live:
+            self._merge(merged, list(shard.items()))
+        return merged
+
+    @abstractmethod
+    def _merge(self, target: Dict, items: List) -> Dict:
+        """Додає значення items до target (копіюючи змінювані стани) і повертає target."""
+
+    def expose(self) -> List[str]:
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type_name}',
+            *self.samples(),
+        ]
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        pass
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, target: Dict, items: List) -> Dict:
+        for labels, value in items:
+            target[labels] = target.get(labels, 0) + value
+        return target
+
+    def values(self) -> Dict[Labels, float]:
+        return self._merged()
+
+    def samples(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in sorted(self.values().items())
+        ]
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: 'Registry' = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # [лічильники по кошиках (+Inf останній), сума, кількість]
+            state = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def _merge(self, target: Dict, items: List) -> Dict:
+        for labels, (counts, total, count) in items:
+            state = target.setdefault(labels, [[0] * len(counts), 0.0, 0])
+            for index, bucket_count in enumerate(list(counts)):
+                state[0][index] += bucket_count
+            state[1] += total
+            state[2] += count
+        return target
+
+    def values(self) -> Dict[Labels, list]:
+        return self._merged()
+
+    def samples(self) -> List[str]:
+        lines = []
+        bounds = self.buckets + (float('inf'),)
+        for labels, (counts, total, count) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}'
+                )
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_str} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_str} {count}')
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def expose(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = Histogram(
+    'cinema_http_request_duration_seconds',
+    'HTTP request latency by route, method and status code.',
+    ('route', 'method', 'status'),
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    'cinema_http_request_db_duration_seconds',
+    'Time spent in SQL per HTTP request by route.',
+    ('route', 'method'),
+)
+REPOSITORY_CALL_DURATION = Histogram(
+    'cinema_repository_call_duration_seconds',
+    'Repository method latency by model and method.',
+    ('model', 'method'),
+)
+REPOSITORY_CALL_ERRORS = Counter(
+    'cinema_repository_call_errors_total',
+    'Repository method calls that raised, by model and method.',
+    ('model', 'method'),
+)
+CACHE_REQUESTS = Counter(
+    'cinema_cache_requests_total',
+    'In-process cache lookups by cache name and result (hit/miss).',
+    ('cache', 'result'),
+)
+THROTTLED_REQUESTS = Counter(
+    'cinema_throttled_requests_total',
+    'Requests rejected with 429 by the token bucket throttle, by scope.',
+    ('scope',),
+)
+
+
+class MetricsHook(RepositoryHook):
+
+    def after(self, call: RepositoryCall):
+        REPOSITORY_CALL_DURATION.observe(call.duration, call.model, call.method)
+        if call.error is not None:
+            REPOSITORY_CALL_ERRORS.inc(call.model, call.method)
+
+
+class _DatabaseTimer:
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _DatabaseTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = (match.view_name or match.route) if match else 'unmatched'
+        HTTP_REQUEST_DURATION.observe(elapsed, route, request.method, str(response.status_code))
+        HTTP_REQUEST_DB_DURATION.observe(timer.elapsed, route, request.method)
+        return response
@@ -0,0 +1,55 @@
+# Написана вручну: makemigrations не бачить індексів таблиць з managed = False
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Таблиці не керуються Django (managed = False), тому Meta.indexes
+    не потрапляють в автоматичні міграції, а індекси створюються через RunSQL.
+    SQL написано для MySQL (лапки `...` і DROP INDEX ... ON ...): на інших
+    СУБД міграція і її відкат не виконаються.
+    """
+
+    dependencies = [
+        ('cinema_app', '0002_alter_customer_options_alter_employee_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_employee_salary` ON `Employee` (`Salary`)',
+            reverse_sql='DROP INDEX `idx_employee_salary` ON `Employee`',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_employee_position_salary` ON `Employee` (`PositionID`, `Salary`)',
+            reverse_sql='DROP INDEX `idx_employee_position_salary` ON `Employee`',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_movie_genre_year` ON `Movie` (`GenreID`, `ReleaseYear`)',
+            reverse_sql='DROP INDEX `idx_movie_genre_year` ON `Movie`',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_movie_year_rating` ON `Movie` (`ReleaseYear`, `Rating`)',
+            reverse_sql='DROP INDEX `idx_movie_year_rating` ON `Movie`',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_movie_age_limit` ON `Movie` (`AgeLimit`)',
+            reverse_sql='DROP INDEX `idx_movie_age_limit` ON `Movie`',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_session_start` ON `Session` (`StartTime`)',
+            reverse_sql='DROP INDEX `idx_session_start` ON `Session`',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_session_hall_start` ON `Session` (`HallID`, `StartTime`)',
+            reverse_sql='DROP INDEX `idx_session_hall_start` ON `Session`',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_session_movie_start` ON `Session` (`MovieID`, `StartTime`)',
+            reverse_sql='DROP INDEX `idx_session_movie_start` ON `Session`',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX `idx_ticket_customer_session` ON `Ticket` (`CustomerID`, `SessionID`)',
+            reverse_sql='DROP INDEX `idx_ticket_customer_session` ON `Ticket`',
+        ),
+    ]
@@ -65,6 +65,10 @@ class Employee(models.Model):
     class Meta:
         db_table = 'Employee'
         managed = False
+        indexes = [
+            models.Index(fields=['salary'], name='idx_employee_salary'),
+            models.Index(fields=['position', 'salary'], name='idx_employee_position_salary'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.position.title}"
@@ -97,6 +101,11 @@ class Movie(models.Model):
     class Meta:
         db_table = 'Movie'
         managed = False
+        indexes = [
+            models.Index(fields=['genre', 'release_year'], name='idx_movie_genre_year'),
+            models.Index(fields=['release_year', 'rating'], name='idx_movie_year_rating'),
+            models.Index(fields=['age_limit'], name='idx_movie_age_limit'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.release_year})"
@@ -142,6 +151,11 @@ class Session(models.Model):
     class Meta:
         db_table = 'Session'
         managed = False
+        indexes = [
+            models.Index(fields=['start_time'], name='idx_session_start'),
+            models.Index(fields=['hall', 'start_time'], name='idx_session_hall_start'),
+            models.Index(fields=['movie', 'start_time'], name='idx_session_movie_start'),
+        ]
 
     def __str__(self):
         return f"{self.movie.title} - {self.start_time}"
@@ -175,6 +189,9 @@ class Ticket(models.Model):
         db_table = 'Ticket'
         managed = False
         unique_together = (('session', 'seat_number'),)
+        indexes = [
+            models.Index(fields=['customer', 'session'], name='idx_ticket_customer_session'),
+        ]
 
     def __str__(self):
         return f"Ticket #{self.ticket_id} - Seat {self.seat_number}"
@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .hooks import RepositoryCall, RepositoryHook
+from .metrics import CACHE_REQUESTS
+from .models import Session, Ticket
+
+
+def seat_bit(seat_number: int, capacity: int) -> int:
+    """Біт місця в масці; 0 для номерів поза 1..capacity (старі чи некоректні рядки)."""
+    return 1 << (seat_number - 1) if 1 <= seat_number <= capacity else 0
+
+
+@dataclass
+class SessionOccupancy:
+    """Зайняті місця сеансу як бітова маска: біт n-1 відповідає місцю n."""
+    session_id: int
+    capacity: int
+    seats: int = 0
+    sold: int = 0
+    loaded_at: float = 0.0
+    start_time: Optional[datetime] = None
+    # (час, кількість проданих) - для швидкості продажів у межах процесу
+    history: Deque[Tuple[float, int]] = field(default_factory=lambda: deque(maxlen=256))
+
+    def is_taken(self, seat_number: int) -> bool:
+        return bool(self.seats & seat_bit(seat_number, self.capacity))
+
+    def occupied_seats(self) -> List[int]:
+        seats, result, seat = self.seats, [], 1
+        while seats:
+            if seats & 1:
+                result.append(seat)
+            seats >>= 1
+            seat += 1
+        return result
+
+    @property
+    def occupancy(self) -> float:
+        return self.sold / self.capacity if self.capacity else 0.0
+
+    def velocity(self, window: float) -> float:
+        """Продані квитки на годину за останні `window` секунд."""
+        if len(self.history) < 2:
+            return 0.0
+        now = time.time()
+        since = [entry for entry in self.history if entry[0] >= now - window]
+        if len(since) < 2:
+            return 0.0
+        (first_at, first_sold), (_, last_sold) = since[0], since[-1]
+        # не менше п'яти хвилин, щоб одиничний сплеск не давав тисячі квитків на годину
+        elapsed = max(now - first_at, 300.0)
+        return (last_sold - first_sold) * 3600.0 / elapsed
+
+    def set_seats(self, seats: int):
+        self.seats = seats
+        self.sold = bin(seats).count('1')
+        self.history.append((time.time(), self.sold))
+
+
+class OccupancyCache:
+    """
+    Кеш зайнятості сеансів у пам'яті процесу. Продажі через репозиторій
+    оновлюють маску одразу (OccupancyHook), а раз на OCCUPANCY_CACHE_TTL
+    секунд запис перечитується з БД, щоб врахувати інші процеси. Записи
+    сеансів, що вже почалися, викидаються при наступному завантаженні.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self._ttl = ttl
+        self._sessions: Dict[int, SessionOccupancy] = {}
+        self._listeners: List[Callable[[int], None]] = []
+        self._lock = threading.RLock()
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl if self._ttl is not None else getattr(settings, 'OCCUPANCY_CACHE_TTL', 30)
+
+    def subscribe(self, listener: Callable[[int], None]):
+        self._listeners.append(listener)
+
+    def _notify(self, session_id: int):
+        for listener in self._listeners:
+            listener(session_id)
+
+    def _load(self, session_ids: Sequence[int]):
+        sessions = list(Session.objects.filter(pk__in=session_ids).values_list(
+            'session_id', 'hall__capacity', 'start_time'
+        ))
+        start_times = {session_id: start_time for session_id, _, start_time in sessions}
+        capacities = {session_id: capacity for session_id, capacity, _ in sessions}
+        bitmaps = dict.fromkeys(capacities, 0)
+        rows = Ticket.objects.filter(session_id__in=capacities).values_list('session_id', 'seat_number')
+        for session_id, seat_number in rows:
+            bitmaps[session_id] |= seat_bit(seat_number, capacities[session_id])
+
+        now = time.time()
+        changed = []
+        with self._lock:
+            self._evict_started(timezone.now(), now - self.ttl)
+            for session_id, capacity in capacities.items():
+                entry = self._sessions.get(session_id)
+                if entry is None:
+                    entry = self._sessions[session_id] = SessionOccupancy(session_id, capacity)
+                    entry.set_seats(bitmaps[session_id])
+                else:
+                    entry.capacity = capacity
+                    if entry.seats != bitmaps[session_id]:
+                        entry.set_seats(bitmaps[session_id])
+                        changed.append(session_id)
+                entry.loaded_at = now
+                entry.start_time = start_times[session_id]
+        for session_id in changed:
+            self._notify(session_id)
+
+    def _evict_started(self, now: datetime, deadline: float):
+        # Продажі на сеанс, що почався, закінчились - застарілий запис лише займає пам'ять
+        for session_id in [
+            session_id for session_id, entry in self._sessions.items()
+            if entry.start_time is not None and entry.start_time <= now and entry.loaded_at < deadline
+        ]:
+            del self._sessions[session_id]
+
+    def get_many(self, session_ids: Iterable[int]) -> Dict[int, SessionOccupancy]:
+        session_ids = list(session_ids)
+        deadline = time.time() - self.ttl
+        with self._lock:
+            stale = [
+                session_id for session_id in session_ids
+                if session_id not in self._sessions or self._sessions[session_id].loaded_at < deadline
+            ]
+        CACHE_REQUESTS.inc('occupancy', 'hit', amount=len(session_ids) - len(stale))
+        if stale:
+            CACHE_REQUESTS.inc('occupancy', 'miss', amount=len(stale))
+            self._load(stale)
+        with self._lock:
+            return {
+                session_id: self._sessions[session_id]
+                for session_id in session_ids if session_id in self._sessions
+            }
+
+    def get(self, session_id: int) -> Optional[SessionOccupancy]:
+        return self.get_many([session_id]).get(session_id)
+
+    def peek(self, session_id: int) -> Optional[SessionOccupancy]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _update(self, session_id: int, seat_numbers: Iterable[int], taken: bool):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            seats = entry.seats
+            for seat_number in seat_numbers:
+                bit = seat_bit(seat_number, entry.capacity)
+                seats = seats | bit if taken else seats & ~bit
+            entry.set_seats(seats)
+        self._notify(session_id)
+
+    def mark_sold(self, session_id: int, seat_numbers: Iterable[int]):
+        self._update(session_id, seat_numbers, taken=True)
+
+    def mark_released(self, session_id: int, seat_numbers: Iterable[int]):
+        self._update(session_id, seat_numbers, taken=False)
+
+    def invalidate(self, session_id: int):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.loaded_at = 0.0
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+occupancy_cache = OccupancyCache()
+
+
+class OccupancyHook(RepositoryHook):
+    """Оновлює occupancy_cache після створення, зміни чи видалення квитків."""
+
+    def before(self, call: RepositoryCall):
+        if call.model != 'Ticket' or call.method not in ('update', 'delete'):
+            return
+        entity_id = call.args[0] if call.args else call.kwargs.get('entity_id')
+        call.context['occupancy_ticket'] = Ticket.objects.filter(pk=entity_id).values_list(
+            'session_id', 'seat_number'
+        ).first()
+
+    def after(self, call: RepositoryCall):
+        if call.model != 'Ticket' or call.error is not None:
+            return
+        if call.method == 'create':
+            occupancy_cache.mark_sold(call.result.session_id, [call.result.seat_number])
+            return
+        if call.method == 'bulk_create':
+            by_session = {}
+            for ticket in call.result:
+                by_session.setdefault(ticket.session_id, []).append(ticket.seat_number)
+            for session_id, seats in by_session.items():
+                occupancy_cache.mark_sold(session_id, seats)
+            return
+
+        previous = call.context.get('occupancy_ticket')
+        if call.method == 'delete' and call.result and previous:
+            occupancy_cache.mark_released(previous[0], [previous[1]])
+        elif call.method == 'update' and call.result is not None:
+            if previous:
+                occupancy_cache.mark_released(previous[0], [previous[1]])
+            occupancy_cache.mark_sold(call.result.session_id, [call.result.seat_number])
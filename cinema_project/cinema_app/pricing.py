@@ -0,0 +1,298 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .metrics import CACHE_REQUESTS
+from .models import Session
+from .occupancy import OccupancyCache, SessionOccupancy, occupancy_cache
+from .unit_of_work import UnitOfWork
+
+PRICING_DEFAULTS = {
+    # None - SCHEDULE_DEFAULT_PRICE помножена на SCHEDULE_HALL_PRICE_FACTORS[тип залу]
+    'BASE_PRICE': None,
+    'MIN_MULTIPLIER': 0.7,
+    'MAX_MULTIPLIER': 1.6,
+    'SENSITIVITY': 0.5,
+    'SALES_WINDOW_HOURS': 72,
+    'VELOCITY_WINDOW': 3600,
+    # Апріорні квитки, що додаються і до проданих, і до очікуваних: один ранній
+    # продаж не стрибає ціною від мінімуму до максимуму
+    'PRIOR_TICKETS': 10,
+    # Поки ні продано, ні очікується стільки квитків, коефіцієнт лишається 1.0
+    'MIN_SAMPLE': 5,
+    'PRICE_STEP': 5,
+    'QUOTE_TTL': 60,
+    'HISTORY_TTL': 3600,
+    'HISTORY_DAYS': 180,
+}
+
+
+def get_pricing_config() -> dict:
+    return {**PRICING_DEFAULTS, **getattr(settings, 'PRICING', {})}
+
+
+def expected_share_sold(hours_to_show: float, window_hours: float) -> float:
+    """
+    Типова крива продажів: частка від підсумкових продажів, яка вже
+    має бути продана за `hours_to_show` годин до початку сеансу.
+    """
+    if hours_to_show <= 0:
+        return 1.0
+    return math.exp(-3.0 * hours_to_show / window_hours)
+
+
+@dataclass
+class SessionInfo:
+    session_id: int
+    movie_id: int
+    hall_type: str
+    capacity: int
+    start_time: datetime
+    price: Decimal
+
+
+@dataclass
+class PriceQuote:
+    session_id: int
+    current_price: Decimal
+    recommended_price: Decimal
+    base_price: Decimal
+    multiplier: float
+    sold: int
+    capacity: int
+    occupancy: float
+    expected_occupancy: float
+    pace: float
+    velocity: float
+    hours_to_show: float
+    computed_at: datetime
+    computed_monotonic: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'session': self.session_id,
+            'current_price': str(self.current_price),
+            'recommended_price': str(self.recommended_price),
+            'base_price': str(self.base_price),
+            'multiplier': round(self.multiplier, 3),
+            'sold': self.sold,
+            'capacity': self.capacity,
+            'occupancy': round(self.occupancy, 4),
+            'expected_occupancy': round(self.expected_occupancy, 4),
+            'pace': round(self.pace, 3),
+            'velocity_per_hour': round(self.velocity, 2),
+            'hours_to_show': round(self.hours_to_show, 2),
+            'computed_at': self.computed_at,
+        }
+
+
+class SellThroughHistory:
+    """
+    Середня підсумкова заповненість минулих сеансів для пари
+    (фільм, тип залу) з відкатом до типу залу та загального середнього.
+    """
+
+    def __init__(self):
+        self._by_movie: Dict[Tuple[int, str], float] = {}
+        self._by_hall_type: Dict[str, float] = {}
+        self._overall = 0.5
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _load(self, config: dict):
+        now = timezone.now()
+        rows = Session.objects.filter(
+            start_time__lt=now,
+            start_time__gte=now - timedelta(days=config['HISTORY_DAYS']),
+        ).annotate(sold=Count('tickets')).values_list('movie_id', 'hall__type', 'hall__capacity', 'sold')
+
+        by_movie, by_hall_type, overall = defaultdict(list), defaultdict(list), []
+        for movie_id, hall_type, capacity, sold in rows:
+            if not capacity:
+                continue
+            share = min(sold / capacity, 1.0)
+            by_movie[(movie_id, hall_type)].append(share)
+            by_hall_type[hall_type].append(share)
+            overall.append(share)
+
+        self._by_movie = {key: sum(values) / len(values) for key, values in by_movie.items()}
+        self._by_hall_type = {key: sum(values) / len(values) for key, values in by_hall_type.items()}
+        if overall:
+            self._overall = sum(overall) / len(overall)
+
+    def ensure_loaded(self, config: dict):
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > config['HISTORY_TTL']:
+                self._load(config)
+                self._loaded_at = time.monotonic()
+
+    def expected(self, movie_id: int, hall_type: str) -> float:
+        value = self._by_movie.get((movie_id, hall_type))
+        if value is None:
+            value = self._by_hall_type.get(hall_type, self._overall)
+        return max(value, 0.05)
+
+
+class PricingEngine:
+    """
+    Рекомендована ціна сеансу: базова ціна множиться на коефіцієнт, що
+    залежить від того, наскільки продажі випереджають типову криву для
+    цього фільму і типу залу. Котирування зберігаються в пам'яті й
+    перераховуються, щойно OccupancyCache повідомляє про продаж; сеанси,
+    що вже почалися, викидаються при наступному завантаженні.
+    """
+
+    def __init__(self, occupancy: OccupancyCache = occupancy_cache):
+        self.occupancy = occupancy
+        self.history = SellThroughHistory()
+        self._sessions: Dict[int, SessionInfo] = {}
+        self._quotes: Dict[int, PriceQuote] = {}
+        self._lock = threading.Lock()
+
+    def _load_sessions(self, session_ids: Iterable[int]):
+        rows = Session.objects.filter(pk__in=list(session_ids)).values_list(
+            'session_id', 'movie_id', 'hall__type', 'hall__capacity', 'start_time', 'price'
+        )
+        loaded = {row[0]: SessionInfo(*row) for row in rows}
+        now = timezone.now()
+        with self._lock:
+            for session_id in [
+                session_id for session_id, info in self._sessions.items() if info.start_time <= now
+            ]:
+                del self._sessions[session_id]
+                self._quotes.pop(session_id, None)
+            self._sessions.update(loaded)
+
+    def base_price(self, info: SessionInfo, config: dict) -> Decimal:
+        if config['BASE_PRICE'] is not None:
+            return Decimal(str(config['BASE_PRICE'])).quantize(Decimal('0.01'))
+        default = getattr(settings, 'SCHEDULE_DEFAULT_PRICE', 150)
+        factor = getattr(settings, 'SCHEDULE_HALL_PRICE_FACTORS', {}).get(info.hall_type, 1.0)
+        return Decimal(str(default * factor)).quantize(Decimal('0.01'))
+
+    def compute(self, info: SessionInfo, occupancy: SessionOccupancy, config: dict) -> PriceQuote:
+        now = timezone.now()
+        hours_to_show = (info.start_time - now).total_seconds() / 3600.0
+        capacity = occupancy.capacity or info.capacity
+        expected_final = self.history.expected(info.movie_id, info.hall_type)
+        expected_now = expected_final * expected_share_sold(hours_to_show, config['SALES_WINDOW_HOURS'])
+        velocity = occupancy.velocity(config['VELOCITY_WINDOW'])
+
+        # Темп у квитках зі згладжуванням апріорними квитками
+        prior = config['PRIOR_TICKETS']
+        expected_tickets = expected_now * capacity
+        pace = (occupancy.sold + prior) / (expected_tickets + prior) if expected_tickets + prior else 1.0
+        sampled = max(occupancy.sold, expected_tickets) >= config['MIN_SAMPLE']
+        # Швидкість з кількох продажів ненадійна - прогноз лише після MIN_SAMPLE квитків
+        if occupancy.sold >= config['MIN_SAMPLE'] and velocity and capacity and hours_to_show > 0:
+            projected = min(occupancy.sold + velocity * hours_to_show, capacity)
+            pace = max(pace, (projected + prior) / (expected_final * capacity + prior))
+
+        base = self.base_price(info, config)
+        if hours_to_show <= 0:
+            # сеанс уже почався - ціна не змінюється
+            multiplier, recommended = 1.0, info.price
+        else:
+            multiplier = 1.0 + config['SENSITIVITY'] * (pace - 1.0) if sampled else 1.0
+            multiplier = min(max(multiplier, config['MIN_MULTIPLIER']), config['MAX_MULTIPLIER'])
+            step = Decimal(str(config['PRICE_STEP']))
+            recommended = (base * Decimal(str(multiplier)) / step).quantize(
+                Decimal('1'), rounding=ROUND_HALF_UP
+            ) * step
+
+        return PriceQuote(
+            session_id=info.session_id,
+            current_price=info.price,
+            recommended_price=Decimal(recommended).quantize(Decimal('0.01')),
+            base_price=base,
+            multiplier=multiplier,
+            sold=occupancy.sold,
+            capacity=capacity,
+            occupancy=occupancy.occupancy,
+            expected_occupancy=expected_now,
+            pace=pace,
+            velocity=velocity,
+            hours_to_show=hours_to_show,
+            computed_at=now,
+            computed_monotonic=time.monotonic(),
+        )
+
+    def quote_many(self, session_ids: Iterable[int]) -> Dict[int, PriceQuote]:
+        config = get_pricing_config()
+        session_ids = list(session_ids)
+        self.history.ensure_loaded(config)
+        # метадані перечитуються разом із котируванням, щоб підхопити ручні зміни ціни
+        self._load_sessions(session_ids)
+        occupancies = self.occupancy.get_many(session_ids)
+
+        quotes = {}
+        for session_id in session_ids:
+            info = self._sessions.get(session_id)
+            occupancy = occupancies.get(session_id)
+            if info is None or occupancy is None:
+                continue
+            quotes[session_id] = self.compute(info, occupancy, config)
+        with self._lock:
+            self._quotes.update(quotes)
+        return quotes
+
+    def quote(self, session_id: int) -> Optional[PriceQuote]:
+        ttl = get_pricing_config()['QUOTE_TTL']
+        with self._lock:
+            cached = self._quotes.get(session_id)
+        if cached is not None and time.monotonic() - cached.computed_monotonic < ttl:
+            CACHE_REQUESTS.inc('price_quote', 'hit')
+            return cached
+        CACHE_REQUESTS.inc('price_quote', 'miss')
+        return self.quote_many([session_id]).get(session_id)
+
+    def refresh_quote(self, session_id: int):
+        """Слухач OccupancyCache: перераховує вже відоме котирування без звернень до БД."""
+        with self._lock:
+            info = self._sessions.get(session_id)
+            known = session_id in self._quotes
+        occupancy = self.occupancy.peek(session_id)
+        if not known or info is None or occupancy is None:
+            return
+        quote = self.compute(info, occupancy, get_pricing_config())
+        with self._lock:
+            self._quotes[session_id] = quote
+
+    def upcoming_session_ids(self, hours: float) -> List[int]:
+        now = timezone.now()
+        return list(
+            Session.objects.filter(
+                start_time__gte=now, start_time__lt=now + timedelta(hours=hours)
+            ).values_list('session_id', flat=True)
+        )
+
+    def changed(self, quotes: Iterable[PriceQuote], min_change: Decimal) -> Dict[int, Decimal]:
+        return {
+            quote.session_id: quote.recommended_price
+            for quote in quotes
+            if abs(quote.recommended_price - quote.current_price) >= min_change
+        }
+
+    def apply(self, prices: Dict[int, Decimal], batch_size: int = 500) -> int:
+        updated = UnitOfWork().sessions.bulk_update_prices(prices, batch_size=batch_size)
+        with self._lock:
+            for session_id, price in prices.items():
+                if session_id in self._sessions:
+                    self._sessions[session_id].price = price
+                quote = self._quotes.get(session_id)
+                if quote is not None:
+                    quote.current_price = price
+        return updated
+
+
+pricing_engine = PricingEngine()
+occupancy_cache.subscribe(pricing_engine.refresh_quote)
@@ -0,0 +1,339 @@
+"""
+Профілювання SQL-запитів (QueryProfile, QueryProfilingMiddleware) і
+вибіркове профілювання запитів (SamplingProfilerMiddleware).
+
+Частина до SamplingProfilerMiddleware скопійована в analytics/profiling.py
+лабораторної 6: проєкти незалежні й не імпортують один одного, тож зміни
+спільної частини вносяться в обидві копії в тому самому коміті.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+_UNSAFE_PATH = re.compile(r'[^A-Za-z0-9]+')
+
+DEFAULTS = {
+    'ENABLED': None,
+    'SLOW_QUERY_MS': 100,
+    'DUPLICATE_THRESHOLD': 3,
+    'QUERY_BUDGET': None,
+    'RAISE_ON_BUDGET': False,
+}
+
+
+PROFILER_DEFAULTS = {
+    'SAMPLE_RATE': 0.0,
+    'HEADER': 'X-Profile',
+    'TOKEN': None,
+    'MODE': 'cprofile',
+    'INTERVAL_MS': 5,
+    'OUTPUT_DIR': 'profiles',
+}
+
+
+def get_config() -> dict:
+    config = {**DEFAULTS, **getattr(settings, 'QUERY_PROFILING', {})}
+    if config['ENABLED'] is None:
+        config['ENABLED'] = settings.DEBUG
+    return config
+
+
+def fingerprint(sql: str) -> str:
+    """Нормалізує SQL до сигнатури: літерали та списки IN (...) замінюються на ?."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (?)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class QueryRecord:
+    sql: str
+    duration: float
+    many: bool = False
+    params: Any = None
+
+
+class QueryProfile:
+    """
+    Контекстний менеджер, що записує всі SQL-запити через
+    connection.execute_wrapper для кожного підключення.
+
+        with QueryProfile(budget=5) as profile:
+            client.get('/sessions/')
+        profile.duplicates
+    """
+
+    def __init__(self, slow_query_ms: Optional[float] = None,
+                 duplicate_threshold: Optional[int] = None,
+                 budget: Optional[int] = None, label: str = ''):
+        config = get_config()
+        self.slow_query_ms = config['SLOW_QUERY_MS'] if slow_query_ms is None else slow_query_ms
+        self.duplicate_threshold = (
+            config['DUPLICATE_THRESHOLD'] if duplicate_threshold is None else duplicate_threshold
+        )
+        self.budget = budget
+        self.label = label
+        self.queries: List[QueryRecord] = []
+        self.started_at: Optional[float] = None
+        self.elapsed = 0.0
+        self._stack: Optional[ExitStack] = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(QueryRecord(sql, time.perf_counter() - start, many, params))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.elapsed = time.perf_counter() - self.started_at
+        self._stack.close()
+        if exc_type is None and self.over_budget:
+            raise QueryBudgetExceeded(
+                f'{self.label or "block"} executed {self.count} queries '
+                f'(budget {self.budget}): {self.duplicates[:3]}'
+            )
+        return False
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def db_time(self) -> float:
+        return sum(query.duration for query in self.queries)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+    @property
+    def duplicates(self) -> List[Dict]:
+        groups = defaultdict(lambda: [0, 0.0])
+        for query in self.queries:
+            group = groups[fingerprint(query.sql)]
+            group[0] += 1
+            group[1] += query.duration
+        return sorted(
+            (
+                {'sql': sql, 'count': count, 'time_ms': round(total * 1000, 2)}
+                for sql, (count, total) in groups.items()
+                if count >= self.duplicate_threshold
+            ),
+            key=lambda group: -group['count']
+        )
+
+    @property
+    def slow_queries(self) -> List[Dict]:
+        threshold = self.slow_query_ms / 1000.0
+        return [
+            {'sql': query.sql, 'time_ms': round(query.duration * 1000, 2)}
+            for query in self.queries
+            if query.duration >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.count} queries", '
+            f'total;dur={self.elapsed * 1000:.2f}'
+        )
+
+    def summary(self) -> dict:
+        return {
+            'label': self.label,
+            'queries': self.count,
+            'db_ms': round(self.db_time * 1000, 2),
+            'total_ms': round(self.elapsed * 1000, 2),
+            'duplicates': self.duplicates,
+            'slow': self.slow_queries,
+            'budget': self.budget,
+        }
+
+
+def assert_max_queries(budget: int, label: str = '') -> QueryProfile:
+    return QueryProfile(budget=budget, label=label)
+
+
+class QueryProfilingMiddleware:
+    """
+    Рахує SQL-запити кожного запиту, додає заголовок Server-Timing та
+    пише JSON-рядок у лог `cinema_app.profiling`. Ліміт запитів задається
+    атрибутом `query_budget` на view або QUERY_PROFILING['QUERY_BUDGET'].
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        profile = QueryProfile(label=f'{request.method} {request.path}')
+        request.query_budget = config['QUERY_BUDGET']
+        with profile:
+            response = self.get_response(request)
+
+        profile.budget = getattr(request, 'query_budget', None)
+        summary = profile.summary()
+        summary['status'] = response.status_code
+        response['Server-Timing'] = profile.server_timing()
+
+        problems = profile.over_budget or summary['duplicates'] or summary['slow']
+        logger.log(
+            logging.WARNING if problems else logging.INFO,
+            json.dumps(summary, ensure_ascii=False)
+        )
+        if profile.over_budget and config['RAISE_ON_BUDGET']:
+            raise QueryBudgetExceeded(
+                f'{profile.label} executed {profile.count} queries (budget {profile.budget})'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        budget = getattr(view_class, 'query_budget', None)
+        if budget is not None:
+            request.query_budget = budget
+        return None
+
+
+def get_profiler_config() -> dict:
+    return {**PROFILER_DEFAULTS, **getattr(settings, 'PROFILER', {})}
+
+
+class StackSampler:
+    """
+    Періодично знімає стек заданого потоку через sys._current_frames()
+    і накопичує згорнуті стеки у форматі flamegraph.pl / speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path: Path):
+        with open(path, 'w', encoding='utf-8') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f'{stack} {count}\n')
+
+
+# На Python 3.12+ другий активний cProfile.Profile кидає ValueError,
+# тож у процесі профілюється не більше одного запиту за раз
+_cprofile_lock = threading.Lock()
+
+
+class SamplingProfilerMiddleware:
+    """
+    Профілює частку запитів PROFILER['SAMPLE_RATE'] або запити із заголовком
+    PROFILER['HEADER'], значення якого збігається з PROFILER['TOKEN'].
+    MODE 'cprofile' пише .prof (pstats), 'sampling' - .folded для flamegraph;
+    у режимі cprofile запит, що прийшов під час іншого профілювання, не профілюється.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _requested(self, request, config) -> bool:
+        token = config['TOKEN']
+        if token:
+            value = request.headers.get(config['HEADER'])
+            if value and hmac.compare_digest(value, token):
+                return True
+        return random.random() < config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        config = get_profiler_config()
+        if not self._requested(request, config):
+            return self.get_response(request)
+        if config['MODE'] != 'sampling':
+            if not _cprofile_lock.acquire(blocking=False):
+                return self.get_response(request)
+            try:
+                return self._profile(request, config)
+            finally:
+                _cprofile_lock.release()
+        return self._profile(request, config)
+
+    def _profile(self, request, config):
+
+        output_dir = Path(config['OUTPUT_DIR'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        slug = _UNSAFE_PATH.sub('_', request.path).strip('_') or 'root'
+        base = output_dir / f'{time.strftime("%Y%m%d-%H%M%S")}-{request.method}-{slug}-{threading.get_ident()}'
+
+        if config['MODE'] == 'sampling':
+            sampler = StackSampler(threading.get_ident(), config['INTERVAL_MS'] / 1000.0)
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            path = base.with_suffix('.folded')
+            sampler.write(path)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            path = base.with_suffix('.prof')
+            profiler.dump_stats(path)
+
+        logger.info('profile written to %s', path)
+        response['X-Profile-File'] = path.name
+        return response
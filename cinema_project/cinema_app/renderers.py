@@ -0,0 +1,88 @@
+"""
+Швидкий JSON-рендерер DRF: orjson, ujson або stdlib - що встановлено.
+
+Файл однаковий у cinema_app і analytics лабораторної 6: проєкти незалежні й
+не імпортують один одного, тож зміни вносяться в обидві копії в тому самому коміті.
+"""
+import json
+from typing import Callable, Optional, Tuple
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+# U+2028/U+2029 валідні в JSON, але не в JS-рядках - екрануємо, як це робить DRF
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def _default(obj):
+    # Decimal -> float, datetime/date -> ISO, NumPy -> tolist(): та сама логіка, що й у DRF
+    return _encoder.default(obj)
+
+
+def _orjson_dumps() -> Callable[[object], bytes]:
+    import orjson
+    # OPT_UTC_Z: '+00:00' -> 'Z', як у DRF; Decimal і решта йдуть у _default
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    return lambda data: orjson.dumps(data, default=_default, option=option)
+
+
+def _ujson_dumps() -> Callable[[object], bytes]:
+    import ujson
+    return lambda data: ujson.dumps(
+        data, ensure_ascii=False, escape_forward_slashes=False, default=_default
+    ).encode()
+
+
+def _stdlib_dumps() -> Callable[[object], bytes]:
+    return lambda data: json.dumps(
+        data, default=_default, ensure_ascii=False, allow_nan=False, separators=(',', ':')
+    ).encode()
+
+
+BACKENDS = {
+    'orjson': _orjson_dumps,
+    'ujson': _ujson_dumps,
+    'json': _stdlib_dumps,
+}
+
+_backend: Optional[Tuple[str, Callable[[object], bytes]]] = None
+
+
+def get_backend() -> Tuple[str, Callable[[object], bytes]]:
+    """JSON_RENDERER_BACKEND: 'auto' (orjson, потім ujson, потім json) або назва бекенду."""
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'JSON_RENDERER_BACKEND', 'auto')
+        candidates = list(BACKENDS) if name == 'auto' else [name]
+        for candidate in candidates:
+            try:
+                _backend = (candidate, BACKENDS[candidate]())
+                break
+            except ImportError:
+                continue
+        else:
+            _backend = ('json', _stdlib_dumps())
+    return _backend
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer з orjson/ujson, якщо встановлені. Decimal, datetime, date
+    і скаляри NumPy серіалізуються без ручних перетворень у view.
+    Запити з indent (браузерний API) обробляє стандартний рендерер.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        content = get_backend()[1](data)
+        for separator, escaped in _LINE_SEPARATORS:
+            if separator in content:
+                content = content.replace(separator, escaped)
+        return content
@@ -1,5 +1,10 @@
+import inspect
+import time
 from abc import ABC, abstractmethod
-from typing import List, Optional, TypeVar, Generic
+from functools import wraps
+from decimal import Decimal
+from typing import Dict, List, Optional, TypeVar, Generic
+from django.conf import settings
 from django.db import models
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -7,18 +12,82 @@ from .models import (
     Genre, Hall, JobPosition, Employee,
     Movie, Customer, Session, Ticket
 )
+from .hooks import (
+    RepositoryCall, RepositoryHook, count_rows,
+    get_hooks, register_hook, unregister_hook
+)
+from .holds import seat_holds
+from .search import SearchHit, movie_index, customer_index, customer_autocomplete
+from .specifications import Query
 
 T = TypeVar('T', bound=models.Model)
 
 
+def _instrumented(method_name: str, func):
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        hooks = get_hooks()
+        if not hooks:
+            return func(self, *args, **kwargs)
+
+        call = RepositoryCall(self.get_model_name(), method_name, args, kwargs)
+        for hook in hooks:
+            hook.before(call)
+        start = time.perf_counter()
+        try:
+            result = func(self, *args, **kwargs)
+            call.rows = count_rows(result)
+            call.result = result
+            return result
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            call.duration = time.perf_counter() - start
+            for hook in hooks:
+                hook.after(call)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
 class BaseRepository(ABC, Generic[T]):
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in dir(cls):
+            if name.startswith('_') or name == 'get_model_name':
+                continue
+            if isinstance(inspect.getattr_static(cls, name), (staticmethod, classmethod)):
+                continue
+            attr = getattr(cls, name)
+            if inspect.isfunction(attr) and not getattr(attr, '__instrumented__', False):
+                setattr(cls, name, _instrumented(name, attr))
+
     def __init__(self, model_class: type[T]):
         self._model = model_class
 
+    @staticmethod
+    def add_hook(hook: RepositoryHook) -> RepositoryHook:
+        return register_hook(hook)
+
+    @staticmethod
+    def remove_hook(hook: RepositoryHook):
+        unregister_hook(hook)
+
     def get_all(self) -> List[T]:
         return list(self._model.objects.all())
 
+    def find(self, query: Query) -> List[T]:
+        return list(query.apply(self._model.objects.all()))
+
+    def get_values(self, *fields: str, query: Optional[Query] = None, **expressions) -> List[dict]:
+        # Рядки-словники для швидких серіалізаторів: без створення моделей
+        rows = self._model.objects.values(*fields, **expressions)
+        if query is not None:
+            rows = query.apply(rows)
+        return list(rows)
+
     def get_by_id(self, entity_id: int) -> Optional[T]:
 
         try:
@@ -147,8 +216,39 @@ class MovieRepository(BaseRepository[Movie]):
     def get_by_age_limit(self, max_age: int) -> List[Movie]:
         return list(self._model.objects.filter(age_limit__lte=max_age))
 
-    def search_by_title(self, title_part: str) -> List[Movie]:
-        return list(self._model.objects.filter(title__icontains=title_part))
+    def create(self, **kwargs) -> Movie:
+        movie = super().create(**kwargs)
+        self._index(movie)
+        return movie
+
+    def update(self, entity_id: int, **kwargs) -> Optional[Movie]:
+        movie = super().update(entity_id, **kwargs)
+        if movie:
+            self._index(movie)
+        return movie
+
+    def delete(self, entity_id: int) -> bool:
+        deleted = super().delete(entity_id)
+        if deleted:
+            movie_index.remove(entity_id)
+        return deleted
+
+    def _index(self, movie: Movie):
+        movie_index.add(movie.movie_id, movie.title, {
+            'movie_id': movie.movie_id,
+            'title': movie.title,
+            'release_year': movie.release_year,
+        })
+
+    def search(self, query: str, limit: int = 10) -> List[SearchHit]:
+        return movie_index.search(query, limit=limit)
+
+    def search_by_title(self, title_part: str, limit: int = 50) -> List[Movie]:
+        ids = [hit.doc_id for hit in movie_index.search(title_part, limit=limit)]
+        if not ids:
+            return list(self._model.objects.filter(title__icontains=title_part)[:limit])
+        movies = self._model.objects.in_bulk(ids)
+        return [movies[movie_id] for movie_id in ids if movie_id in movies]
 
 
 class CustomerRepository(BaseRepository[Customer]):
@@ -165,8 +265,41 @@ class CustomerRepository(BaseRepository[Customer]):
         except ObjectDoesNotExist:
             return None
 
-    def search_by_name(self, name_part: str) -> List[Customer]:
-        return list(self._model.objects.filter(name__icontains=name_part))
+    def create(self, **kwargs) -> Customer:
+        customer = super().create(**kwargs)
+        self._index(customer)
+        return customer
+
+    def update(self, entity_id: int, **kwargs) -> Optional[Customer]:
+        customer = super().update(entity_id, **kwargs)
+        if customer:
+            self._index(customer)
+        return customer
+
+    def delete(self, entity_id: int) -> bool:
+        deleted = super().delete(entity_id)
+        if deleted:
+            customer_index.remove(entity_id)
+            customer_autocomplete.remove(entity_id)
+        return deleted
+
+    def _index(self, customer: Customer):
+        customer_index.add(customer.customer_id, customer.name, {
+            'customer_id': customer.customer_id,
+            'name': customer.name,
+            'email': customer.email,
+        })
+        customer_autocomplete.put(customer.customer_id, customer.name, customer.email)
+
+    def autocomplete(self, query: str, limit: int = 10) -> List[dict]:
+        return customer_autocomplete.lookup(query, limit=limit)
+
+    def search_by_name(self, name_part: str, limit: int = 50) -> List[Customer]:
+        ids = [hit.doc_id for hit in customer_index.search(name_part, limit=limit)]
+        if not ids:
+            return list(self._model.objects.filter(name__icontains=name_part)[:limit])
+        customers = self._model.objects.in_bulk(ids)
+        return [customers[customer_id] for customer_id in ids if customer_id in customers]
 
     def get_active_customers(self, min_tickets: int = 1) -> List[Customer]:
         from django.db.models import Count
@@ -191,12 +324,47 @@ class SessionRepository(BaseRepository[Session]):
         return list(self._model.objects.filter(hall_id=hall_id))
 
     def get_by_date(self, date) -> List[Session]:
+        # Діапазон замість start_time__date, щоб MySQL міг використати idx_session_start
+        from datetime import datetime, timedelta
+        from django.utils import timezone
+        day_start = datetime.combine(date, datetime.min.time())
+        day_end = datetime.combine(date + timedelta(days=1), datetime.min.time())
+        if settings.USE_TZ:
+            day_start = timezone.make_aware(day_start)
+            day_end = timezone.make_aware(day_end)
         return list(
             self._model.objects.filter(
-                start_time__date=date
+                start_time__gte=day_start,
+                start_time__lt=day_end
             ).order_by('start_time')
         )
 
+    def bulk_create(self, sessions: List[dict], batch_size: int = 500) -> int:
+        from django.db import transaction
+        with transaction.atomic():
+            created = self._model.objects.bulk_create(
+                [self._model(**data) for data in sessions],
+                batch_size=batch_size
+            )
+        return len(created)
+
+    def bulk_update_prices(self, prices: Dict[int, Decimal], batch_size: int = 500) -> int:
+        """Один UPDATE ... SET Price = CASE SessionID WHEN ... на кожну партію."""
+        from django.db import transaction
+        from django.db.models import Case, DecimalField, Value, When
+        items = list(prices.items())
+        updated = 0
+        with transaction.atomic():
+            for offset in range(0, len(items), batch_size):
+                batch = items[offset:offset + batch_size]
+                updated += self._model.objects.filter(
+                    pk__in=[session_id for session_id, _ in batch]
+                ).update(price=Case(
+                    *[When(pk=session_id, then=Value(price)) for session_id, price in batch],
+                    output_field=DecimalField(max_digits=8, decimal_places=2)
+                ))
+        return updated
+
     def get_upcoming_sessions(self) -> List[Session]:
         from django.utils import timezone
         return list(
@@ -226,6 +394,26 @@ class TicketRepository(BaseRepository[Ticket]):
             seat_number=seat_number
         ).exists()
 
-    def get_occupied_seats(self, session_id: int) -> List[int]:
-        tickets = self._model.objects.filter(session_id=session_id)
-        return [ticket.seat_number for ticket in tickets]
\ No newline at end of file
+    def get_sold_seats(self, session_id: int, seats: List[int]) -> List[int]:
+        return list(
+            self._model.objects.filter(
+                session_id=session_id,
+                seat_number__in=seats
+            ).values_list('seat_number', flat=True)
+        )
+
+    def get_occupied_seats(self, session_id: int, include_held: bool = False) -> List[int]:
+        seats = list(
+            self._model.objects.filter(
+                session_id=session_id
+            ).values_list('seat_number', flat=True)
+        )
+        if include_held:
+            seats = sorted(set(seats).union(seat_holds.held_seats(session_id)))
+        return seats
+
+    def bulk_create(self, tickets: List[dict]) -> List[Ticket]:
+        # Один INSERT на всі місця; на MySQL ticket_id у повернених об'єктах не заповнюється
+        from django.db import transaction
+        with transaction.atomic():
+            return self._model.objects.bulk_create([self._model(**data) for data in tickets])
\ No newline at end of file
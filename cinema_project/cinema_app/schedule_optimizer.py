@@ -0,0 +1,272 @@
+"""
+Генерація розкладу сеансів: жадібне заповнення залів + локальний пошук.
+
+Модуль не імпортує ORM, щоб дні можна було оптимізувати у
+ProcessPoolExecutor (зокрема зі spawn на Windows): дані з БД готує
+management-команда generate_schedule і передає сюди прості структури.
+"""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SLOT_MINUTES = 5
+
+# Відносний попит за годиною початку сеансу
+DEFAULT_HOUR_WEIGHTS = {
+    9: 0.35, 10: 0.4, 11: 0.5, 12: 0.6, 13: 0.65, 14: 0.7, 15: 0.75, 16: 0.85,
+    17: 1.0, 18: 1.15, 19: 1.25, 20: 1.2, 21: 1.0, 22: 0.7, 23: 0.45,
+}
+
+
+@dataclass
+class MovieStats:
+    movie_id: int
+    duration: int
+    demand: float
+    price: float
+
+
+@dataclass
+class HallInfo:
+    hall_id: int
+    capacity: int
+    price_factor: float = 1.0
+
+
+@dataclass
+class DayInput:
+    open_at: datetime
+    close_at: datetime
+    # зайняті проміжки (хвилини від відкриття) для кожного залу
+    busy: Dict[int, List[Tuple[int, int]]] = field(default_factory=dict)
+
+    @property
+    def minutes(self) -> int:
+        return int((self.close_at - self.open_at).total_seconds() // 60)
+
+
+@dataclass
+class PlannedSession:
+    hall_id: int
+    movie_id: int
+    start_time: datetime
+    price: float
+    expected_revenue: float
+
+
+def _round_up(minutes: int) -> int:
+    return -(-minutes // SLOT_MINUTES) * SLOT_MINUTES
+
+
+class DayOptimizer:
+
+    def __init__(self, day: DayInput, movies: Sequence[MovieStats], halls: Sequence[HallInfo],
+                 buffer_minutes: int, decay: float, hour_weights: Dict[int, float],
+                 deadline: float, seed: int = 0):
+        self.day = day
+        self.movies = list(movies)
+        self.halls = sorted(halls, key=lambda hall: -hall.capacity)
+        self.deadline = deadline
+        self.decay = decay
+        self.random = random.Random(seed)
+
+        self.durations = np.array([movie.duration for movie in self.movies], dtype=np.int64)
+        # фільм плюс прибирання мають завершитися до наступного зайнятого проміжку
+        self.footprints = self.durations + buffer_minutes
+        self.blocks = np.array(
+            [_round_up(movie.duration + buffer_minutes) for movie in self.movies], dtype=np.int64
+        )
+        self.demand = np.array([movie.demand for movie in self.movies], dtype=np.float64)
+        self.price = np.array([movie.price for movie in self.movies], dtype=np.float64)
+        self.capacity = np.array([hall.capacity for hall in self.halls], dtype=np.float64)
+        self.hall_price = np.array([hall.price_factor for hall in self.halls], dtype=np.float64)
+
+        open_hour = day.open_at.hour + day.open_at.minute / 60.0
+        hours = (open_hour + np.arange(day.minutes + 1) / 60.0).astype(np.int64) % 24
+        default = min(hour_weights.values()) if hour_weights else 1.0
+        lookup = np.array([hour_weights.get(hour, default) for hour in range(24)])
+        self.minute_weight = lookup[hours]
+
+        self.segments = [self._free_segments(hall.hall_id) for hall in self.halls]
+
+    def _free_segments(self, hall_id: int) -> List[Tuple[int, int]]:
+        segments, cursor = [], 0
+        for start, end in sorted(self.day.busy.get(hall_id, [])):
+            if start > cursor:
+                segments.append((cursor, start))
+            cursor = max(cursor, _round_up(end))
+        if cursor < self.day.minutes:
+            segments.append((cursor, self.day.minutes))
+        return segments
+
+    def pack(self, hall_index: int, sequence: Sequence[int]) -> Optional[List[int]]:
+        """Розставляє фільми послідовно у вільні проміжки залу; None, якщо не влазять."""
+        starts = []
+        segments = self.segments[hall_index]
+        segment, cursor = 0, segments[0][0] if segments else 0
+        for movie_index in sequence:
+            while segment < len(segments) and cursor + self.footprints[movie_index] > segments[segment][1]:
+                segment += 1
+                if segment < len(segments):
+                    cursor = segments[segment][0]
+            if segment >= len(segments):
+                return None
+            starts.append(cursor)
+            cursor += int(self.blocks[movie_index])
+        return starts
+
+    def revenue(self, movie_idx: np.ndarray, hall_idx: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """
+        Очікуваний дохід кожного сеансу. Попит на k-й за привабливістю
+        сеанс того самого фільму в день множиться на decay**k.
+        """
+        if movie_idx.size == 0:
+            return np.zeros(0)
+        weight = self.minute_weight[starts]
+        order = np.lexsort((-weight, movie_idx))
+        sorted_movies = movie_idx[order]
+        group_start = np.r_[0, np.flatnonzero(np.diff(sorted_movies)) + 1]
+        group_sizes = np.diff(np.r_[group_start, sorted_movies.size])
+        ranks = np.empty_like(order)
+        ranks[order] = np.arange(order.size) - np.repeat(group_start, group_sizes)
+
+        attendance = np.minimum(
+            self.capacity[hall_idx],
+            self.demand[movie_idx] * weight * self.decay ** ranks
+        )
+        return attendance * self.price[movie_idx] * self.hall_price[hall_idx]
+
+    def objective(self, plan: List[List[int]]) -> Tuple[float, Optional[List[List[int]]]]:
+        movie_idx, hall_idx, starts, all_starts = [], [], [], []
+        for hall_index, sequence in enumerate(plan):
+            hall_starts = self.pack(hall_index, sequence)
+            if hall_starts is None:
+                return float('-inf'), None
+            all_starts.append(hall_starts)
+            movie_idx.extend(sequence)
+            hall_idx.extend([hall_index] * len(sequence))
+            starts.extend(hall_starts)
+        total = self.revenue(
+            np.array(movie_idx, dtype=np.int64),
+            np.array(hall_idx, dtype=np.int64),
+            np.array(starts, dtype=np.int64)
+        ).sum()
+        return float(total), all_starts
+
+    def greedy(self) -> List[List[int]]:
+        plan: List[List[int]] = [[] for _ in self.halls]
+        counts = np.zeros(len(self.movies))
+        for hall_index in range(len(self.halls)):
+            for segment_start, segment_end in self.segments[hall_index]:
+                cursor = segment_start
+                while True:
+                    fits = cursor + self.footprints <= segment_end
+                    if not fits.any():
+                        break
+                    weight = self.minute_weight[cursor]
+                    attendance = np.minimum(
+                        self.capacity[hall_index],
+                        self.demand * weight * self.decay ** counts
+                    )
+                    rate = np.where(fits, attendance * self.price / self.blocks, -np.inf)
+                    best = int(np.argmax(rate))
+                    # Сеанси без очікуваного доходу лише займають зал
+                    if rate[best] <= 0:
+                        break
+                    plan[hall_index].append(best)
+                    counts[best] += 1
+                    cursor += int(self.blocks[best])
+        return plan
+
+    def _neighbour(self, plan: List[List[int]]) -> List[List[int]]:
+        candidate = [list(sequence) for sequence in plan]
+        hall_index = self.random.randrange(len(candidate))
+        sequence = candidate[hall_index]
+        move = self.random.random()
+        if sequence and move < 0.5:
+            sequence[self.random.randrange(len(sequence))] = self.random.randrange(len(self.movies))
+        elif len(sequence) > 1 and move < 0.75:
+            i, j = self.random.sample(range(len(sequence)), 2)
+            sequence[i], sequence[j] = sequence[j], sequence[i]
+        elif sequence and move < 0.85:
+            del sequence[self.random.randrange(len(sequence))]
+        else:
+            sequence.insert(self.random.randrange(len(sequence) + 1), self.random.randrange(len(self.movies)))
+        return candidate
+
+    def optimize(self) -> Tuple[List[List[int]], List[List[int]]]:
+        plan = self.greedy()
+        best_score, best_starts = self.objective(plan)
+        while time.monotonic() < self.deadline:
+            candidate = self._neighbour(plan)
+            score, starts = self.objective(candidate)
+            if score > best_score:
+                plan, best_score, best_starts = candidate, score, starts
+        return plan, best_starts
+
+    def run(self) -> List[PlannedSession]:
+        if not self.movies or not self.halls:
+            return []
+        plan, starts = self.optimize()
+        placed = [
+            (hall_index, movie_index, start)
+            for hall_index, (sequence, hall_starts) in enumerate(zip(plan, starts))
+            for movie_index, start in zip(sequence, hall_starts)
+        ]
+        if not placed:
+            return []
+        hall_idx, movie_idx, start_idx = (np.array(column, dtype=np.int64) for column in zip(*placed))
+        revenue = self.revenue(movie_idx, hall_idx, start_idx)
+        # Локальний пошук міг лишити сеанси з нульовим доходом - їх не створюємо
+        keep = revenue > 0
+        if not keep.all():
+            placed = [item for item, kept in zip(placed, keep) if kept]
+            hall_idx, movie_idx, start_idx = hall_idx[keep], movie_idx[keep], start_idx[keep]
+            revenue = self.revenue(movie_idx, hall_idx, start_idx)
+
+        return [
+            PlannedSession(
+                hall_id=self.halls[hall_index].hall_id,
+                movie_id=self.movies[movie_index].movie_id,
+                start_time=self.day.open_at + timedelta(minutes=int(start)),
+                price=round(self.movies[movie_index].price * self.halls[hall_index].price_factor, 2),
+                expected_revenue=float(expected),
+            )
+            for (hall_index, movie_index, start), expected in zip(placed, revenue)
+        ]
+
+
+def _optimize_day(task) -> List[PlannedSession]:
+    day, movies, halls, buffer_minutes, decay, hour_weights, budget, seed = task
+    # дедлайн рахується в момент запуску задачі, а не при постановці в чергу пулу
+    deadline = time.monotonic() + budget
+    return DayOptimizer(day, movies, halls, buffer_minutes, decay, hour_weights, deadline, seed).run()
+
+
+def optimize_schedule(days: Sequence[DayInput], movies: Sequence[MovieStats],
+                      halls: Sequence[HallInfo], buffer_minutes: int = 15,
+                      decay: float = 0.8, hour_weights: Optional[Dict[int, float]] = None,
+                      time_budget: float = 10.0, workers: int = 1,
+                      seed: int = 0) -> List[PlannedSession]:
+    """
+    Оптимізує кожен день незалежно. Бюджет часу ділиться на кількість
+    «хвиль» пулу, тож загальний час роботи приблизно дорівнює time_budget.
+    """
+    hour_weights = hour_weights or DEFAULT_HOUR_WEIGHTS
+    workers = max(workers, 1)
+    rounds = max(-(-len(days) // workers), 1)
+    tasks = [
+        (day, movies, halls, buffer_minutes, decay, hour_weights, time_budget / rounds, seed + index)
+        for index, day in enumerate(days)
+    ]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_optimize_day, tasks))
+    else:
+        results = [_optimize_day(task) for task in tasks]
+    return [session for day_sessions in results for session in day_sessions]
@@ -0,0 +1,198 @@
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Hall, Movie, Session
+
+
+def cleaning_buffer() -> timedelta:
+    return timedelta(minutes=getattr(settings, 'SESSION_CLEANING_MINUTES', 15))
+
+
+def opening_window(day: date) -> Tuple[datetime, datetime]:
+    open_hour, close_hour = getattr(settings, 'CINEMA_OPENING_HOURS', (9, 24))
+    midnight = datetime.combine(day, datetime.min.time())
+    start = midnight + timedelta(hours=open_hour)
+    end = midnight + timedelta(hours=close_hour)
+    if settings.USE_TZ:
+        start, end = timezone.make_aware(start), timezone.make_aware(end)
+    return start, end
+
+
+@contextmanager
+def locked_halls(hall_ids: Iterable[int]):
+    """
+    Транзакція з блокуванням рядків залів (за зростанням id, без взаємних
+    блокувань): перевірка перетинів і вставка сеансів під нею не перемежовуються
+    з іншими запитами й процесами для тих самих залів.
+    """
+    with transaction.atomic():
+        list(Hall.objects.select_for_update().filter(hall_id__in=set(hall_ids)).order_by('hall_id').values_list('hall_id'))
+        yield
+
+
+@dataclass(frozen=True, order=True)
+class Interval:
+    start: datetime
+    end: datetime
+    session_id: Optional[int] = field(default=None, compare=False)
+    label: str = field(default='', compare=False)
+
+    def to_dict(self) -> dict:
+        return {'session_id': self.session_id, 'label': self.label,
+                'start': self.start, 'end': self.end}
+
+
+class HallSchedule:
+    """
+    Відсортований список інтервалів одного залу (кінець включає
+    прибирання). Поряд зберігається префіксний максимум кінців, тож
+    пошук перетинів - це bisect плюс короткий прохід назад. Вставка й
+    видалення - O(n): зсув списків і перерахунок максимуму від позиції.
+    """
+
+    def __init__(self, hall_id: int, intervals: Iterable[Interval] = ()):
+        self.hall_id = hall_id
+        self._items: List[Interval] = sorted(intervals)
+        self._starts: List[datetime] = [item.start for item in self._items]
+        self._max_ends: List[datetime] = []
+        self._rebuild_max_ends(0)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def _rebuild_max_ends(self, position: int):
+        del self._max_ends[position:]
+        current = self._max_ends[-1] if self._max_ends else None
+        for item in self._items[position:]:
+            current = item.end if current is None or item.end > current else current
+            self._max_ends.append(current)
+
+    def conflicts(self, start: datetime, end: datetime,
+                  ignore_session_id: Optional[int] = None) -> List[Interval]:
+        found = []
+        position = bisect_left(self._starts, end) - 1
+        while position >= 0 and self._max_ends[position] > start:
+            item = self._items[position]
+            if item.end > start and (
+                ignore_session_id is None or item.session_id != ignore_session_id
+            ):
+                found.append(item)
+            position -= 1
+        return found
+
+    def add(self, interval: Interval):
+        position = bisect_left(self._starts, interval.start)
+        self._items.insert(position, interval)
+        self._starts.insert(position, interval.start)
+        self._rebuild_max_ends(position)
+
+    def remove_session(self, session_id: int):
+        for position, item in enumerate(self._items):
+            if item.session_id == session_id:
+                del self._items[position]
+                del self._starts[position]
+                self._rebuild_max_ends(position)
+                return
+
+    def free_slots(self, window_start: datetime, window_end: datetime,
+                   duration: timedelta) -> List[Tuple[datetime, datetime]]:
+        slots = []
+        cursor = window_start
+        position = max(bisect_left(self._starts, window_start) - 1, 0)
+        for item in self._items[position:]:
+            if item.start >= window_end:
+                break
+            if item.start - cursor >= duration:
+                slots.append((cursor, item.start))
+            if item.end > cursor:
+                cursor = item.end
+        if window_end - cursor >= duration:
+            slots.append((cursor, window_end))
+        return slots
+
+
+@dataclass
+class SessionCandidate:
+    hall_id: int
+    start_time: datetime
+    duration: int
+    session_id: Optional[int] = None
+    index: int = 0
+
+    def interval(self, buffer: timedelta) -> Interval:
+        end = self.start_time + timedelta(minutes=self.duration) + buffer
+        label = f'session #{self.session_id}' if self.session_id else f'item #{self.index}'
+        return Interval(self.start_time, end, self.session_id, label)
+
+
+class SessionScheduler:
+
+    def __init__(self, buffer: Optional[timedelta] = None):
+        self.buffer = cleaning_buffer() if buffer is None else buffer
+
+    def load(self, hall_ids: Sequence[int], window_start: datetime,
+             window_end: datetime) -> Dict[int, HallSchedule]:
+        longest = Movie.objects.aggregate(longest=Max('duration'))['longest'] or 0
+        lookback = timedelta(minutes=longest) + self.buffer
+        rows = Session.objects.filter(
+            hall_id__in=hall_ids,
+            start_time__gte=window_start - lookback,
+            start_time__lt=window_end,
+        ).values_list('session_id', 'hall_id', 'start_time', 'movie__duration')
+
+        intervals: Dict[int, List[Interval]] = defaultdict(list)
+        for session_id, hall_id, start_time, duration in rows:
+            end = start_time + timedelta(minutes=duration) + self.buffer
+            intervals[hall_id].append(Interval(start_time, end, session_id, f'session #{session_id}'))
+        return {hall_id: HallSchedule(hall_id, intervals[hall_id]) for hall_id in hall_ids}
+
+    def validate(self, candidates: Sequence[SessionCandidate]) -> List[dict]:
+        """
+        Перевіряє пакет сеансів одним запитом до БД: кандидати
+        сортуються за часом і по черзі додаються в розклад залу,
+        тож перетини всередині пакета теж знаходяться.
+        """
+        if not candidates:
+            return []
+        intervals = [(candidate, candidate.interval(self.buffer)) for candidate in candidates]
+        window_start = min(interval.start for _, interval in intervals)
+        window_end = max(interval.end for _, interval in intervals)
+        schedules = self.load(sorted({c.hall_id for c in candidates}), window_start, window_end)
+
+        errors = []
+        for candidate, interval in sorted(intervals, key=lambda pair: pair[1]):
+            schedule = schedules[candidate.hall_id]
+            if candidate.session_id is not None:
+                schedule.remove_session(candidate.session_id)
+            overlapping = schedule.conflicts(interval.start, interval.end)
+            if overlapping:
+                errors.append({
+                    'index': candidate.index,
+                    'hall': candidate.hall_id,
+                    'start_time': candidate.start_time,
+                    'conflicts_with': [item.label for item in overlapping],
+                })
+                continue
+            schedule.add(interval)
+        return sorted(errors, key=lambda error: error['index'])
+
+    def free_slots(self, hall_id: int, day: date, duration: int) -> List[dict]:
+        window_start, window_end = opening_window(day)
+        schedule = self.load([hall_id], window_start, window_end)[hall_id]
+        needed = timedelta(minutes=duration) + self.buffer
+        return [
+            {'start': start, 'end': end, 'minutes': int((end - start).total_seconds() // 60)}
+            for start, end in schedule.free_slots(window_start, window_end, needed)
+        ]
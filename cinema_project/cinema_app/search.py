@@ -0,0 +1,364 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from .metrics import CACHE_REQUESTS
+
+
+# Транслітерація за постановою КМУ №55 (спрощено, без позиційних правил)
+_TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e',
+    'є': 'ie', 'ж': 'zh', 'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i',
+    'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'iu', 'я': 'ia',
+    'ё': 'e', 'ы': 'y', 'э': 'e', 'ъ': '',
+}
+_APOSTROPHES = re.compile(r"['’ʼ`]")
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+Loader = Callable[[], Iterable[Tuple[int, str, Dict[str, Any]]]]
+
+
+def normalize(text: str) -> str:
+    text = _APOSTROPHES.sub('', (text or '').lower())
+    text = ''.join(_TRANSLIT.get(ch, ch) for ch in text)
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f'^{token}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class SearchHit:
+    doc_id: int
+    score: float
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.payload, 'score': round(self.score, 3)}
+
+
+class SearchIndex:
+    """
+    Інвертований індекс у пам'яті процесу: токен -> документи,
+    відсортований словник для префіксного пошуку (bisect) та
+    триграмний індекс словника для пошуку з помилками.
+    """
+
+    EXACT_SCORE = 1.0
+    PREFIX_SCORE = 0.85
+
+    def __init__(self, name: str, loader: Loader, max_age: Optional[float] = None,
+                 min_similarity: float = 0.4):
+        self.name = name
+        self._loader = loader
+        self._max_age = max_age
+        self._min_similarity = min_similarity
+        self._lock = threading.RLock()
+        self._built_at: Optional[float] = None
+        self._reset()
+
+    def _reset(self):
+        self._docs: Dict[int, Tuple[Tuple[str, ...], Dict[str, Any]]] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._vocabulary: List[str] = []
+        self._trigram_tokens: Dict[str, Set[str]] = defaultdict(set)
+        self._gram_counts: Dict[str, int] = {}
+
+    @property
+    def is_built(self) -> bool:
+        return self._built_at is not None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+            for doc_id, text, payload in self._loader():
+                self._add(doc_id, text, payload, bulk=True)
+            self._vocabulary.sort()
+            self._built_at = time.monotonic()
+
+    def ensure_built(self):
+        max_age = self._max_age
+        if max_age is None:
+            max_age = getattr(settings, 'SEARCH_INDEX_MAX_AGE', 300)
+        built_at = self._built_at
+        if built_at is None or (max_age and time.monotonic() - built_at > max_age):
+            CACHE_REQUESTS.inc(self.name, 'miss')
+            self.rebuild()
+        else:
+            CACHE_REQUESTS.inc(self.name, 'hit')
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def add(self, doc_id: int, text: str, payload: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            if not self.is_built:
+                return
+            self._remove(doc_id)
+            self._add(doc_id, text, payload or {})
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            if self.is_built:
+                self._remove(doc_id)
+
+    def _add(self, doc_id: int, text: str, payload: Dict[str, Any], bulk: bool = False):
+        tokens = tuple(tokenize(text))
+        self._docs[doc_id] = (tokens, payload)
+        for token in set(tokens):
+            postings = self._postings[token]
+            if not postings:
+                if bulk:
+                    self._vocabulary.append(token)
+                else:
+                    insort(self._vocabulary, token)
+                grams = trigrams(token)
+                self._gram_counts[token] = len(grams)
+                for gram in grams:
+                    self._trigram_tokens[gram].add(token)
+            postings.add(doc_id)
+
+    def _remove(self, doc_id: int):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        for token in set(entry[0]):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[token]
+                del self._gram_counts[token]
+                pos = bisect_left(self._vocabulary, token)
+                if pos < len(self._vocabulary) and self._vocabulary[pos] == token:
+                    del self._vocabulary[pos]
+                for gram in trigrams(token):
+                    self._trigram_tokens[gram].discard(token)
+
+    def _prefix_tokens(self, prefix: str, limit: int = 200) -> List[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        result = []
+        for token in self._vocabulary[start:start + limit]:
+            if not token.startswith(prefix):
+                break
+            result.append(token)
+        return result
+
+    def _fuzzy_tokens(self, query_token: str) -> Dict[str, float]:
+        query_grams = trigrams(query_token)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for token in self._trigram_tokens.get(gram, ()):
+                shared[token] += 1
+        matches = {}
+        for token, common in shared.items():
+            # Коефіцієнт Дайса за триграмами
+            similarity = 2.0 * common / (len(query_grams) + self._gram_counts[token])
+            if similarity >= self._min_similarity:
+                matches[token] = similarity
+        return matches
+
+    def _token_matches(self, query_token: str) -> Dict[str, float]:
+        matches = self._fuzzy_tokens(query_token) if len(query_token) > 2 else {}
+        for token in self._prefix_tokens(query_token):
+            matches[token] = max(matches.get(token, 0.0), self.PREFIX_SCORE)
+        if query_token in self._postings:
+            matches[query_token] = self.EXACT_SCORE
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[SearchHit]:
+        self.ensure_built()
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            scores: Dict[int, float] = defaultdict(float)
+            for query_token in query_tokens:
+                best: Dict[int, float] = {}
+                for token, score in self._token_matches(query_token).items():
+                    for doc_id in self._postings.get(token, ()):
+                        if score > best.get(doc_id, 0.0):
+                            best[doc_id] = score
+                for doc_id, score in best.items():
+                    scores[doc_id] += score
+
+            ranked = sorted(
+                scores.items(),
+                key=lambda item: (-item[1], len(self._docs[item[0]][0]), item[0])
+            )[:limit]
+            return [
+                SearchHit(doc_id, score / len(query_tokens), self._docs[doc_id][1])
+                for doc_id, score in ranked
+            ]
+
+
+class PrefixIndex:
+    """
+    Відсортований список ключів (email та нормалізоване ім'я) для
+    автодоповнення: пошук префікса через bisect без звернення до БД.
+    Нові записи довантажуються інкрементально за watermark ідентифікатора.
+    """
+
+    EMAIL = 'e:'
+    NAME = 'n:'
+
+    def __init__(self, name: str, loader: Callable[[int], Iterable[Tuple[int, str, str]]],
+                 refresh_interval: Optional[float] = None):
+        self.name = name
+        self._loader = loader
+        self._refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._keys: List[Tuple[str, int]] = []
+        self._records: Dict[int, Tuple[str, str]] = {}
+        self._watermark = 0
+        self._refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def watermark(self) -> int:
+        return self._watermark
+
+    @classmethod
+    def _record_keys(cls, name: str, email: str) -> List[str]:
+        keys = {cls.EMAIL + (email or '').strip().lower()}
+        normalized = normalize(name)
+        if normalized:
+            keys.add(cls.NAME + normalized)
+            for token in normalized.split()[1:]:
+                keys.add(cls.NAME + token)
+        return sorted(keys)
+
+    def refresh(self):
+        with self._lock:
+            bulk = self._refreshed_at is None
+            for record_id, name, email in self._loader(self._watermark):
+                self._put(record_id, name, email, bulk=bulk)
+                self._watermark = max(self._watermark, record_id)
+            if bulk:
+                self._keys.sort()
+            self._refreshed_at = time.monotonic()
+
+    def _maybe_refresh(self):
+        interval = self._refresh_interval
+        if interval is None:
+            interval = getattr(settings, 'CUSTOMER_AUTOCOMPLETE_REFRESH', 5)
+        refreshed_at = self._refreshed_at
+        if refreshed_at is None or time.monotonic() - refreshed_at > interval:
+            CACHE_REQUESTS.inc(self.name, 'miss')
+            self.refresh()
+        else:
+            CACHE_REQUESTS.inc(self.name, 'hit')
+
+    def put(self, record_id: int, name: str, email: str):
+        with self._lock:
+            if self._refreshed_at is None:
+                return
+            self._put(record_id, name, email)
+
+    def remove(self, record_id: int):
+        with self._lock:
+            self._remove(record_id)
+
+    def _put(self, record_id: int, name: str, email: str, bulk: bool = False):
+        if not bulk:
+            self._remove(record_id)
+        self._records[record_id] = (name, email)
+        for key in self._record_keys(name, email):
+            if bulk:
+                self._keys.append((key, record_id))
+            else:
+                insort(self._keys, (key, record_id))
+
+    def _remove(self, record_id: int):
+        record = self._records.pop(record_id, None)
+        if record is None:
+            return
+        for key in self._record_keys(*record):
+            pos = bisect_left(self._keys, (key, record_id))
+            if pos < len(self._keys) and self._keys[pos] == (key, record_id):
+                del self._keys[pos]
+
+    def _scan(self, prefix: str, limit: int, seen: Dict[int, None]):
+        pos = bisect_left(self._keys, (prefix, 0))
+        while pos < len(self._keys) and len(seen) < limit:
+            key, record_id = self._keys[pos]
+            if not key.startswith(prefix):
+                break
+            seen.setdefault(record_id, None)
+            pos += 1
+
+    def lookup(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        self._maybe_refresh()
+        email_prefix = query.strip().lower()
+        name_prefix = normalize(query)
+        if not email_prefix:
+            return []
+
+        with self._lock:
+            # dict зберігає порядок: спершу збіги за email, потім за іменем
+            seen: Dict[int, None] = {}
+            self._scan(self.EMAIL + email_prefix, limit, seen)
+            if name_prefix:
+                self._scan(self.NAME + name_prefix, limit, seen)
+            return [
+                {'customer_id': record_id,
+                 'name': self._records[record_id][0],
+                 'email': self._records[record_id][1]}
+                for record_id in seen
+            ]
+
+
+def _load_movies():
+    from .models import Movie
+    for movie_id, title, release_year in Movie.objects.values_list(
+        'movie_id', 'title', 'release_year'
+    ).iterator():
+        yield movie_id, title, {
+            'movie_id': movie_id, 'title': title, 'release_year': release_year
+        }
+
+
+def _load_customers():
+    from .models import Customer
+    for customer_id, name, email in Customer.objects.values_list(
+        'customer_id', 'name', 'email'
+    ).iterator():
+        yield customer_id, name, {
+            'customer_id': customer_id, 'name': name, 'email': email
+        }
+
+
+movie_index = SearchIndex('movie_search', _load_movies)
+customer_index = SearchIndex('customer_search', _load_customers)
+
+
+def _load_new_customers(watermark: int):
+    from .models import Customer
+    return Customer.objects.filter(customer_id__gt=watermark).order_by(
+        'customer_id'
+    ).values_list('customer_id', 'name', 'email').iterator()
+
+
+customer_autocomplete = PrefixIndex('customer_autocomplete', _load_new_customers)
@@ -0,0 +1,127 @@
+import math
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .models import Session
+
+# Кількість місць у ряду за типом залу, якщо розкладку не задано явно
+DEFAULT_SEATS_PER_ROW = {'VIP': 8, 'IMAX': 20}
+
+
+@dataclass
+class SeatBlock:
+    row: int
+    first_seat: int
+    seats: List[int]
+    score: float
+
+    def to_dict(self) -> dict:
+        return {
+            'row': self.row + 1,
+            'seats': self.seats,
+            'positions': [self.first_seat + offset + 1 for offset in range(len(self.seats))],
+            'score': round(self.score, 4),
+        }
+
+
+class HallLayout:
+    """
+    Ряди залу та нумерація місць (1..capacity, по рядах від екрана).
+    Вільні місця - бітова маска: біт n-1 відповідає місцю n, тож пошук
+    n сусідніх вільних місць зводиться до n-1 зсувів і AND над усім залом.
+    """
+
+    def __init__(self, row_lengths: Sequence[int]):
+        self.row_lengths = list(row_lengths)
+        self.row_offsets = [0, *accumulate(self.row_lengths)][:-1]
+        self.capacity = sum(self.row_lengths)
+        self.all_seats = (1 << self.capacity) - 1
+
+        scores = []
+        rows = len(self.row_lengths)
+        ideal_row = (rows - 1) * 0.6
+        for row, length in enumerate(self.row_lengths):
+            centre = (length - 1) / 2
+            row_penalty = ((row - ideal_row) / max(rows, 1)) ** 2
+            for position in range(length):
+                column_penalty = ((position - centre) / max(length, 1)) ** 2
+                scores.append(1.0 - row_penalty - column_penalty)
+        self.seat_scores = scores
+        self._prefix = [0.0, *accumulate(scores)]
+        self._start_masks: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_hall(cls, capacity: int, hall_type: str = '') -> 'HallLayout':
+        per_row = getattr(settings, 'HALL_SEATS_PER_ROW', DEFAULT_SEATS_PER_ROW).get(hall_type)
+        if not per_row:
+            per_row = max(int(round(math.sqrt(capacity * 1.5))), 1)
+        full_rows, rest = divmod(capacity, per_row)
+        return cls([per_row] * full_rows + ([rest] if rest else []))
+
+    def position(self, seat_number: int) -> Tuple[int, int]:
+        index = seat_number - 1
+        for row in range(len(self.row_offsets) - 1, -1, -1):
+            if self.row_offsets[row] <= index:
+                return row, index - self.row_offsets[row]
+        raise ValueError(seat_number)
+
+    def start_mask(self, n: int) -> int:
+        """Місця, з яких блок довжини n не виходить за межі свого ряду."""
+        mask = self._start_masks.get(n)
+        if mask is None:
+            mask = 0
+            for offset, length in zip(self.row_offsets, self.row_lengths):
+                if length >= n:
+                    mask |= ((1 << (length - n + 1)) - 1) << offset
+            with self._lock:
+                self._start_masks[n] = mask
+        return mask
+
+    def best_block(self, occupied: int, n: int) -> Optional[SeatBlock]:
+        if n <= 0 or n > self.capacity:
+            return None
+        free = ~occupied & self.all_seats
+        starts = free
+        for shift in range(1, n):
+            starts &= free >> shift
+        starts &= self.start_mask(n)
+
+        best_index, best_score = -1, float('-inf')
+        prefix = self._prefix
+        while starts:
+            lowest = starts & -starts
+            index = lowest.bit_length() - 1
+            score = prefix[index + n] - prefix[index]
+            if score > best_score:
+                best_index, best_score = index, score
+            starts ^= lowest
+        if best_index < 0:
+            return None
+
+        row, first = self.position(best_index + 1)
+        seats = list(range(best_index + 1, best_index + n + 1))
+        return SeatBlock(row=row, first_seat=first, seats=seats, score=best_score / n)
+
+
+@lru_cache(maxsize=256)
+def _layout(capacity: int, hall_type: str, hall_id: int) -> HallLayout:
+    explicit = getattr(settings, 'HALL_LAYOUTS', {}).get(hall_id)
+    if explicit:
+        return HallLayout(explicit)
+    return HallLayout.for_hall(capacity, hall_type)
+
+
+def layout_for_session(session_id: int) -> Optional[HallLayout]:
+    row = Session.objects.filter(pk=session_id).values_list(
+        'hall_id', 'hall__capacity', 'hall__type'
+    ).first()
+    if row is None:
+        return None
+    hall_id, capacity, hall_type = row
+    return _layout(capacity, hall_type, hall_id)
@@ -1,8 +1,63 @@
+import operator
+from typing import List, Optional, Sequence, Tuple
+
+from django.db.models import Count, F
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import Genre, Hall, JobPosition, Employee, Movie, Customer, Session, Ticket
+from .holds import seat_holds
+from .scheduling import SessionCandidate, SessionScheduler, locked_halls
+
+
+def _field_list(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    return names or None
+
+
+def requested_fields(request) -> Tuple[Optional[List[str]], Optional[List[str]]]:
+    """?fields=a,b і ?exclude=c з запиту; None - параметр не передано."""
+    params = getattr(request, 'query_params', {})
+    return _field_list(params.get('fields')), _field_list(params.get('exclude'))
+
+
+def select_fields(available: Sequence[str], fields: Optional[Sequence[str]],
+                  exclude: Optional[Sequence[str]]) -> List[str]:
+    unknown = sorted((set(fields or ()) | set(exclude or ())) - set(available))
+    if unknown:
+        raise serializers.ValidationError({
+            'fields': [f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}"]
+        })
+    excluded = set(exclude or ())
+    return [
+        name for name in available
+        if (fields is None or name in fields) and name not in excluded
+    ]
+
 
+class SparseFieldsMixin:
+    """
+    ?fields= / ?exclude= для GET-відповідей: непотрібні поля видаляються
+    до серіалізації, тож їх SerializerMethodField (з запитами) не викликаються.
+    """
 
-class GenreSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        fields, exclude = requested_fields(request)
+        if fields is None and exclude is None:
+            return
+        readable = [name for name, field in self.fields.items() if not field.write_only]
+        keep = set(select_fields(readable, fields, exclude))
+        for name in readable:
+            if name not in keep:
+                self.fields.pop(name)
+
+
+class GenreSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     movie_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -14,14 +69,14 @@ class GenreSerializer(serializers.ModelSerializer):
         return obj.movies.count()
 
 
-class HallSerializer(serializers.ModelSerializer):
+class HallSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Hall
         fields = ['hall_id', 'name', 'capacity', 'type']
         read_only_fields = ['hall_id']
 
 
-class JobPositionSerializer(serializers.ModelSerializer):
+class JobPositionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     employee_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -33,7 +88,7 @@ class JobPositionSerializer(serializers.ModelSerializer):
         return obj.employees.count()
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     position_title = serializers.CharField(source='position.title', read_only=True)
     
     class Meta:
@@ -45,7 +100,7 @@ class EmployeeSerializer(serializers.ModelSerializer):
         read_only_fields = ['employee_id']
 
 
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     genre_name = serializers.CharField(source='genre.name', read_only=True)
     session_count = serializers.SerializerMethodField()
     
@@ -61,7 +116,7 @@ class MovieSerializer(serializers.ModelSerializer):
         return obj.sessions.count()
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     ticket_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -73,7 +128,7 @@ class CustomerSerializer(serializers.ModelSerializer):
         return obj.tickets.count()
 
 
-class SessionSerializer(serializers.ModelSerializer):
+class SessionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     movie_title = serializers.CharField(source='movie.title', read_only=True)
     hall_name = serializers.CharField(source='hall.name', read_only=True)
     available_seats = serializers.SerializerMethodField()
@@ -87,36 +142,231 @@ class SessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['session_id']
     
     def get_available_seats(self, obj):
-        occupied = obj.tickets.count()
+        occupied = obj.tickets.count() + len(seat_holds.held_seats(obj.session_id))
         return obj.hall.capacity - occupied
 
+    # Перетини перевіряються не у validate(), а під блокуванням залу разом зі
+    # збереженням - інакше два паралельні запити пройдуть перевірку обидва
+    def create(self, validated_data):
+        with locked_halls([validated_data['hall'].hall_id]):
+            self._check_schedule(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with locked_halls([validated_data.get('hall', instance.hall).hall_id]):
+            self._check_schedule(validated_data)
+            return super().update(instance, validated_data)
+
+    def _check_schedule(self, data):
+        if self.context.get('skip_schedule_check'):
+            return
+
+        movie = data.get('movie', getattr(self.instance, 'movie', None))
+        hall = data.get('hall', getattr(self.instance, 'hall', None))
+        start_time = data.get('start_time', getattr(self.instance, 'start_time', None))
+        candidate = SessionCandidate(
+            hall_id=hall.hall_id,
+            start_time=start_time,
+            duration=movie.duration,
+            session_id=getattr(self.instance, 'session_id', None)
+        )
+        errors = SessionScheduler().validate([candidate])
+        if errors:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                f"Зал {hall.name} зайнятий у цей час: перетин з "
+                f"{', '.join(errors[0]['conflicts_with'])}"
+            ]})
+
+
+class SearchLimitSerializer(serializers.Serializer):
+    # Нечислове чи від'ємне значення - 400, а не 500 чи зріз з кінця списку
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
 
-class TicketSerializer(serializers.ModelSerializer):
+class SessionBulkItemSerializer(serializers.Serializer):
+    movie = serializers.IntegerField(min_value=1)
+    hall = serializers.IntegerField(min_value=1)
+    start_time = serializers.DateTimeField()
+    price = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+
+class SeatHoldSerializer(serializers.Serializer):
+    seats = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    hold_token = serializers.CharField()
+    customer = serializers.PrimaryKeyRelatedField(queryset=Customer.objects.all())
+    purchase_date = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+
+class TicketSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     movie_title = serializers.CharField(source='session.movie.title', read_only=True)
     customer_name = serializers.CharField(source='customer.name', read_only=True)
     session_time = serializers.DateTimeField(source='session.start_time', read_only=True)
+    hold_token = serializers.CharField(write_only=True, required=False)
     
     class Meta:
         model = Ticket
         fields = [
             'ticket_id', 'session', 'customer', 'seat_number',
-            'purchase_date', 'movie_title', 'customer_name', 'session_time'
+            'purchase_date', 'movie_title', 'customer_name', 'session_time', 'hold_token'
         ]
         read_only_fields = ['ticket_id']
+        extra_kwargs = {'seat_number': {'min_value': 1}}
+        # Унікальність (session, seat_number) перевіряє validate(), а гонки ловить БД
+        validators = []
     
     def validate(self, data):
 
         session = data.get('session')
         seat_number = data.get('seat_number')
-        
-        if Ticket.objects.filter(session=session, seat_number=seat_number).exists():
+
+        # Номер поза 1..capacity зламав би бітові маски зайнятості сеансу
+        if not 1 <= seat_number <= session.hall.capacity:
             raise serializers.ValidationError(
-                f"Місце {seat_number} вже зайняте на цьому сеансі"
+                f"Місце {seat_number} не існує. Допустимі місця: 1-{session.hall.capacity}"
             )
 
-        if seat_number > session.hall.capacity:
+        hold = seat_holds.holder(session.session_id, seat_number)
+        token = data.get('hold_token')
+        request = self.context.get('request')
+        owner = getattr(getattr(request, 'user', None), 'pk', None)
+        if hold is not None and (hold.token != token or not hold.owned_by(owner)):
             raise serializers.ValidationError(
-                f"Місце {seat_number} не існує. Максимальна кількість місць: {session.hall.capacity}"
+                f"Місце {seat_number} тимчасово утримується іншим покупцем"
             )
-        
-        return data
\ No newline at end of file
+        if hold is None and token:
+            raise serializers.ValidationError(
+                f"Утримання місця {seat_number} закінчилося або не існує"
+            )
+
+        # Утримане покупцем місце вже перевірене при утриманні - зайвий запит не потрібен
+        if hold is None and Ticket.objects.filter(session=session, seat_number=seat_number).exists():
+            raise serializers.ValidationError(
+                f"Місце {seat_number} вже зайняте на цьому сеансі"
+            )
+
+        return data
+
+# Швидкі серіалізатори для list: рендер рядків .values() без створення моделей
+
+_PASSTHROUGH_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField, serializers.ReadOnlyField,
+)
+
+
+class RowSerializer:
+    """
+    Серіалізатор лише для читання, що рендерить рядки `.values()` у словники.
+    Поля, їх порядок і to_representation один раз беруться з model_serializer,
+    тож вивід збігається з ним; SerializerMethodField заповнюються з
+    annotations (вираз у тому ж запиті) або методом get_<поле>(row).
+    З ?fields= / ?exclude= у запит потрапляють лише потрібні колонки,
+    JOIN-и та агрегати.
+    """
+    model_serializer = None
+    annotations = {}
+    # Ключі рядка, потрібні методам get_<поле>
+    requires = {}
+
+    def __init__(self, context=None, fields=None, exclude=None):
+        self.context = context or {}
+        request = self.context.get('request')
+        if fields is None and exclude is None and request is not None:
+            fields, exclude = requested_fields(request)
+
+        plan = self.compile()
+        self._getters = []
+        needed = []
+        for name in select_fields(list(plan), fields, exclude):
+            getter, method, keys = plan[name]
+            self._getters.append((name, getattr(self, method) if method else getter))
+            needed.extend(key for key in keys if key not in needed)
+        self._lookups = [key for key in needed if key not in self.annotations]
+        self._annotations = {key: self.annotations[key] for key in needed if key in self.annotations}
+
+    @classmethod
+    def compile(cls) -> dict:
+        """{поле: (getter, назва методу, потрібні ключі рядка)}, один раз на клас."""
+        plan = cls.__dict__.get('_plan')
+        if plan is not None:
+            return plan
+
+        plan = {}
+        for name, field in cls.model_serializer().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if hasattr(cls, f'get_{name}'):
+                    plan[name] = (None, f'get_{name}', tuple(cls.requires.get(name, ())))
+                else:
+                    plan[name] = (operator.itemgetter(name), None, (name,))
+                continue
+            key = field.source.replace('.', '__')
+            if isinstance(field, _PASSTHROUGH_FIELDS) and not isinstance(field, serializers.ChoiceField):
+                plan[name] = (operator.itemgetter(key), None, (key,))
+            else:
+                plan[name] = (_converter(key, field.to_representation), None, (key,))
+        cls._plan = plan
+        return plan
+
+    def fetch(self, repository, query=None) -> list:
+        return repository.get_values(*self._lookups, query=query, **self._annotations)
+
+    def to_representation(self, row: dict) -> dict:
+        return {name: get(row) for name, get in self._getters}
+
+    def render(self, rows) -> list:
+        getters = self._getters
+        return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def _converter(key, to_representation):
+    def get(row):
+        value = row[key]
+        return None if value is None else to_representation(value)
+    return get
+
+
+class GenreRowSerializer(RowSerializer):
+    model_serializer = GenreSerializer
+    annotations = {'movie_count': Count('movies')}
+
+
+class HallRowSerializer(RowSerializer):
+    model_serializer = HallSerializer
+
+
+class JobPositionRowSerializer(RowSerializer):
+    model_serializer = JobPositionSerializer
+    annotations = {'employee_count': Count('employees')}
+
+
+class EmployeeRowSerializer(RowSerializer):
+    model_serializer = EmployeeSerializer
+
+
+class MovieRowSerializer(RowSerializer):
+    model_serializer = MovieSerializer
+    annotations = {'session_count': Count('sessions')}
+
+
+class CustomerRowSerializer(RowSerializer):
+    model_serializer = CustomerSerializer
+    annotations = {'ticket_count': Count('tickets')}
+
+
+class SessionRowSerializer(RowSerializer):
+    model_serializer = SessionSerializer
+    annotations = {'ticket_count': Count('tickets'), 'hall_capacity': F('hall__capacity')}
+    requires = {'available_seats': ('session_id', 'hall_capacity', 'ticket_count')}
+
+    def get_available_seats(self, row):
+        held = len(seat_holds.held_seats(row['session_id']))
+        return row['hall_capacity'] - row['ticket_count'] - held
+
+
+class TicketRowSerializer(RowSerializer):
+    model_serializer = TicketSerializer
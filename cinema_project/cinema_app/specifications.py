@@ -0,0 +1,107 @@
+"""
+Специфікації для репозиторіїв: предикати, що комбінуються через & | ~
+і перетворюються на Q, та Query з порядком і лімітом. Фільтри виконуються
+в SQL, тож індекси (idx_movie_genre_year, idx_session_hall_start, ...) працюють.
+
+    spec = Lookup('genre_id', 'in', [1, 2]) & ~Lookup('age_limit', 'gt', 16)
+    uow.movies.find(Query(spec, ordering=('-release_year',), limit=20))
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Specification(ABC):
+
+    @abstractmethod
+    def to_q(self) -> Q:
+        pass
+
+    def __and__(self, other: 'Specification') -> 'Specification':
+        return AllOf((self, other))
+
+    def __or__(self, other: 'Specification') -> 'Specification':
+        return AnyOf((self, other))
+
+    def __invert__(self) -> 'Specification':
+        return Not(self)
+
+
+@dataclass(frozen=True)
+class Lookup(Specification):
+    field: str
+    lookup: str
+    value: Any
+
+    def to_q(self) -> Q:
+        key = self.field if self.lookup == 'exact' else f'{self.field}__{self.lookup}'
+        return Q(**{key: self.value})
+
+
+@dataclass(frozen=True)
+class OnDate(Specification):
+    """Діапазон [день, день + 1) замість __date, щоб працював індекс на полі."""
+    field: str
+    day: date
+
+    def to_q(self) -> Q:
+        start = datetime.combine(self.day, datetime.min.time())
+        end = start + timedelta(days=1)
+        if settings.USE_TZ:
+            start, end = timezone.make_aware(start), timezone.make_aware(end)
+        return Q(**{f'{self.field}__gte': start, f'{self.field}__lt': end})
+
+
+@dataclass(frozen=True)
+class AllOf(Specification):
+    specs: Tuple[Specification, ...]
+
+    def to_q(self) -> Q:
+        q = Q()
+        for spec in self.specs:
+            q &= spec.to_q()
+        return q
+
+
+@dataclass(frozen=True)
+class AnyOf(Specification):
+    specs: Tuple[Specification, ...]
+
+    def to_q(self) -> Q:
+        q = Q()
+        for spec in self.specs:
+            q |= spec.to_q()
+        return q
+
+
+@dataclass(frozen=True)
+class Not(Specification):
+    spec: Specification
+
+    def to_q(self) -> Q:
+        return ~self.spec.to_q()
+
+
+@dataclass(frozen=True)
+class Query:
+    where: Optional[Specification] = None
+    ordering: Tuple[str, ...] = ()
+    limit: Optional[int] = None
+    offset: int = 0
+
+    def apply(self, queryset):
+        if self.where is not None:
+            queryset = queryset.filter(self.where.to_q())
+        if self.ordering or self.limit is not None or self.offset:
+            # pk у кінці - стабільний порядок для limit/offset (Meta.ordering у моделей немає)
+            queryset = queryset.order_by(*self.ordering, 'pk')
+        if self.limit is not None:
+            return queryset[self.offset:self.offset + self.limit]
+        if self.offset:
+            return queryset[self.offset:]
+        return queryset
@@ -0,0 +1,421 @@
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from .booking_queue import BookingQueue, BookingRequest, BookingResult, SessionBookingWorker
+from .holds import SeatHold, SeatHoldStore, check_hold_store
+from .metrics import Counter, Histogram, Metric, Registry
+from .occupancy import OccupancyCache, SessionOccupancy, seat_bit
+from .schedule_optimizer import DayInput, DayOptimizer, HallInfo, MovieStats, optimize_schedule
+from .seating import HallLayout
+from .scheduling import HallSchedule, Interval, SessionCandidate, SessionScheduler
+from .throttling import TokenBucketThrottle, _LocalBuckets, limiter
+from .views import CustomerViewSet, MovieViewSet, TicketViewSet
+
+
+class MetricsTests(SimpleTestCase):
+
+    def run_threads(self, target, count=8):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_metric_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Metric('x', 'x', registry=Registry())
+
+    def test_dead_thread_shards_are_folded_into_total(self):
+        counter = Counter('c', 'c', ('scope',), registry=Registry())
+        self.run_threads(lambda: counter.inc('a', amount=2))
+        self.assertEqual(counter.values(), {('a',): 16})
+        self.assertEqual(counter._shards, [])
+
+        counter.inc('a')
+        self.run_threads(lambda: counter.inc('b'), count=3)
+        self.assertEqual(counter.values(), {('a',): 17, ('b',): 3})
+        self.assertEqual(len(counter._shards), 1)
+
+    def test_histogram_merge_keeps_retired_state(self):
+        histogram = Histogram('h', 'h', buckets=(1.0,), registry=Registry())
+        self.run_threads(lambda: histogram.observe(0.5), count=4)
+        histogram.observe(2.0)
+        self.assertEqual(histogram.values(), {(): [[4, 1], 4.0, 5]})
+        # Повторний scrape не подвоює вже злиті shards
+        self.assertEqual(histogram.values(), {(): [[4, 1], 4.0, 5]})
+
+
+class ThrottlingTests(SimpleTestCase):
+    RATES = {'catalog': {'rate': '600/min', 'burst': 120}, 'analytics': {'rate': '6/min', 'burst': 3}}
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        limiter.reset()
+        self.addCleanup(limiter.reset)
+
+    def test_bucket_refills_over_time(self):
+        buckets = _LocalBuckets(stripes=4, max_keys=100)
+        for _ in range(3):
+            self.assertEqual(buckets.consume('analytics:u1', 0.1, 3), 0.0)
+        self.assertAlmostEqual(buckets.consume('analytics:u1', 0.1, 3), 10.0)
+        self.now += 5
+        self.assertAlmostEqual(buckets.consume('analytics:u1', 0.1, 3), 5.0)
+        self.now += 5
+        self.assertEqual(buckets.consume('analytics:u1', 0.1, 3), 0.0)
+
+    def test_scopes_and_users_have_separate_buckets(self):
+        with override_settings(THROTTLING={'RATES': self.RATES, 'CACHE_ALIAS': None}):
+            for _ in range(3):
+                limiter.consume('analytics', 'user-1')
+            self.assertGreater(limiter.consume('analytics', 'user-1'), 0)
+            self.assertEqual(limiter.consume('catalog', 'user-1'), 0.0)
+            self.assertEqual(limiter.consume('analytics', 'user-2'), 0.0)
+
+    def test_pruning_keeps_depleted_buckets(self):
+        # Одна смуга на 1 ключ: кожен новий ключ запускає прибирання
+        buckets = _LocalBuckets(stripes=1, max_keys=1)
+        for _ in range(4):
+            buckets.consume('analytics:u1', 0.1, 3)
+        # Каталожний кошик повний через 12 с, аналітичний - лише через 30 с
+        self.now += 13
+        for index in range(5):
+            buckets.consume(f'catalog:u{index}', 10.0, 120)
+        self.assertEqual(buckets.consume('analytics:u1', 0.1, 3), 0.0)
+        self.assertAlmostEqual(buckets.consume('analytics:u1', 0.1, 3), 7.0)
+
+    def test_rejected_request_gets_retry_after(self):
+        class LimitedView(APIView):
+            authentication_classes = []
+            permission_classes = []
+            throttle_classes = [TokenBucketThrottle]
+            throttle_scope = 'analytics'
+
+            def get(self, request):
+                return Response({'ok': True})
+
+        view = LimitedView.as_view()
+        factory = APIRequestFactory()
+        with override_settings(THROTTLING={'ENABLED': True, 'RATES': self.RATES, 'CACHE_ALIAS': None}):
+            statuses = [view(factory.get('/limited/')).status_code for _ in range(3)]
+            rejected = view(factory.get('/limited/'))
+        self.assertEqual(statuses, [200, 200, 200])
+        self.assertEqual(rejected.status_code, 429)
+        self.assertEqual(rejected['Retry-After'], '10')
+
+
+class OccupancyCacheTests(SimpleTestCase):
+
+    def test_started_sessions_are_evicted_once_stale(self):
+        cache = OccupancyCache(ttl=30)
+        now, wall = timezone.now(), time.time()
+        entries = {
+            1: (now - timedelta(hours=1), wall - 60),
+            2: (now - timedelta(hours=1), wall),
+            3: (now + timedelta(hours=1), wall - 60),
+        }
+        for session_id, (start_time, loaded_at) in entries.items():
+            cache._sessions[session_id] = SessionOccupancy(session_id, 10, loaded_at=loaded_at, start_time=start_time)
+
+        cache._evict_started(now, wall - cache.ttl)
+        # Щойно завантажений сеанс лишається до кінця запиту, що його читає
+        self.assertEqual(sorted(cache._sessions), [2, 3])
+
+
+class SchedulingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.day = datetime(2024, 5, 1)
+
+    def at(self, hour, minute=0):
+        return self.day + timedelta(hours=hour, minutes=minute)
+
+    def test_touching_intervals_do_not_overlap(self):
+        schedule = HallSchedule(1, [Interval(self.at(10), self.at(12), 1), Interval(self.at(14), self.at(16), 2)])
+        self.assertEqual(schedule.conflicts(self.at(12), self.at(14)), [])
+        self.assertEqual([item.session_id for item in schedule.conflicts(self.at(11, 59), self.at(14))], [1])
+        self.assertEqual([item.session_id for item in schedule.conflicts(self.at(12), self.at(14, 1))], [2])
+        self.assertEqual(schedule.conflicts(self.at(11), self.at(13), ignore_session_id=1), [])
+
+    def test_long_earlier_interval_is_found_past_shorter_ones(self):
+        # Префіксний максимум кінців: довгий сеанс ховається за коротшими, що почалися пізніше
+        schedule = HallSchedule(1, [
+            Interval(self.at(9), self.at(18), 1),
+            Interval(self.at(10), self.at(11), 2),
+            Interval(self.at(12), self.at(13), 3),
+        ])
+        self.assertEqual([item.session_id for item in schedule.conflicts(self.at(14), self.at(15))], [1])
+        schedule.remove_session(1)
+        self.assertEqual(schedule.conflicts(self.at(14), self.at(15)), [])
+
+    def test_free_slots_include_exact_fits(self):
+        schedule = HallSchedule(1, [Interval(self.at(11), self.at(13), 1)])
+        slots = schedule.free_slots(self.at(9), self.at(15), timedelta(hours=2))
+        self.assertEqual(slots, [(self.at(9), self.at(11)), (self.at(13), self.at(15))])
+        self.assertEqual(schedule.free_slots(self.at(9), self.at(15), timedelta(hours=2, minutes=1)), [])
+
+    def test_validate_finds_overlaps_inside_the_batch(self):
+        scheduler = SessionScheduler(buffer=timedelta(minutes=15))
+        candidates = [
+            SessionCandidate(1, self.at(10), 105, index=0),
+            # 10:00 + 105 хв + 15 хв прибирання = 12:00 - впритул, без перетину
+            SessionCandidate(1, self.at(12), 90, index=1),
+            SessionCandidate(1, self.at(13), 60, index=2),
+            SessionCandidate(2, self.at(10), 120, index=3),
+        ]
+        with mock.patch.object(SessionScheduler, 'load', return_value={1: HallSchedule(1), 2: HallSchedule(2)}):
+            errors = scheduler.validate(candidates)
+        self.assertEqual([error['index'] for error in errors], [2])
+        self.assertEqual(errors[0]['conflicts_with'], ['item #1'])
+
+
+class SeatHoldTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        # Фоновий sweeper не потрібен: тести викликають sweep() самі
+        for patcher in (mock.patch('time.time', side_effect=lambda: self.now),
+                        mock.patch.object(SeatHoldStore, '_ensure_sweeper')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.store = SeatHoldStore()
+
+    def test_hold_is_all_or_nothing(self):
+        first = self.store.hold(1, [3, 4], seconds=60, owner=7)
+        self.assertIsNone(self.store.hold(1, [4, 5], seconds=60))
+        self.assertEqual(self.store.held_seats(1), [3, 4])
+        self.assertIsNotNone(self.store.hold(2, [4], seconds=60))
+        self.assertEqual(self.store.held_seats(1, exclude_token=first.token), [])
+        self.assertIsNone(self.store.hold(1, [5], seconds=60, verify=lambda seats: False))
+        self.assertEqual(self.store.held_seats(1), [3, 4])
+
+    def test_expired_hold_frees_seats_and_is_swept(self):
+        hold = self.store.hold(1, [3], seconds=60)
+        self.now += 59
+        self.assertEqual(self.store.holder(1, 3), hold)
+        self.now += 1
+        self.assertIsNone(self.store.holder(1, 3))
+        self.assertIsNone(self.store.get(hold.token))
+        self.assertEqual(self.store.sweep(), 1)
+        self.assertEqual((self.store._holds, self.store._seats), ({}, {}))
+        self.assertIsNotNone(self.store.hold(1, [3], seconds=60))
+
+    def test_release_and_consume(self):
+        hold = self.store.hold(1, [3, 4], seconds=60)
+        self.store.consume(hold.token, [3])
+        self.assertEqual(self.store.get(hold.token).seats, [4])
+        self.assertEqual(self.store.held_seats(1), [4])
+        self.assertTrue(self.store.release(hold.token))
+        self.assertFalse(self.store.release(hold.token))
+        self.assertEqual(self.store.held_seats(1), [])
+        # Прострочений запис у купі вже знятого утримання нічого не рахує
+        self.now += 60
+        self.assertEqual(self.store.sweep(), 0)
+
+    def test_ownership(self):
+        owned = self.store.hold(1, [3], seconds=60, owner=7)
+        anonymous = self.store.hold(1, [4], seconds=60)
+        self.assertTrue(owned.owned_by(7))
+        self.assertFalse(owned.owned_by(8))
+        self.assertFalse(owned.owned_by(None))
+        self.assertTrue(anonymous.owned_by(8))
+
+    def test_several_workers_are_rejected(self):
+        with override_settings(WORKERS=1):
+            check_hold_store()
+        with override_settings(WORKERS=4), self.assertRaises(ImproperlyConfigured):
+            check_hold_store()
+
+
+class BookingQueueTests(SimpleTestCase):
+
+    def request(self, seat, **kwargs):
+        return BookingRequest(session_id=1, customer_id=2, seat_number=seat, purchase_date=Decimal('0'), **kwargs)
+
+    def test_timeout_and_failure_never_raise(self):
+        queue = BookingQueue()
+        with mock.patch.object(BookingQueue, 'submit', return_value=Future()):
+            self.assertEqual(queue.book(self.request(1), timeout=0.01).status, 'pending')
+        failed = Future()
+        failed.set_exception(RuntimeError('db down'))
+        with mock.patch.object(BookingQueue, 'submit', return_value=failed):
+            self.assertEqual(queue.book(self.request(1), timeout=0.01).status, 'failed')
+
+    def test_resolve_rejects_conflicts_in_memory(self):
+        worker = SessionBookingWorker(BookingQueue(), 1, {})
+        occupancy = SessionOccupancy(1, 10, seats=0b1)
+        hold = SeatHold('t', 1, [5], expires_at=float('inf'), owner=7)
+        batch = [
+            self.request(1), self.request(11), self.request(3), self.request(3),
+            self.request(5, hold_token='t', owner=8), self.request(5, hold_token='t', owner=7),
+        ]
+        with mock.patch('cinema_app.booking_queue.occupancy_cache.get', return_value=occupancy), \
+                mock.patch('cinema_app.booking_queue.seat_holds.holder',
+                           side_effect=lambda session_id, seat: hold if seat == 5 else None):
+            accepted = worker._resolve(batch)
+        self.assertEqual(accepted, [batch[2], batch[5]])
+        self.assertEqual(
+            [request.future.result().status for request in (batch[0], batch[1], batch[3], batch[4])],
+            ['taken', 'invalid', 'taken', 'held'],
+        )
+
+    def test_failed_batch_fails_every_pending_request(self):
+        worker = SessionBookingWorker(BookingQueue(), 1, {})
+        batch = [self.request(1), self.request(2)]
+        with mock.patch('cinema_app.booking_queue.close_old_connections'), \
+                mock.patch.object(SessionBookingWorker, '_resolve', return_value=batch), \
+                mock.patch.object(SessionBookingWorker, '_insert', side_effect=RuntimeError('db down')), \
+                self.assertLogs('cinema_app.booking_queue', 'ERROR'):
+            worker._process(batch)
+        for request in batch:
+            self.assertIsInstance(request.future.exception(), RuntimeError)
+
+    def test_queued_outcomes_map_to_status_codes(self):
+        view = TicketViewSet()
+        request = SimpleNamespace(user=SimpleNamespace(pk=7))
+        data = {
+            'session': SimpleNamespace(session_id=1), 'customer': SimpleNamespace(customer_id=2),
+            'seat_number': 3, 'purchase_date': Decimal('0'),
+        }
+        for outcome, code in (('pending', 503), ('failed', 503), ('taken', 409), ('held', 409), ('invalid', 400)):
+            with mock.patch('cinema_app.views.booking_queue.book', return_value=BookingResult(outcome, error='x')):
+                response = view._create_queued(request, dict(data), None)
+            self.assertEqual(response.status_code, code, outcome)
+            if code == 503:
+                self.assertEqual(response['Retry-After'], '1')
+                self.assertEqual(response.data['check'], '/tickets/?session=1&customer=2')
+
+
+class SeatingTests(SimpleTestCase):
+
+    def test_seat_n_is_bit_n_minus_one(self):
+        self.assertEqual(seat_bit(1, 10), 0b1)
+        self.assertEqual(seat_bit(10, 10), 1 << 9)
+        # Номери поза 1..capacity не зачіпають маску
+        self.assertEqual([seat_bit(seat, 10) for seat in (0, -1, 11)], [0, 0, 0])
+
+        occupancy = SessionOccupancy(1, 130)
+        occupancy.set_seats(seat_bit(1, 130) | seat_bit(64, 130) | seat_bit(65, 130) | seat_bit(130, 130))
+        self.assertEqual(occupancy.occupied_seats(), [1, 64, 65, 130])
+        self.assertEqual(occupancy.sold, 4)
+        self.assertTrue(occupancy.is_taken(65))
+        self.assertFalse(occupancy.is_taken(66))
+        self.assertFalse(occupancy.is_taken(131))
+
+    def test_held_bitmap_uses_the_same_bits(self):
+        store = SeatHoldStore()
+        with mock.patch.object(SeatHoldStore, '_ensure_sweeper'):
+            store.hold(1, [2, 9], seconds=60)
+        self.assertEqual(store.held_bitmap(1), seat_bit(2, 10) | seat_bit(9, 10))
+
+    def test_positions_and_blocks_stay_within_rows(self):
+        layout = HallLayout([4, 4, 3])
+        self.assertEqual([layout.position(seat) for seat in (1, 4, 5, 11)], [(0, 0), (0, 3), (1, 0), (2, 2)])
+        self.assertEqual(layout.start_mask(3), 0b001_0011_0011)
+
+        # Вільні 3-4 і 5-6 стоять поруч у масці, але в різних рядах
+        occupied = layout.all_seats & ~(seat_bit(3, 11) | seat_bit(4, 11) | seat_bit(5, 11) | seat_bit(6, 11))
+        self.assertEqual(layout.best_block(occupied, 2).seats, [5, 6])
+        self.assertIsNone(layout.best_block(occupied, 3))
+        self.assertIsNone(layout.best_block(0, 12))
+
+        block = layout.best_block(0, 2)
+        self.assertEqual((block.row, block.seats), (1, [6, 7]))
+
+
+class ScheduleOptimizerTests(SimpleTestCase):
+    BUFFER = 15
+
+    def setUp(self):
+        open_at = datetime(2024, 5, 1, 9)
+        # Зал 1 зайнятий існуючим сеансом 12:00-14:10
+        self.day = DayInput(open_at, open_at + timedelta(hours=15), busy={1: [(180, 310)]})
+        self.movies = [MovieStats(1, 95, 120, 150.0), MovieStats(2, 140, 200, 180.0), MovieStats(3, 80, 40, 120.0)]
+        self.halls = [HallInfo(1, 100), HallInfo(2, 60, 1.5)]
+
+    def optimizer(self, budget=0.0):
+        return DayOptimizer(self.day, self.movies, self.halls, self.BUFFER, 0.8,
+                            {hour: 1.0 for hour in range(24)}, time.monotonic() + budget, seed=3)
+
+    def test_pack_skips_busy_intervals_and_stops_at_close(self):
+        optimizer = self.optimizer()
+        hall_index = [hall.hall_id for hall in optimizer.halls].index(1)
+        self.assertEqual(optimizer.segments[hall_index], [(0, 180), (310, 900)])
+        # 95 + 15 = 110 хв, блок 110: другий фільм уже не влазить до 12:00
+        self.assertEqual(optimizer.pack(hall_index, [0, 0]), [0, 310])
+        self.assertIsNone(optimizer.pack(hall_index, [1] * 6))
+
+    def test_repeated_screenings_decay(self):
+        optimizer = self.optimizer()
+        revenue = optimizer.revenue(np.array([2, 2]), np.array([0, 0]), np.array([0, 300]))
+        self.assertAlmostEqual(revenue[1] / revenue[0], 0.8)
+
+    def test_schedule_respects_busy_time_buffers_and_closing(self):
+        greedy = self.optimizer()
+        greedy_score, _ = greedy.objective(greedy.greedy())
+        sessions = optimize_schedule([self.day], self.movies, self.halls, buffer_minutes=self.BUFFER,
+                                     hour_weights={hour: 1.0 for hour in range(24)}, time_budget=0.2, seed=3)
+
+        self.assertTrue(sessions)
+        self.assertGreaterEqual(sum(session.expected_revenue for session in sessions), greedy_score - 1e-6)
+        durations = {movie.movie_id: movie.duration for movie in self.movies}
+        for hall_id in (1, 2):
+            spans = sorted(
+                (session.start_time, session.start_time + timedelta(minutes=durations[session.movie_id] + self.BUFFER))
+                for session in sessions if session.hall_id == hall_id
+            )
+            busy = [(self.day.open_at + timedelta(minutes=start), self.day.open_at + timedelta(minutes=end))
+                    for start, end in self.day.busy.get(hall_id, [])]
+            for start, end in spans:
+                self.assertGreaterEqual(start, self.day.open_at)
+                self.assertLessEqual(end, self.day.close_at)
+                self.assertFalse(any(start < busy_end and busy_start < end for busy_start, busy_end in busy))
+            for (_, previous_end), (next_start, _) in zip(spans, spans[1:]):
+                self.assertLessEqual(previous_end, next_start)
+
+
+class SearchLimitTests(SimpleTestCase):
+
+    def search(self, view, path, repository, **params):
+        request = APIRequestFactory().get(path, params)
+        force_authenticate(request, user=SimpleNamespace(pk=1, is_authenticated=True))
+        with mock.patch(f'cinema_app.repositories.{repository}', return_value=[]) as found, \
+                override_settings(THROTTLING={'ENABLED': False}):
+            response = view.as_view({'get': path.strip('/').split('/')[-1]})(request)
+        return response, found
+
+    def test_movie_search_limit(self):
+        for limit in ('abc', '-1', '0', '51'):
+            response, found = self.search(MovieViewSet, '/movies/search/', 'MovieRepository.search', q='war', limit=limit)
+            self.assertEqual(response.status_code, 400, limit)
+            self.assertIn('limit', response.data)
+            found.assert_not_called()
+        response, found = self.search(MovieViewSet, '/movies/search/', 'MovieRepository.search', q='war', limit='5')
+        self.assertEqual(response.status_code, 200)
+        found.assert_called_once_with('war', limit=5)
+
+    def test_customer_autocomplete_limit(self):
+        response, found = self.search(CustomerViewSet, '/customers/autocomplete/', 'CustomerRepository.autocomplete',
+                                      q='an', limit='x')
+        self.assertEqual(response.status_code, 400)
+        found.assert_not_called()
+        response, found = self.search(CustomerViewSet, '/customers/autocomplete/', 'CustomerRepository.autocomplete',
+                                      q='an')
+        self.assertEqual(response.status_code, 200)
+        found.assert_called_once_with('an', limit=10)
+
@@ -10,7 +10,9 @@ from .views import (
     CustomerViewSet,
     SessionViewSet,
     TicketViewSet,
-    CinemaReportAPI
+    CinemaReportAPI,
+    AuthTokenAPI,
+    metrics
 )
 
 
@@ -29,6 +31,8 @@ router.register(r'tickets', TicketViewSet, basename='ticket')
 urlpatterns = [
     path('', include(router.urls)),
     path('report/', CinemaReportAPI.as_view(), name='report'),
+    path('metrics/', metrics, name='metrics'),
+    path('auth/token/', AuthTokenAPI.as_view(), name='auth-token'),
     path('auth/', include('rest_framework.urls', namespace='rest_framework')),
 
 ]
\ No newline at end of file
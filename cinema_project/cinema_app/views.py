@@ -2,19 +2,76 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import IntegrityError
 from django.db.models import Avg
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.dateparse import parse_date
 
 from .models import Genre, Hall, JobPosition, Employee, Movie, Customer, Session, Ticket
 from .serializers import (
     GenreSerializer, HallSerializer, JobPositionSerializer,
     EmployeeSerializer, MovieSerializer, CustomerSerializer,
-    SessionSerializer, TicketSerializer
+    SessionSerializer, TicketSerializer, SessionBulkItemSerializer,
+    SeatHoldSerializer, CheckoutSerializer, SearchLimitSerializer,
+    GenreRowSerializer, HallRowSerializer, JobPositionRowSerializer,
+    EmployeeRowSerializer, MovieRowSerializer, CustomerRowSerializer,
+    SessionRowSerializer, TicketRowSerializer
 )
+from .authentication import TokenAuthentication, issue_token, token_store
+from .booking_queue import BookingRequest, booking_queue, get_booking_queue_config
+from .filters import FilterParam, build_query
+from .holds import seat_holds
+from .metrics import REGISTRY
+from .occupancy import occupancy_cache
+from .pricing import pricing_engine
+from .scheduling import SessionCandidate, SessionScheduler, locked_halls
+from .seating import layout_for_session
+from .specifications import Query
 from .unit_of_work import UnitOfWork
 
+
+def metrics(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        REGISTRY.expose(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+class AuthTokenAPI(APIView):
+    """POST - отримати токен за логіном і паролем, DELETE - відкликати поточний токен."""
+
+    authentication_classes = [TokenAuthentication]
+    throttle_scope = 'auth'
+
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            return [AllowAny()]
+        return [IsAuthenticated()]
+
+    def post(self, request):
+        user = authenticate(
+            request,
+            username=request.data.get('username'),
+            password=request.data.get('password')
+        )
+        if user is None or not user.is_active:
+            return Response({'error': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(issue_token(user), status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        token_store.revoke(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class CinemaReportAPI(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'analytics'
 
     def get(self, request):
 
@@ -45,8 +102,36 @@ class CinemaReportAPI(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class GenreViewSet(viewsets.ModelViewSet):
+class FastListMixin:
+    """
+    list() віддає рядки .values() через read_serializer_class замість
+    ModelSerializer по моделях; інші дії працюють як раніше. Параметри
+    з filter_params, ?ordering= (поля з ordering_fields), ?limit= і ?offset=
+    стають Query репозиторію і виконуються в SQL.
+    """
+    read_serializer_class = None
+    repository_name = None
+    filter_params = {}
+    ordering_fields = ()
+
+    def get_query(self, request) -> Query:
+        return build_query(request.query_params, self.filter_params, self.ordering_fields)
+
+    def list(self, request, *args, **kwargs):
+        repository = getattr(self.uow, self.repository_name)
+        query = self.get_query(request)
+        if self.read_serializer_class is None:
+            return Response(self.get_serializer(repository.find(query), many=True).data)
+        reader = self.read_serializer_class(context=self.get_serializer_context())
+        return Response(reader.render(reader.fetch(repository, query)))
+
+
+class GenreViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = GenreSerializer
+    read_serializer_class = GenreRowSerializer
+    repository_name = 'genres'
+    filter_params = {'name': FilterParam('name', 'str', 'icontains')}
+    ordering_fields = ('genre_id', 'name')
     permission_classes = [IsAuthenticated]
     
     def __init__(self, **kwargs):
@@ -64,8 +149,20 @@ class GenreViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class MovieViewSet(viewsets.ModelViewSet):
+class MovieViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = MovieSerializer
+    read_serializer_class = MovieRowSerializer
+    repository_name = 'movies'
+    filter_params = {
+        'genre': FilterParam('genre_id'),
+        'year': FilterParam('release_year'),
+        'year_from': FilterParam('release_year', lookup='gte'),
+        'year_to': FilterParam('release_year', lookup='lte'),
+        'max_age': FilterParam('age_limit', lookup='lte'),
+        'min_rating': FilterParam('rating', 'decimal', 'gte'),
+        'title': FilterParam('title', 'str', 'icontains'),
+    }
+    ordering_fields = ('movie_id', 'title', 'release_year', 'rating', 'duration', 'age_limit')
     permission_classes = [IsAuthenticated]
     
     def __init__(self, **kwargs):
@@ -81,9 +178,37 @@ class MovieViewSet(viewsets.ModelViewSet):
         movie = self.uow.movies.create(**serializer.validated_data)
         return Response(self.get_serializer(movie).data, status=status.HTTP_201_CREATED)
 
+    def perform_update(self, serializer):
+        serializer.instance = self.uow.movies.update(
+            serializer.instance.pk, **serializer.validated_data
+        )
+
+    def perform_destroy(self, instance):
+        self.uow.movies.delete(instance.pk)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'Query parameter "q" is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        params = SearchLimitSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        hits = self.uow.movies.search(query, limit=params.validated_data['limit'])
+        return Response([hit.to_dict() for hit in hits])
+
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = CustomerSerializer
+    read_serializer_class = CustomerRowSerializer
+    repository_name = 'customers'
+    filter_params = {
+        'name': FilterParam('name', 'str', 'icontains'),
+        'email': FilterParam('email', 'str'),
+    }
+    ordering_fields = ('customer_id', 'name', 'email')
     permission_classes = [IsAuthenticated]
     
     def __init__(self, **kwargs):
@@ -93,16 +218,49 @@ class CustomerViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.uow.customers.get_all()
 
+    def perform_create(self, serializer):
+        serializer.instance = self.uow.customers.create(**serializer.validated_data)
+
+    def perform_update(self, serializer):
+        serializer.instance = self.uow.customers.update(
+            serializer.instance.pk, **serializer.validated_data
+        )
+
+    def perform_destroy(self, instance):
+        self.uow.customers.delete(instance.pk)
+
     @action(detail=False, methods=['get'])
     def active(self, request):
         customers = self.uow.customers.get_active_customers()
         serializer = self.get_serializer(customers, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response([])
+        params = SearchLimitSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(self.uow.customers.autocomplete(query, limit=params.validated_data['limit']))
+
 
-class SessionViewSet(viewsets.ModelViewSet):
+class SessionViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = SessionSerializer
+    read_serializer_class = SessionRowSerializer
+    repository_name = 'sessions'
+    filter_params = {
+        'movie': FilterParam('movie_id'),
+        'hall': FilterParam('hall_id'),
+        'date': FilterParam('start_time', lookup='date'),
+        'start_from': FilterParam('start_time', 'datetime', 'gte'),
+        'start_to': FilterParam('start_time', 'datetime', 'lt'),
+        'min_price': FilterParam('price', 'decimal', 'gte'),
+        'max_price': FilterParam('price', 'decimal', 'lte'),
+    }
+    ordering_fields = ('session_id', 'start_time', 'price')
     permission_classes = [IsAuthenticated]
+    throttle_scopes = {'best_seats': 'booking', 'holds': 'booking', 'release_hold': 'booking'}
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -117,10 +275,164 @@ class SessionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(sessions, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='price-quote')
+    def price_quote(self, request, pk=None):
+        try:
+            quote = pricing_engine.quote(int(pk))
+        except ValueError:
+            quote = None
+        if quote is None:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(quote.to_dict())
+
+    @action(detail=True, methods=['get'], url_path='best-seats')
+    def best_seats(self, request, pk=None):
+        try:
+            session_id = int(pk)
+            n = int(request.query_params.get('n', 1))
+        except ValueError:
+            return Response({'error': 'Parameter "n" must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        layout = layout_for_session(session_id)
+        if layout is None:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not 1 <= n <= layout.capacity:
+            return Response(
+                {'error': f'Parameter "n" must be between 1 and {layout.capacity}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        hold_requested = request.query_params.get('hold') in ('1', 'true')
+        # Конкурентний запит міг утримати чи продати ті самі місця - тоді шукаємо ще раз
+        for _ in range(3):
+            if hold_requested:
+                # Кеш може бути застарілим і не бачити продажів інших процесів
+                occupancy_cache.invalidate(session_id)
+            occupied = occupancy_cache.get(session_id).seats | seat_holds.held_bitmap(session_id)
+            block = layout.best_block(occupied, n)
+            if block is None:
+                return Response(
+                    {'error': f'No {n} adjacent free seats in one row'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            if not hold_requested:
+                return Response({'session': session_id, **block.to_dict()})
+            hold = seat_holds.hold(
+                session_id, block.seats, owner=request.user.pk,
+                verify=lambda seats: not self.uow.tickets.get_sold_seats(session_id, seats)
+            )
+            if hold is not None:
+                return Response({'session': session_id, **block.to_dict(), 'hold': hold.to_dict()})
+        return Response({'error': 'Seats are being held by other requests, try again'},
+                        status=status.HTTP_409_CONFLICT)
+
+    @action(detail=True, methods=['get'])
+    def seats(self, request, pk=None):
+        session = self.uow.sessions.get_by_id(pk)
+        if session is None:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        occupied = self.uow.tickets.get_occupied_seats(session.session_id)
+        held = seat_holds.held_seats(session.session_id)
+        return Response({
+            'session': session.session_id,
+            'occupied': occupied,
+            'held': held,
+            'available': session.hall.capacity - len(set(occupied).union(held)),
+        })
+
+    @action(detail=True, methods=['post'])
+    def holds(self, request, pk=None):
+        layout = layout_for_session(int(pk)) if str(pk).isdigit() else None
+        if layout is None:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = SeatHoldSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        seats = sorted(set(serializer.validated_data['seats']))
+        if seats[-1] > layout.capacity:
+            return Response(
+                {'error': f'Seat {seats[-1]} does not exist, hall capacity is {layout.capacity}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-class TicketViewSet(viewsets.ModelViewSet):
+        session_id = int(pk)
+        taken = self.uow.tickets.get_sold_seats(session_id, seats)
+        if taken:
+            return Response({'error': 'Seats already sold', 'seats': taken},
+                            status=status.HTTP_409_CONFLICT)
+        hold = seat_holds.hold(
+            session_id, seats, owner=request.user.pk,
+            verify=lambda seats: not self.uow.tickets.get_sold_seats(session_id, seats)
+        )
+        if hold is None:
+            return Response({'error': 'Seats are held by another customer or were just sold'},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(hold.to_dict(), status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['delete'], url_path=r'holds/(?P<token>[0-9a-f]+)')
+    def release_hold(self, request, pk=None, token=None):
+        hold = seat_holds.get(token)
+        if hold is None or str(hold.session_id) != str(pk) or not hold.owned_by(request.user.pk):
+            return Response({'error': 'Hold not found'}, status=status.HTTP_404_NOT_FOUND)
+        seat_holds.release(token)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = SessionBulkItemSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+
+        movies = Movie.objects.in_bulk({item['movie'] for item in items})
+        halls = Hall.objects.in_bulk({item['hall'] for item in items})
+        missing = [
+            index for index, item in enumerate(items)
+            if item['movie'] not in movies or item['hall'] not in halls
+        ]
+        if missing:
+            return Response(
+                {'error': 'Unknown movie or hall', 'items': missing},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        candidates = [
+            SessionCandidate(
+                hall_id=item['hall'],
+                start_time=item['start_time'],
+                duration=movies[item['movie']].duration,
+                index=index
+            )
+            for index, item in enumerate(items)
+        ]
+        with locked_halls(halls):
+            conflicts = SessionScheduler().validate(candidates)
+            if conflicts:
+                return Response(
+                    {'error': 'Schedule conflicts', 'conflicts': conflicts},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            created = self.uow.sessions.bulk_create([
+                {
+                    'movie_id': item['movie'],
+                    'hall_id': item['hall'],
+                    'start_time': item['start_time'],
+                    'price': item['price'],
+                }
+                for item in items
+            ])
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+
+class TicketViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = TicketSerializer
+    read_serializer_class = TicketRowSerializer
+    repository_name = 'tickets'
+    filter_params = {
+        'session': FilterParam('session_id'),
+        'customer': FilterParam('customer_id'),
+    }
+    ordering_fields = ('ticket_id', 'seat_number', 'purchase_date')
     permission_classes = [IsAuthenticated]
+    throttle_scopes = {'create': 'booking', 'checkout': 'booking'}
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -133,22 +445,111 @@ class TicketViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        session_input = serializer.validated_data.get('session')
-        session_id = session_input.id if hasattr(session_input, 'id') else session_input
-        seat_number = serializer.validated_data['seat_number']
+        data = dict(serializer.validated_data)
+        hold_token = data.pop('hold_token', None)
+        session_id = data['session'].session_id
+        seat_number = data['seat_number']
         
-        if not self.uow.tickets.is_seat_available(session_id, seat_number):
+        if get_booking_queue_config()['ENABLED']:
+            return self._create_queued(request, data, hold_token)
+
+        # Місце, утримане цим покупцем, перевірене при утриманні - лише один INSERT
+        if hold_token is None and not self.uow.tickets.is_seat_available(session_id, seat_number):
             return Response(
                 {'error': f'Seat {seat_number} is already taken'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        ticket = self.uow.tickets.create(**serializer.validated_data)
+        try:
+            ticket = self.uow.tickets.create(**data)
+        except IntegrityError:
+            return Response(
+                {'error': f'Seat {seat_number} is already taken'},
+                status=status.HTTP_409_CONFLICT
+            )
+        if hold_token:
+            seat_holds.consume(hold_token, [seat_number])
         return Response(self.get_serializer(ticket).data, status=status.HTTP_201_CREATED)
 
+    def _create_queued(self, request, data, hold_token):
+        result = booking_queue.book(BookingRequest(
+            session_id=data['session'].session_id,
+            customer_id=data['customer'].customer_id,
+            seat_number=data['seat_number'],
+            purchase_date=data['purchase_date'],
+            hold_token=hold_token,
+            owner=request.user.pk,
+        ))
+        if result.status in ('pending', 'failed'):
+            # Квиток міг бути записаний після таймауту - клієнт перевіряє, а не купує вдруге
+            session_id, customer_id = data['session'].session_id, data['customer'].customer_id
+            response = Response(
+                {
+                    'error': result.error,
+                    'session': session_id,
+                    'seat_number': data['seat_number'],
+                    'check': f'/tickets/?session={session_id}&customer={customer_id}',
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = '1'
+            return response
+        if not result.created:
+            code = status.HTTP_409_CONFLICT if result.status in ('taken', 'held') else status.HTTP_400_BAD_REQUEST
+            return Response({'error': result.error}, status=code)
+        return Response(self.get_serializer(result.ticket).data, status=status.HTTP_201_CREATED)
+
+    # Зміни і видалення - через репозиторій, щоб OccupancyHook оновив маску зайнятості
+    def perform_update(self, serializer):
+        data = dict(serializer.validated_data)
+        data.pop('hold_token', None)
+        serializer.instance = self.uow.tickets.update(serializer.instance.pk, **data)
+
+    def perform_destroy(self, instance):
+        self.uow.tickets.delete(instance.pk)
+
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        hold = seat_holds.get(data['hold_token'])
+        if hold is None or not hold.owned_by(request.user.pk):
+            return Response({'error': 'Hold expired or not found'}, status=status.HTTP_404_NOT_FOUND)
 
-class HallViewSet(viewsets.ModelViewSet):
+        try:
+            tickets = self.uow.tickets.bulk_create([
+                {
+                    'session_id': hold.session_id,
+                    'customer': data['customer'],
+                    'seat_number': seat,
+                    'purchase_date': data['purchase_date'],
+                }
+                for seat in hold.seats
+            ])
+        except IntegrityError:
+            seat_holds.release(hold.token)
+            return Response(
+                {'error': 'Some held seats were sold elsewhere, choose seats again'},
+                status=status.HTTP_409_CONFLICT
+            )
+        seat_holds.consume(hold.token, hold.seats)
+        return Response(
+            {'session': hold.session_id, 'seats': [ticket.seat_number for ticket in tickets]},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class HallViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = HallSerializer
+    read_serializer_class = HallRowSerializer
+    repository_name = 'halls'
+    filter_params = {
+        'type': FilterParam('type', 'str'),
+        'min_capacity': FilterParam('capacity', lookup='gte'),
+    }
+    ordering_fields = ('hall_id', 'name', 'capacity')
     permission_classes = [IsAuthenticated]
     
     def __init__(self, **kwargs):
@@ -158,9 +559,44 @@ class HallViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.uow.halls.get_all()
 
+    @action(detail=True, methods=['get'], url_path='free-slots')
+    def free_slots(self, request, pk=None):
+        hall = self.uow.halls.get_by_id(pk)
+        if hall is None:
+            return Response({'error': 'Hall not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        day = parse_date(request.query_params.get('date', ''))
+        try:
+            duration = int(request.query_params.get('duration', 0))
+        except ValueError:
+            duration = 0
+        if day is None or duration <= 0:
+            return Response(
+                {'error': 'Query parameters "date" (YYYY-MM-DD) and "duration" (minutes) are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        slots = SessionScheduler().free_slots(hall.hall_id, day, duration)
+        return Response({
+            'hall': hall.hall_id,
+            'date': day,
+            'duration': duration,
+            'slots': slots
+        })
+
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = EmployeeSerializer
+    read_serializer_class = EmployeeRowSerializer
+    repository_name = 'employees'
+    filter_params = {
+        'position': FilterParam('position_id'),
+        'min_salary': FilterParam('salary', 'decimal', 'gte'),
+        'max_salary': FilterParam('salary', 'decimal', 'lte'),
+        'hired_from': FilterParam('hire_date', 'date', 'gte'),
+        'hired_to': FilterParam('hire_date', 'date', 'lte'),
+    }
+    ordering_fields = ('employee_id', 'name', 'salary', 'hire_date')
     permission_classes = [IsAuthenticated]
     
     def __init__(self, **kwargs):
@@ -171,8 +607,12 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         return self.uow.employees.get_all()
 
 
-class JobPositionViewSet(viewsets.ModelViewSet):
+class JobPositionViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = JobPositionSerializer
+    read_serializer_class = JobPositionRowSerializer
+    repository_name = 'job_positions'
+    filter_params = {'title': FilterParam('title', 'str', 'icontains')}
+    ordering_fields = ('position_id', 'title')
     permission_classes = [IsAuthenticated]
     
     def __init__(self, **kwargs):
@@ -1,23 +1,90 @@
+import threading
+import time
+
 import requests
 from requests.auth import HTTPBasicAuth
 
 
 class NetworkHelper:
 
+    # (base_url, username) -> токен; невдалі спроби не кешуються, а лише
+    # відкладають наступну на TOKEN_RETRY_SECONDS (сервер міг бути недоступний)
+    _tokens = {}
+    _token_retry_at = {}
+    _tokens_lock = threading.Lock()
+    TOKEN_RETRY_SECONDS = 60
     
-    def __init__(self, base_url='http://localhost:8001', username='admin', password='admin'):
+    def __init__(self, base_url='http://localhost:8001', username='admin', password='admin',
+                 token_endpoint='auth/token'):
 
         self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.token_endpoint = token_endpoint
         self.auth = HTTPBasicAuth(username, password)
         self.headers = {
             'Content-Type': 'application/json',
         }
+        self.http = requests.Session()
+
+    def _obtain_token(self):
+        """
+        Отримує токен один раз і ділить його між усіма екземплярами,
+        щоб сервер не хешував пароль на кожен запит. Поки токена немає,
+        залишається Basic-автентифікація.
+        """
+        key = (self.base_url, self.username)
+        with self._tokens_lock:
+            if key in self._tokens:
+                return self._tokens[key]
+            if time.monotonic() < self._token_retry_at.get(key, 0.0):
+                return False
+        token = False
+        try:
+            response = self.http.post(
+                f"{self.base_url}/{self.token_endpoint}/",
+                json={'username': self.username, 'password': self.password},
+                timeout=5
+            )
+            if response.ok:
+                token = response.json().get('token') or False
+        except (requests.exceptions.RequestException, ValueError):
+            token = False
+        with self._tokens_lock:
+            if token:
+                self._tokens[key] = token
+                self._token_retry_at.pop(key, None)
+            else:
+                self._token_retry_at[key] = time.monotonic() + self.TOKEN_RETRY_SECONDS
+        return token
+
+    def _request(self, method, url, **kwargs):
+        token = self._obtain_token()
+        headers = dict(self.headers)
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        else:
+            kwargs['auth'] = self.auth
+        response = self.http.request(method, url, headers=headers, timeout=5, **kwargs)
+
+        if token and response.status_code == 401:
+            # Токен прострочений або відкликаний - отримуємо новий і повторюємо раз
+            with self._tokens_lock:
+                self._tokens.pop((self.base_url, self.username), None)
+            token = self._obtain_token()
+            if token:
+                headers['Authorization'] = f'Token {token}'
+            else:
+                headers.pop('Authorization', None)
+                kwargs['auth'] = self.auth
+            response = self.http.request(method, url, headers=headers, timeout=5, **kwargs)
+        return response
     
     def get_list(self, endpoint):
 
         try:
             url = f"{self.base_url}/{endpoint}/"
-            response = requests.get(url, auth=self.auth, headers=self.headers, timeout=5)
+            response = self._request('GET', url)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -28,7 +95,7 @@ class NetworkHelper:
 
         try:
             url = f"{self.base_url}/{endpoint}/{item_id}/"
-            response = requests.get(url, auth=self.auth, headers=self.headers, timeout=5)
+            response = self._request('GET', url)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -39,13 +106,7 @@ class NetworkHelper:
 
         try:
             url = f"{self.base_url}/{endpoint}/"
-            response = requests.post(
-                url, 
-                json=data, 
-                auth=self.auth, 
-                headers=self.headers, 
-                timeout=5
-            )
+            response = self._request('POST', url, json=data)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -56,13 +117,7 @@ class NetworkHelper:
 
         try:
             url = f"{self.base_url}/{endpoint}/{item_id}/"
-            response = requests.put(
-                url, 
-                json=data, 
-                auth=self.auth, 
-                headers=self.headers, 
-                timeout=5
-            )
+            response = self._request('PUT', url, json=data)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -73,7 +128,7 @@ class NetworkHelper:
 
         try:
             url = f"{self.base_url}/{endpoint}/{item_id}/"
-            response = requests.delete(url, auth=self.auth, headers=self.headers, timeout=5)
+            response = self._request('DELETE', url)
             response.raise_for_status()
             return True
         except requests.exceptions.RequestException as e:
@@ -84,6 +139,10 @@ class NetworkHelper:
     def get_session(self):
 
         session = requests.Session()
-        session.auth = self.auth
         session.headers.update(self.headers)
+        token = self._obtain_token()
+        if token:
+            session.headers['Authorization'] = f'Token {token}'
+        else:
+            session.auth = self.auth
         return session
\ No newline at end of file
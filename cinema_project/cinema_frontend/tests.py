@@ -1,3 +1,31 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.test import SimpleTestCase
+
+from .NetworkHelper import NetworkHelper
+
+
+class NetworkHelperTokenTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(NetworkHelper._tokens.clear)
+        self.addCleanup(NetworkHelper._token_retry_at.clear)
+
+    def test_failed_fetch_is_retried_after_backoff(self):
+        helper = NetworkHelper(base_url='http://api.test')
+        issued = mock.Mock(ok=True, **{'json.return_value': {'token': 'abc'}})
+        with mock.patch.object(helper.http, 'post', side_effect=requests.ConnectionError) as post:
+            self.assertFalse(helper._obtain_token())
+            self.assertFalse(helper._obtain_token())
+            self.assertEqual(post.call_count, 1)
+
+        self.now += NetworkHelper.TOKEN_RETRY_SECONDS
+        with mock.patch.object(helper.http, 'post', return_value=issued) as post:
+            self.assertEqual(helper._obtain_token(), 'abc')
+            self.assertEqual(NetworkHelper(base_url='http://api.test')._obtain_token(), 'abc')
+            self.assertEqual(post.call_count, 1)
@@ -22,16 +22,37 @@ INSTALLED_APPS = [
     'cinema_frontend',
 ]
 REST_FRAMEWORK = {
+    # Перший клас задає WWW-Authenticate для 401 - Basic лишається основним викликом
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.BasicAuthentication',
+        'cinema_app.authentication.CachedBasicAuthentication',
+        'cinema_app.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'cinema_app.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'cinema_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'CACHE_MAX_BYTES': 32 * 1024 * 1024,
 }
+# auto: orjson, якщо встановлений, інакше ujson, інакше стандартний json
+JSON_RENDERER_BACKEND = os.getenv('JSON_RENDERER_BACKEND', 'auto')
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'cinema_app.compression.CompressionMiddleware',
+    'cinema_app.metrics.MetricsMiddleware',
+    'cinema_app.profiling.QueryProfilingMiddleware',
+    'cinema_app.profiling.SamplingProfilerMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -39,6 +60,75 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+QUERY_PROFILING = {
+    'ENABLED': DEBUG,
+    'SLOW_QUERY_MS': 100,
+    'DUPLICATE_THRESHOLD': 3,
+    'QUERY_BUDGET': None,
+    'RAISE_ON_BUDGET': False,
+}
+PROFILER = {
+    'SAMPLE_RATE': 0.0,
+    'HEADER': 'X-Profile',
+    'TOKEN': os.getenv('PROFILER_TOKEN'),
+    'MODE': 'cprofile',
+    'INTERVAL_MS': 5,
+    'OUTPUT_DIR': BASE_DIR / 'profiles',
+}
+REPOSITORY_HOOKS = [
+    'cinema_app.metrics.MetricsHook',
+    'cinema_app.hooks.SlowCallLoggingHook',
+    'cinema_app.occupancy.OccupancyHook',
+]
+REPOSITORY_SLOW_CALL_MS = 200
+SESSION_CLEANING_MINUTES = 15
+CINEMA_OPENING_HOURS = (9, 24)
+SCHEDULE_DEFAULT_PRICE = 150
+SCHEDULE_HALL_PRICE_FACTORS = {'VIP': 1.5, 'IMAX': 1.3, '3D': 1.2}
+OCCUPANCY_CACHE_TTL = 30
+SEAT_HOLD_SECONDS = 120
+SEAT_HOLD_SWEEP_SECONDS = 5
+# Кількість воркерів сервера (gunicorn/uwsgi); з кількома потрібен спільний кеш токенів,
+# а утримання місць (holds.py) працюють лише з одним процесом
+WORKERS = int(os.getenv('WEB_CONCURRENCY', '1'))
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.getenv('REDIS_URL')}
+        if os.getenv('REDIS_URL') else
+        {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    ),
+}
+AUTH_TOKENS = {
+    'TTL': 12 * 3600,
+    'BASIC_CACHE_TTL': 60,
+    'CACHE_ALIAS': 'default',
+}
+THROTTLING = {
+    'ENABLED': os.getenv('THROTTLING_ENABLED', '1') == '1',
+    'CACHE_ALIAS': None,
+    'RATES': {
+        'catalog': {'rate': '600/min', 'burst': 120},
+        'booking': {'rate': '60/min', 'burst': 20},
+        'analytics': {'rate': '6/min', 'burst': 3},
+        'auth': {'rate': '10/min', 'burst': 5},
+    },
+}
+BOOKING_QUEUE = {
+    'ENABLED': os.getenv('BOOKING_QUEUE_ENABLED') == '1',
+    'BATCH_WINDOW_MS': 5,
+    'MAX_BATCH': 200,
+}
+HALL_SEATS_PER_ROW = {'VIP': 8, 'IMAX': 20}
+PRICING = {
+    'MIN_MULTIPLIER': 0.7,
+    'MAX_MULTIPLIER': 1.6,
+    'SENSITIVITY': 0.5,
+    'PRIOR_TICKETS': 10,
+    'MIN_SAMPLE': 5,
+    'PRICE_STEP': 5,
+    'QUOTE_TTL': 60,
+}
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
 ROOT_URLCONF = 'cinema_project.urls'
 WSGI_APPLICATION = 'cinema_project.wsgi.application'
 TEMPLATES = [